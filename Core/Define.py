@@ -38,13 +38,9 @@ def convert_exchange_to_name(exchange):
     else:
         raise ValueError(f"Invalid exchange: {exchange}")
 def convert_symbol(exchange, symbol):
-    if exchange == "bitget":
-        return symbol.replace("/", "")  # Chuyển BTC/USDT -> BTCUSDT
-    elif exchange == "gate":
-        return symbol.replace("/", "/")  # Chuyển BTC/USDT -> BTC_USDT
-    elif exchange == "binance":
-        return symbol.replace("/", "")
-    return symbol
+    """Chuyển symbol sang market id của sàn (BTC/USDT -> BTCUSDT, Gate: BTC_USDT) qua symbol index."""
+    from Core.Exchange.SymbolIndex import symbol_index
+    return symbol_index.market_id(exchange, symbol)
 
 class PositionSide(Enum):
     LONG = "LONG"
@@ -52,6 +48,8 @@ class PositionSide(Enum):
 
 
 class Position:
+    __slots__ = ('symbol', 'side', 'amount', 'entry_price', 'exchange', 'margin', 'paid_funding', 'amount_')
+
     def __init__(self, symbol, side, amount, entry_price, exchange, margin):
         self.symbol = symbol
         self.side = side  # 'LONG' or 'SHORT'
@@ -60,6 +58,7 @@ class Position:
         self.exchange = exchange
         self.margin = margin
         self.paid_funding = 0.0
+        self.amount_ = 0.0  # notional (USDT), PositionView tính lại mỗi lần refresh
 
     def __repr__(self):
         return f"Position(symbol={self.symbol}, side={self.side}, amount={self.amount}, margin={self.margin},entry_price={self.entry_price})"
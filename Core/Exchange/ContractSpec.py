@@ -0,0 +1,263 @@
+import threading
+
+import ccxt
+
+from Core.Define import convert_exchange_to_name
+from Core.Exchange.MarketCache import market_cache
+from Core.Exchange.SymbolIndex import symbol_index, exchange_name_of, SYMBOL_ALIASES, QUOTE
+
+DEFAULT_CONTRACT_SIZE = 1.0
+DEFAULT_AMOUNT_STEP = 1.0
+
+# Các key trong market['info'] mà từng sàn dùng cho contract size / min amount
+CONTRACT_SIZE_INFO_KEYS = ('contractSize', 'quanto_multiplier', 'multiplier', 'size', 'contract_size')
+MIN_AMOUNT_INFO_KEYS = ('min_qty', 'minQuantity', 'min_amount', 'minAmount', 'minOrderQty', 'min_order_qty')
+
+
+def _positive_float(value):
+    try:
+        f = float(value)
+    except (TypeError, ValueError):
+        return None
+    return f if f > 0 else None
+
+
+def extract_contract_size(market):
+    """Contract size (base units / 1 contract) của một ccxt market, mặc định 1.0."""
+    if not market:
+        return DEFAULT_CONTRACT_SIZE
+    cs = _positive_float(market.get('contractSize'))
+    if cs is not None:
+        return cs
+    info = market.get('info') or {}
+    for key in CONTRACT_SIZE_INFO_KEYS:
+        cs = _positive_float(info.get(key))
+        if cs is not None:
+            return cs
+    # Không tìm thấy: 1.0 để không crash (có thể ước lượng notional cao hơn thực tế)
+    return DEFAULT_CONTRACT_SIZE
+
+
+_precision_modes = {}  # ccxt id -> precisionMode
+
+
+def precision_mode_of(exchange):
+    """precisionMode của client ccxt hoặc của class ccxt theo id (VD: 'gateio'); mặc định TICK_SIZE."""
+    mode = getattr(exchange, 'precisionMode', None)
+    if mode is not None:
+        return mode
+    exchange_id = str(getattr(exchange, 'id', exchange))
+    mode = _precision_modes.get(exchange_id)
+    if mode is None:
+        try:
+            mode = getattr(ccxt, exchange_id)().precisionMode
+        except Exception:
+            mode = None
+        mode = _precision_modes[exchange_id] = mode if mode is not None else ccxt.TICK_SIZE
+    return mode
+
+
+def extract_amount_step(market, precision_mode=ccxt.TICK_SIZE):
+    """
+    Bước nhỏ nhất của amount (đơn vị contracts) của một ccxt market, mặc định 1.0.
+    precision.amount được đọc theo precisionMode của sàn: TICK_SIZE -> chính là step
+    (Gate 1.0 = 1 contract), DECIMAL_PLACES -> số chữ số thập phân.
+    """
+    if not market:
+        return DEFAULT_AMOUNT_STEP
+    prec = (market.get('precision') or {}).get('amount')
+    if prec is not None:
+        try:
+            f = float(prec)
+            if precision_mode == ccxt.DECIMAL_PLACES:
+                if f >= 0 and abs(f - int(f)) < 1e-9:
+                    return float(10 ** (-int(f)))
+            elif precision_mode == ccxt.TICK_SIZE and f > 0:
+                return f
+        except (TypeError, ValueError):
+            pass
+    step = _positive_float(((market.get('limits') or {}).get('amount') or {}).get('min'))
+    if step is not None:
+        return step
+    info = market.get('info') or {}
+    for key in MIN_AMOUNT_INFO_KEYS:
+        step = _positive_float(info.get(key))
+        if step is not None:
+            return step
+    return DEFAULT_AMOUNT_STEP
+
+
+def common_step(s1, s2):
+    """
+    Step chung cho hai sàn: nếu step lớn là bội của step nhỏ thì dùng step lớn,
+    ngược lại vẫn dùng step lớn (chặt hơn) để không đề xuất lượng không hợp lệ trên sàn chặt hơn.
+    """
+    s1 = float(s1 or 0)
+    s2 = float(s2 or 0)
+    if s1 <= 0 and s2 <= 0:
+        return 1.0
+    if s1 <= 0:
+        return s2
+    if s2 <= 0:
+        return s1
+    return max(s1, s2)
+
+
+class ContractSpec:
+    __slots__ = ('exchange', 'base', 'symbol', 'market_id', 'contract_size', 'amount_step',
+                 'min_amount', 'min_notional', 'amount_precision', 'price_precision')
+
+    def __init__(self, exchange, base, symbol=None, market_id=None,
+                 contract_size=DEFAULT_CONTRACT_SIZE, amount_step=DEFAULT_AMOUNT_STEP,
+                 min_amount=None, min_notional=None, amount_precision=None, price_precision=None):
+        self.exchange = exchange
+        self.base = base
+        self.symbol = symbol
+        self.market_id = market_id
+        self.contract_size = contract_size  # base units / 1 contract
+        self.amount_step = amount_step      # step của amount (contracts)
+        self.min_amount = min_amount        # số contracts tối thiểu
+        self.min_notional = min_notional    # notional (USDT) tối thiểu
+        self.amount_precision = amount_precision
+        self.price_precision = price_precision
+
+    @classmethod
+    def from_market(cls, exchange, base, market, precision_mode=ccxt.TICK_SIZE):
+        limits = market.get('limits') or {}
+        precision = market.get('precision') or {}
+        return cls(
+            exchange, base, market.get('symbol'), market.get('id'),
+            contract_size=extract_contract_size(market),
+            amount_step=extract_amount_step(market, precision_mode),
+            min_amount=_positive_float((limits.get('amount') or {}).get('min')),
+            min_notional=_positive_float((limits.get('cost') or {}).get('min')),
+            amount_precision=precision.get('amount'),
+            price_precision=precision.get('price'),
+        )
+
+    @property
+    def base_step(self):
+        """Bước lượng cơ sở (contract_size * amount_step)."""
+        return self.contract_size * self.amount_step
+
+    def to_dict(self):
+        return {
+            'exchange': self.exchange,
+            'base': self.base,
+            'symbol': self.symbol,
+            'marketId': self.market_id,
+            'contractSize': self.contract_size,
+            'amountStep': self.amount_step,
+            'baseStep': self.base_step,
+            'minAmount': self.min_amount,
+            'minNotional': self.min_notional,
+            'amountPrecision': self.amount_precision,
+            'pricePrecision': self.price_precision,
+        }
+
+    def __repr__(self):
+        return (f"ContractSpec(exchange={self.exchange}, base={self.base}, "
+                f"contract_size={self.contract_size}, amount_step={self.amount_step})")
+
+
+class ContractSpecTable:
+    """
+    Bảng thông số hợp đồng (contract size, amount step, min notional, precision) của các
+    USDT-M perpetual, tính sẵn một lần mỗi khi MarketCache nạp/làm mới markets.
+    Tra cứu theo (sàn, base nội bộ) là O(1); step lượng cơ sở chung giữa hai sàn được ghi nhớ
+    cho tới lần dựng lại kế tiếp.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._specs = {}    # (exchange, base nội bộ) -> ContractSpec
+        self._common = {}   # (base, exchange_a, exchange_b) -> common base step
+        self._indexed = {}  # exchange -> timestamp snapshot đã dựng
+
+    def rebuild(self, exchange, markets, snapshot_ts=None, precision_mode=None):
+        name = exchange_name_of(exchange)
+        if precision_mode is None:
+            precision_mode = precision_mode_of(exchange)
+        reverse_alias = {v: k for k, v in SYMBOL_ALIASES.get(name, {}).items()}
+        specs = {}
+        for market in (markets or {}).values():
+            if not isinstance(market, dict):
+                continue
+            if not market.get('swap') or market.get('settle') != QUOTE or market.get('quote') != QUOTE:
+                continue
+            exchange_base = str(market.get('base') or '').upper()
+            if not exchange_base:
+                continue
+            base = reverse_alias.get(exchange_base, exchange_base)
+            specs[(name, base)] = ContractSpec.from_market(name, base, market, precision_mode)
+        with self._lock:
+            self._specs = {k: v for k, v in self._specs.items() if k[0] != name}
+            self._specs.update(specs)
+            self._common = {k: v for k, v in self._common.items() if name not in k[1:]}
+            self._indexed[name] = snapshot_ts
+        return len(specs)
+
+    def ensure(self, client):
+        """Dựng bảng từ markets của client nếu sàn này chưa được dựng."""
+        name = exchange_name_of(client)
+        if name not in self._indexed and getattr(client, 'markets', None):
+            self.rebuild(name, client.markets, precision_mode=precision_mode_of(client))
+
+    def on_markets(self, exchange_id, snapshot):
+        name = exchange_name_of(exchange_id)
+        ts = snapshot.get('timestamp')
+        if self._indexed.get(name) == ts and ts is not None:
+            return
+        # exchange_id là ccxt id (VD: gateio) -> precisionMode của class ccxt tương ứng
+        self.rebuild(name, snapshot.get('markets'), ts, precision_mode_of(exchange_id))
+
+    def find(self, exchange, symbol):
+        """ContractSpec của symbol trên sàn, hoặc None nếu chưa có. `exchange` có thể là client ccxt."""
+        if hasattr(exchange, 'id'):
+            self.ensure(exchange)
+        return self._specs.get((exchange_name_of(exchange), symbol_index.base(symbol)))
+
+    def get(self, exchange, symbol):
+        """Như find() nhưng luôn trả về spec (mặc định contract size 1, step 1 khi sàn không niêm yết)."""
+        spec = self.find(exchange, symbol)
+        if spec is None:
+            name = exchange_name_of(exchange)
+            spec = ContractSpec(name, symbol_index.base(symbol), symbol_index.ccxt_symbol(name, symbol),
+                                symbol_index.market_id(name, symbol))
+        return spec
+
+    def common_base_step(self, symbol, exchange_a, exchange_b):
+        """Step lượng cơ sở biểu diễn được trên cả hai sàn."""
+        base = symbol_index.base(symbol)
+        key = (base, exchange_name_of(exchange_a), exchange_name_of(exchange_b))
+        step = self._common.get(key)
+        if step is None:
+            step = common_step(self.get(exchange_a, symbol).base_step, self.get(exchange_b, symbol).base_step)
+            if self.find(exchange_a, symbol) is not None and self.find(exchange_b, symbol) is not None:
+                with self._lock:
+                    self._common[key] = step
+        return step
+
+    def specs_for(self, symbol, exchanges):
+        """Spec của symbol trên các sàn cùng step cơ sở chung (dùng cho API)."""
+        names = [exchange_name_of(ex) for ex in exchanges]
+        result = {'symbol': symbol_index.internal(symbol), 'base': symbol_index.base(symbol), 'exchanges': {}}
+        for ex, name in zip(exchanges, names):
+            spec = self.find(ex, symbol)
+            result['exchanges'][name] = spec.to_dict() if spec is not None else None
+        if len(exchanges) == 2:
+            result['commonBaseStep'] = self.common_base_step(symbol, exchanges[0], exchanges[1])
+        return result
+
+
+contract_specs = ContractSpecTable()
+
+
+def position_base_size(position):
+    """Lượng coin cơ sở của một Position (contracts * contract size của sàn)."""
+    try:
+        contract_size = contract_specs.get(convert_exchange_to_name(position.exchange), position.symbol).contract_size
+    except Exception:
+        contract_size = DEFAULT_CONTRACT_SIZE
+    return max(0.0, float(position.amount or 0.0)) * contract_size
+market_cache.add_listener(contract_specs.on_markets)
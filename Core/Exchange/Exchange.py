@@ -1,47 +1,127 @@
-import ccxt
-import ccxt.pro
+import threading
+
+import aiohttp
+
 import Config
 
 from Core.Define import EXCHANGE
+from Core.Exchange.ExchangeRegistry import exchange_registry, SYNC, ASYNC, PRO
+
+GATE_UID = "22397301"
+HTTP_POOL_LIMIT = 100
+DNS_CACHE_TTL = 300  # seconds
+
 
 class ExchangeManager:
+    """
+    Truy cập các client ccxt theo cấu hình exchange1/exchange2.
+    Client được lấy lazy từ exchange_registry nên nhiều ExchangeManager trong cùng process
+    dùng chung một client cho mỗi (exchange, credential, sync/pro).
+    """
+
     def __init__(self, exchange1: EXCHANGE, exchange2: EXCHANGE):
         Config.load_config(exchange1, exchange2)
+        self.exchange1 = exchange1
+        self.exchange2 = exchange2
+
+    def _binance_credentials(self):
+        return {'apiKey': Config.binance_api_key, 'secret': Config.binance_api_secret}
+
+    def _bitget_credentials(self):
+        return {'apiKey': Config.bitget_api_key, 'secret': Config.bitget_api_secret,
+                'password': Config.bitget_password}
+
+    def _gate_credentials(self):
+        return {'apiKey': Config.gate_api_key, 'secret': Config.gate_api_secret}
+
+    @property
+    def binance_exchange(self):
+        return exchange_registry.get('binance', self._binance_credentials(), SYNC)
+
+    @property
+    def bitget_exchange(self):
+        return exchange_registry.get('bitget', self._bitget_credentials(), SYNC)
+
+    @property
+    def gate_exchange(self):
+        return exchange_registry.get('gate', self._gate_credentials(), SYNC)
+
+    @property
+    def binance_pro(self):
+        return exchange_registry.get('binance', self._binance_credentials(), PRO)
+
+    @property
+    def bitget_pro(self):
+        return exchange_registry.get('bitget', self._bitget_credentials(), PRO)
+
+    @property
+    def gate_pro(self):
+        return exchange_registry.get('gate', {**self._gate_credentials(), 'uid': GATE_UID}, PRO)
+
+
+class AsyncExchangeManager(ExchangeManager):
+    """
+    Phiên bản async của ExchangeManager: client ccxt.async_support dùng chung một
+    aiohttp.ClientSession (resolver aiodns, keep-alive pool) để server chồng I/O của
+    nhiều request lên cùng một event loop.
+    Các property phải được truy cập bên trong event loop đang chạy.
+    """
+
+    def __init__(self, exchange1: EXCHANGE, exchange2: EXCHANGE):
+        super().__init__(exchange1, exchange2)
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                resolver=aiohttp.AsyncResolver(),
+                limit=HTTP_POOL_LIMIT,
+                ttl_dns_cache=DNS_CACHE_TTL,
+                enable_cleanup_closed=True,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, trust_env=True)
+        return self._session
+
+    @property
+    def binance_exchange(self):
+        return exchange_registry.get('binance', self._binance_credentials(), ASYNC, self._get_session())
+
+    @property
+    def bitget_exchange(self):
+        return exchange_registry.get('bitget', self._bitget_credentials(), ASYNC, self._get_session())
+
+    @property
+    def gate_exchange(self):
+        return exchange_registry.get('gate', self._gate_credentials(), ASYNC, self._get_session())
+
+    async def close(self):
+        await exchange_registry.close_async_clients()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_exchange_manager(exchange1: EXCHANGE, exchange2: EXCHANGE) -> ExchangeManager:
+    """ExchangeManager dùng chung trong process cho cặp (exchange1, exchange2)."""
+    key = (exchange1, exchange2)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = ExchangeManager(exchange1, exchange2)
+            _managers[key] = manager
+    return manager
+
 
-        self.binance_exchange = ccxt.binanceusdm({
-            'apiKey': Config.binance_api_key,
-            'secret': Config.binance_api_secret,
-            'enableRateLimit': True,
-        })
-
-        self.bitget_exchange = ccxt.bitget({
-            'apiKey': Config.bitget_api_key,
-            'secret': Config.bitget_api_secret,
-            'password': Config.bitget_password,
-            'enableRateLimit': True,
-        })
-        self.bitget_exchange.options['defaultType'] = 'swap'
-
-        self.gate_exchange = ccxt.gateio({
-            'apiKey': Config.gate_api_key,
-            'secret': Config.gate_api_secret,
-            'enableRateLimit': True,
-        })
-        self.gate_exchange.options['defaultType'] = 'swap'
-
-        self.bitget_pro = ccxt.pro.bitget({
-            'apiKey': Config.bitget_api_key,
-            'secret': Config.bitget_api_secret,
-            'password': Config.bitget_password,
-            'options': {'defaultType': 'swap'}
-        })
-
-        self.gate_pro = ccxt.pro.gateio({
-            'apiKey': Config.gate_api_key,
-            'secret': Config.gate_api_secret,
-            'uid': "22397301",
-            'enableRateLimit': True,
-            'options': {
-                'defaultType': 'swap'
-            }
-        })
\ No newline at end of file
+def get_async_exchange_manager(exchange1: EXCHANGE, exchange2: EXCHANGE) -> AsyncExchangeManager:
+    """AsyncExchangeManager dùng chung trong process cho cặp (exchange1, exchange2)."""
+    key = ('async', exchange1, exchange2)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = AsyncExchangeManager(exchange1, exchange2)
+            _managers[key] = manager
+    return manager
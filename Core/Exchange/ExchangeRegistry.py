@@ -0,0 +1,107 @@
+import hashlib
+import threading
+
+import ccxt
+import ccxt.async_support
+import ccxt.pro
+
+from Core.Exchange.MarketCache import market_cache
+from Core.Exchange.Metrics import exchange_metrics
+from Core.Exchange.RateLimit import rate_limit_broker
+from Core.Exchange.Replay import exchange_recorder, replay_backend
+from Core.Exchange.SingleFlight import coalesce_reads
+
+SYNC = "sync"
+ASYNC = "async"
+PRO = "pro"
+
+# exchange name -> ({flavour: ccxt class}, options mặc định)
+_CLIENT_CLASSES = {
+    'binance': ({SYNC: ccxt.binanceusdm, ASYNC: ccxt.async_support.binanceusdm, PRO: ccxt.pro.binanceusdm}, {}),
+    'bitget': ({SYNC: ccxt.bitget, ASYNC: ccxt.async_support.bitget, PRO: ccxt.pro.bitget}, {'defaultType': 'swap'}),
+    'gate': ({SYNC: ccxt.gateio, ASYNC: ccxt.async_support.gateio, PRO: ccxt.pro.gateio}, {'defaultType': 'swap'}),
+}
+
+
+def _credential_fingerprint(credentials):
+    """Hash ngắn của bộ credential để làm key (không giữ secret trong key)."""
+    raw = "|".join(f"{k}={credentials.get(k) or ''}" for k in sorted(credentials))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+
+class ExchangeRegistry:
+    """
+    Registry dùng chung trong process: mỗi (exchange, credential, sync/async/pro) chỉ có một client,
+    được tạo lazy ở lần truy cập đầu tiên và hydrate markets từ MarketCache.
+    Nhờ vậy markets, session HTTP và connection pool không bị nhân bản theo từng ExchangeManager.
+    Mọi client cùng API key (kể cả ở process khác) chia chung ngân sách rate limit qua rate_limit_broker.
+    Client async/pro gắn với event loop tạo ra chúng, nên process chỉ nên dùng một event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+
+    def get(self, exchange_name, credentials, flavour=SYNC, session=None):
+        """
+        Lấy (hoặc tạo) client. `session` (aiohttp.ClientSession) chỉ dùng cho flavour ASYNC
+        để các client async chia sẻ chung một connection pool.
+        """
+        key = (exchange_name, _credential_fingerprint(credentials), flavour)
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._create(exchange_name, credentials, flavour, session)
+                self._clients[key] = client
+        return client
+
+    def _create(self, exchange_name, credentials, flavour, session=None):
+        if exchange_name not in _CLIENT_CLASSES:
+            raise ValueError(f"Unsupported exchange for registry: {exchange_name}")
+        classes, options = _CLIENT_CLASSES[exchange_name]
+        if flavour not in classes:
+            raise ValueError(f"Unsupported client flavour: {flavour}")
+        is_async = flavour != SYNC
+        if replay_backend is not None:
+            credentials = replay_backend.credentials(credentials)
+        config = {k: v for k, v in credentials.items() if v}
+        config['enableRateLimit'] = True
+        config['options'] = dict(options)
+        if flavour == ASYNC and session is not None:
+            config['session'] = session
+        client = classes[flavour](config)
+        if replay_backend is not None:
+            # Chế độ phát lại: không gọi sàn thật, không đụng tới market cache dùng chung
+            replay_backend.attach(client, is_async)
+        elif exchange_recorder is not None:
+            exchange_recorder.attach(client, is_async)
+        # Ngân sách rate limit tính theo API key (không theo uid/password hay flavour)
+        key_fingerprint = _credential_fingerprint({'apiKey': credentials.get('apiKey')})
+        rate_limit_broker.install(client, exchange_name, key_fingerprint, is_async=is_async)
+        exchange_metrics.instrument(client, is_async=is_async)
+        coalesce_reads(client, is_async=is_async)
+        if replay_backend is None:
+            market_cache.hydrate(client, sync_client=(flavour == SYNC))
+            market_cache.start_background_refresh()
+        return client
+
+    def clients(self):
+        with self._lock:
+            return dict(self._clients)
+
+    async def close_async_clients(self):
+        """Đóng các client async/pro (session dùng chung do AsyncExchangeManager tự đóng)."""
+        with self._lock:
+            keys = [k for k in self._clients if k[2] in (ASYNC, PRO)]
+            clients = [self._clients.pop(k) for k in keys]
+        for client in clients:
+            try:
+                await client.close()
+            except Exception as e:
+                print(f"[WARN] Đóng client {client.id} lỗi: {e}")
+
+
+exchange_registry = ExchangeRegistry()
@@ -0,0 +1,208 @@
+import json
+import os
+import threading
+import time
+
+import ccxt
+
+from Define import market_cache_path
+
+# Tăng khi format snapshot thay đổi -> snapshot cũ bị bỏ qua
+CACHE_VERSION = 1
+DEFAULT_TTL = int(os.getenv("MARKET_CACHE_TTL", str(6 * 60 * 60)))  # seconds
+REFRESH_CHECK_INTERVAL = 60  # seconds
+
+
+class MarketCache:
+    """
+    Snapshot markets/currencies của từng sàn ra đĩa (data/markets/<exchange_id>.json),
+    dùng chung cho mọi process (ADL, Asset, Transfer, TP/SL, Server).
+    Client mới được hydrate bằng set_markets() thay vì tải lại toàn bộ markets;
+    snapshot quá TTL được làm mới ở background thread.
+    """
+
+    def __init__(self, cache_dir=market_cache_path, ttl=DEFAULT_TTL):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshots = {}   # exchange_id -> snapshot dict
+        self._clients = {}     # exchange_id -> list of clients đã hydrate
+        self._refreshers = {}  # exchange_id -> sync client dùng để tải markets
+        self._listeners = []   # callback(exchange_id, snapshot) sau mỗi lần làm mới
+        self._refreshing = set()
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def _path(self, exchange_id):
+        return os.path.join(self.cache_dir, f"{exchange_id}.json")
+
+    def _is_valid(self, snapshot):
+        return (isinstance(snapshot, dict)
+                and snapshot.get('version') == CACHE_VERSION
+                and snapshot.get('ccxt') == ccxt.__version__
+                and isinstance(snapshot.get('markets'), dict))
+
+    def is_fresh(self, snapshot):
+        if not snapshot:
+            return False
+        age = time.time() - float(snapshot.get('timestamp', 0)) / 1000
+        return age < self.ttl
+
+    def _read_disk(self, exchange_id):
+        path = self._path(exchange_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except Exception as e:
+            print(f"[WARN] Không đọc được market cache {path}: {e}")
+            return None
+        return snapshot if self._is_valid(snapshot) else None
+
+    def load(self, exchange_id):
+        """Trả về snapshot mới nhất (memory hoặc đĩa) cho exchange_id, hoặc None."""
+        with self._lock:
+            snapshot = self._snapshots.get(exchange_id)
+        if snapshot is not None and self.is_fresh(snapshot):
+            return snapshot
+        disk = self._read_disk(exchange_id)
+        if disk is not None and (snapshot is None or disk['timestamp'] > snapshot['timestamp']):
+            with self._lock:
+                self._snapshots[exchange_id] = disk
+            return disk
+        return snapshot
+
+    def save(self, exchange_id, markets, currencies):
+        snapshot = {
+            'version': CACHE_VERSION,
+            'ccxt': ccxt.__version__,
+            'exchange': exchange_id,
+            'timestamp': int(time.time() * 1000),
+            'markets': markets or {},
+            'currencies': currencies or {},
+        }
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(exchange_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f)
+            # Ghi atomic để process khác không đọc phải file dở dang
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"[WARN] Không ghi được market cache {path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        with self._lock:
+            self._snapshots[exchange_id] = snapshot
+        return snapshot
+
+    def _apply(self, client, snapshot):
+        try:
+            client.set_markets(snapshot['markets'], snapshot.get('currencies') or None)
+            return True
+        except Exception as e:
+            print(f"[WARN] Hydrate markets thất bại cho {client.id}: {e}")
+            return False
+
+    def hydrate(self, client, sync_client=True):
+        """
+        Nạp markets từ snapshot vào client. Nếu chưa có snapshot hoặc snapshot đã cũ,
+        client sync được dùng để làm mới ở background (không chặn caller).
+        Trả về True nếu client đã có markets sau khi gọi.
+        """
+        exchange_id = client.id
+        with self._lock:
+            self._clients.setdefault(exchange_id, []).append(client)
+            if sync_client and exchange_id not in self._refreshers:
+                self._refreshers[exchange_id] = client
+        snapshot = self.load(exchange_id)
+        hydrated = snapshot is not None and self._apply(client, snapshot)
+        if hydrated:
+            self._notify(exchange_id, snapshot)
+        if not self.is_fresh(snapshot):
+            self.refresh_async(exchange_id)
+        return hydrated
+
+    def add_listener(self, callback):
+        """Đăng ký callback(exchange_id, snapshot) gọi sau mỗi lần markets được làm mới."""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def refresh(self, exchange_id):
+        """Tải lại markets bằng client sync đã đăng ký, ghi snapshot và hydrate mọi client."""
+        with self._lock:
+            client = self._refreshers.get(exchange_id)
+        if client is None:
+            return None
+        markets = client.load_markets(reload=True)
+        snapshot = self.save(exchange_id, markets, client.currencies)
+        self._distribute(exchange_id, snapshot, skip=client)
+        return snapshot
+
+    def _distribute(self, exchange_id, snapshot, skip=None):
+        with self._lock:
+            clients = list(self._clients.get(exchange_id, []))
+        for c in clients:
+            if c is not skip:
+                self._apply(c, snapshot)
+        self._notify(exchange_id, snapshot)
+
+    def _notify(self, exchange_id, snapshot):
+        with self._lock:
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(exchange_id, snapshot)
+            except Exception as e:
+                print(f"[WARN] Market cache listener lỗi: {e}")
+
+    def refresh_async(self, exchange_id):
+        with self._lock:
+            if exchange_id in self._refreshing or exchange_id not in self._refreshers:
+                return
+            self._refreshing.add(exchange_id)
+
+        def _run():
+            try:
+                self.refresh(exchange_id)
+            except Exception as e:
+                print(f"[WARN] Làm mới markets {exchange_id} thất bại: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(exchange_id)
+
+        threading.Thread(target=_run, name=f"MarketCacheRefresh-{exchange_id}", daemon=True).start()
+
+    def start_background_refresh(self, interval=REFRESH_CHECK_INTERVAL):
+        """
+        Thread nền: nếu process khác đã ghi snapshot mới hơn thì hydrate lại từ đĩa,
+        nếu snapshot đã quá TTL thì tải lại markets.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+
+        def _loop():
+            while not self._stop_event.wait(interval):
+                with self._lock:
+                    exchange_ids = list(self._clients.keys())
+                    current = dict(self._snapshots)
+                for exchange_id in exchange_ids:
+                    snapshot = self.load(exchange_id)
+                    if snapshot is not None and snapshot is not current.get(exchange_id):
+                        self._distribute(exchange_id, snapshot)
+                    if not self.is_fresh(snapshot):
+                        self.refresh_async(exchange_id)
+
+        self._thread = threading.Thread(target=_loop, name="MarketCacheScheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+market_cache = MarketCache()
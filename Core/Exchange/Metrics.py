@@ -0,0 +1,240 @@
+import contextlib
+import contextvars
+import functools
+import os
+import threading
+import time
+
+# Biên trên (ms) của các bucket histogram latency; bucket cuối là +inf
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+SUMMARY_INTERVAL = int(os.getenv("EXCHANGE_METRICS_INTERVAL", "300"))  # seconds
+SUMMARY_TOP = 5
+
+# Thời gian chờ rate limit trong request hiện tại (để trừ khỏi latency của endpoint)
+_throttle_wait = contextvars.ContextVar('exchange_throttle_wait', default=None)
+# [(exchange, endpoint)] của request lỗi gần nhất trong scope hiện tại (để retry ghi đúng endpoint)
+_failed_request = contextvars.ContextVar('exchange_failed_request', default=None)
+
+
+@contextlib.contextmanager
+def failed_request_scope():
+    """
+    Scope ghi lại (sàn, endpoint) của request REST lỗi gần nhất bên trong nó; yield một list
+    1 phần tử (None nếu chưa có). Dùng list chung nên vẫn thấy được cả khi request chạy trong
+    thread (asyncio.to_thread copy context).
+    """
+    holder = [None]
+    token = _failed_request.set(holder)
+    try:
+        yield holder
+    finally:
+        _failed_request.reset(token)
+
+
+def _note_failed(exchange, endpoint):
+    holder = _failed_request.get()
+    if holder is not None:
+        holder[0] = (exchange, endpoint)
+
+
+class LatencyHistogram:
+    __slots__ = ('counts', 'count', 'total_ms', 'max_ms')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms):
+        i = 0
+        while i < len(LATENCY_BUCKETS_MS) and ms > LATENCY_BUCKETS_MS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def quantile(self, q):
+        """Ước lượng quantile bằng biên trên của bucket chứa nó."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self):
+        buckets = {f"le_{b}": n for b, n in zip(LATENCY_BUCKETS_MS, self.counts)}
+        buckets['le_inf'] = self.counts[-1]
+        return {
+            'count': self.count,
+            'totalMs': round(self.total_ms, 1),
+            'avgMs': round(self.total_ms / self.count, 1) if self.count else None,
+            'p50Ms': self.quantile(0.5),
+            'p95Ms': self.quantile(0.95),
+            'maxMs': round(self.max_ms, 1),
+            'buckets': buckets,
+        }
+
+
+class EndpointStats:
+    __slots__ = ('calls', 'retries', 'errors', 'latency')
+
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        self.errors = {}  # tên lớp exception -> số lần
+        self.latency = LatencyHistogram()
+
+    def to_dict(self):
+        return {'calls': self.calls, 'retries': self.retries, 'errors': dict(self.errors),
+                'latency': self.latency.to_dict()}
+
+
+def endpoint_name(path, api):
+    """Tên endpoint từ tham số fetch2 của ccxt, VD: private:v2/mix/position/all-position."""
+    if isinstance(api, (list, tuple)):
+        api = '/'.join(str(a) for a in api)
+    return f"{api}:{path}"
+
+
+class ExchangeMetrics:
+    """
+    Thống kê các request tới sàn trong process: số lần gọi, latency histogram, số lần retry,
+    lỗi theo lớp exception, theo (sàn, endpoint). Thời gian chờ rate limit được tính riêng
+    theo sàn để latency phản ánh đúng thời gian của sàn.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}          # (exchange, endpoint) -> EndpointStats
+        self._throttle_ms = {}    # exchange -> tổng ms chờ rate limit
+        self._started = time.time()
+        self._thread = None
+
+    def _get(self, exchange, endpoint):
+        key = (exchange, endpoint)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats.setdefault(key, EndpointStats())
+        return stats
+
+    def record(self, exchange, endpoint, seconds, error=None):
+        with self._lock:
+            stats = self._get(exchange, endpoint)
+            stats.calls += 1
+            stats.latency.observe(seconds * 1000)
+            if error is not None:
+                name = type(error).__name__
+                stats.errors[name] = stats.errors.get(name, 0) + 1
+
+    def record_retry(self, exchange, endpoint):
+        with self._lock:
+            self._get(exchange, endpoint).retries += 1
+
+    def record_throttle(self, exchange, seconds):
+        with self._lock:
+            self._throttle_ms[exchange] = self._throttle_ms.get(exchange, 0.0) + seconds * 1000
+
+    def _throttled(self, exchange, seconds):
+        waited = _throttle_wait.get()
+        if waited is not None:
+            waited[0] += seconds
+        self.record_throttle(exchange, seconds)
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = [{'exchange': ex, 'endpoint': ep, **stats.to_dict()}
+                         for (ex, ep), stats in self._stats.items()]
+            throttle = {ex: round(ms, 1) for ex, ms in self._throttle_ms.items()}
+        endpoints.sort(key=lambda e: e['latency']['totalMs'], reverse=True)
+        return {'since': int(self._started * 1000), 'throttleWaitMs': throttle, 'endpoints': endpoints}
+
+    def summary_line(self, top=SUMMARY_TOP):
+        """Một dòng tóm tắt các endpoint tốn nhiều thời gian nhất (để ghi log định kỳ)."""
+        snap = self.snapshot()
+        parts = []
+        for e in snap['endpoints'][:top]:
+            lat = e['latency']
+            errors = sum(e['errors'].values())
+            parts.append(f"{e['exchange']} {e['endpoint']} n={e['calls']} avg={lat['avgMs']}ms "
+                         f"p95={lat['p95Ms']}ms err={errors} retry={e['retries']}")
+        calls = sum(e['calls'] for e in snap['endpoints'])
+        return f"[exchange-metrics] calls={calls} throttle={snap['throttleWaitMs']} top: " + " | ".join(parts)
+
+    def start_periodic_log(self, log_func, interval=SUMMARY_INTERVAL):
+        """Thread nền ghi summary_line() vào log của service mỗi `interval` giây."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        def _loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    log_func(self.summary_line())
+                except Exception as e:
+                    print(f"[WARN] Ghi exchange metrics lỗi: {e}")
+
+        self._thread = threading.Thread(target=_loop, name="ExchangeMetricsLog", daemon=True)
+        self._thread.start()
+
+    def instrument(self, client, is_async=False):
+        """
+        Bọc fetch2 (điểm đi qua của mọi request REST trong ccxt) và throttle của client
+        để ghi latency/lỗi theo endpoint và thời gian chờ rate limit.
+        """
+        exchange = client.id
+        fetch2 = client.fetch2
+        throttle = client.throttle
+        if is_async:
+            @functools.wraps(fetch2)
+            async def fetch2_wrapper(path, api='public', *args, **kwargs):
+                waited = [0.0]
+                token = _throttle_wait.set(waited)
+                start = time.perf_counter()
+                try:
+                    result = await fetch2(path, api, *args, **kwargs)
+                except Exception as e:
+                    self.record(exchange, endpoint_name(path, api), time.perf_counter() - start - waited[0], e)
+                    _note_failed(exchange, endpoint_name(path, api))
+                    raise
+                finally:
+                    _throttle_wait.reset(token)
+                self.record(exchange, endpoint_name(path, api), time.perf_counter() - start - waited[0])
+                return result
+
+            async def throttle_wrapper(cost=None):
+                start = time.perf_counter()
+                await throttle(cost)
+                self._throttled(exchange, time.perf_counter() - start)
+        else:
+            @functools.wraps(fetch2)
+            def fetch2_wrapper(path, api='public', *args, **kwargs):
+                waited = [0.0]
+                token = _throttle_wait.set(waited)
+                start = time.perf_counter()
+                try:
+                    result = fetch2(path, api, *args, **kwargs)
+                except Exception as e:
+                    self.record(exchange, endpoint_name(path, api), time.perf_counter() - start - waited[0], e)
+                    _note_failed(exchange, endpoint_name(path, api))
+                    raise
+                finally:
+                    _throttle_wait.reset(token)
+                self.record(exchange, endpoint_name(path, api), time.perf_counter() - start - waited[0])
+                return result
+
+            def throttle_wrapper(cost=None):
+                start = time.perf_counter()
+                throttle(cost)
+                self._throttled(exchange, time.perf_counter() - start)
+        client.fetch2 = fetch2_wrapper
+        client.throttle = throttle_wrapper
+
+
+exchange_metrics = ExchangeMetrics()
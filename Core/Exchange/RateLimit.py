@@ -0,0 +1,128 @@
+import asyncio
+import os
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: không có flock -> chỉ giới hạn trong process
+    fcntl = None
+
+from Define import rate_limit_path
+
+# Số giây burst cho phép tích luỹ (capacity = refill rate * BURST_SECONDS)
+BURST_SECONDS = float(os.getenv("RATE_LIMIT_BURST_SECONDS", "1"))
+# Tỷ lệ dùng so với rateLimit của ccxt (<1 để chừa khoảng an toàn cho các client ngoài broker)
+RATE_LIMIT_SHARE = float(os.getenv("RATE_LIMIT_SHARE", "1"))
+_STATE = struct.Struct('dd')  # tokens, thời điểm cập nhật (time.time())
+
+
+class TokenBucket:
+    """
+    Token bucket dùng chung giữa các process qua một file nhỏ (data/ratelimit/<key>.bucket)
+    khoá bằng fcntl.flock. Mỗi request trừ `cost` token (trọng số endpoint của ccxt),
+    token được nạp lại với tốc độ `rate` token/giây, tối đa `capacity`.
+    Khi không có fcntl (Windows), bucket chỉ đồng bộ giữa các thread trong process.
+    """
+
+    def __init__(self, path, rate, capacity):
+        self.path = path
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(capacity))
+        self._lock = threading.Lock()
+        self._local_state = (self.capacity, time.time())
+        self._fd = None
+
+    def _open(self):
+        if self._fd is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        return self._fd
+
+    def _read(self, fd):
+        raw = os.pread(fd, _STATE.size, 0)
+        if len(raw) != _STATE.size:
+            return self.capacity, time.time()
+        return _STATE.unpack(raw)
+
+    def _reserve(self, cost, tokens, updated):
+        now = time.time()
+        tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+        if tokens >= cost:
+            return tokens - cost, now, 0.0
+        return tokens, now, (cost - tokens) / self.rate
+
+    def try_acquire(self, cost=1.0):
+        """Trừ `cost` token nếu đủ. Trả về 0 khi thành công, ngược lại số giây cần chờ."""
+        cost = min(float(cost or 1.0), self.capacity)
+        with self._lock:
+            if fcntl is None:
+                tokens, updated, wait = self._reserve(cost, *self._local_state)
+                self._local_state = (tokens, updated)
+                return wait
+            fd = self._open()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                tokens, updated, wait = self._reserve(cost, *self._read(fd))
+                os.pwrite(fd, _STATE.pack(tokens, updated), 0)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            return wait
+
+    def acquire(self, cost=1.0):
+        """Chờ (blocking) tới khi lấy được `cost` token."""
+        while True:
+            wait = self.try_acquire(cost)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, cost=1.0):
+        """Như acquire() nhưng chờ bằng asyncio.sleep để không chặn event loop."""
+        while True:
+            wait = self.try_acquire(cost)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+class RateLimitBroker:
+    """
+    Ngân sách rate limit chung cho mọi process dùng cùng API key trên cùng máy
+    (ADL, Asset, TP/SL, Transfer, Server). Mỗi (sàn, API key) có một TokenBucket; client ccxt
+    được gắn broker bằng cách thay client.throttle, nên mọi request qua fetch2 (kể cả sync,
+    async và pro) đều trừ token theo trọng số endpoint (cost) mà ccxt đã tính.
+    """
+
+    def __init__(self, bucket_dir=rate_limit_path):
+        self.bucket_dir = bucket_dir
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def bucket(self, exchange_name, key_fingerprint, rate_limit_ms):
+        """Bucket cho (sàn, API key); `rate_limit_ms` là rateLimit của ccxt (ms cho mỗi đơn vị cost)."""
+        key = (exchange_name, key_fingerprint)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                rate = 1000.0 / max(1.0, float(rate_limit_ms or 50)) * RATE_LIMIT_SHARE
+                path = os.path.join(self.bucket_dir, f"{exchange_name}-{key_fingerprint}.bucket")
+                bucket = TokenBucket(path, rate, rate * BURST_SECONDS)
+                self._buckets[key] = bucket
+        return bucket
+
+    def install(self, client, exchange_name, key_fingerprint, is_async=False):
+        """Thay throttle nội bộ của client ccxt bằng bucket dùng chung."""
+        bucket = self.bucket(exchange_name, key_fingerprint, getattr(client, 'rateLimit', None))
+        if is_async:
+            async def throttle(cost=None):
+                await bucket.acquire_async(cost)
+        else:
+            def throttle(cost=None):
+                bucket.acquire(cost)
+        client.throttle = throttle
+        return bucket
+
+
+rate_limit_broker = RateLimitBroker()
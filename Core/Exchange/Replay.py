@@ -0,0 +1,222 @@
+import asyncio
+import functools
+import json
+import os
+import random
+import threading
+import time
+
+import ccxt
+
+# Bật ghi/phát lại cho mọi client tạo qua ExchangeRegistry
+RECORD_DIR = os.getenv("EXCHANGE_RECORD_DIR")
+REPLAY_DIR = os.getenv("EXCHANGE_REPLAY_DIR")
+# "recorded" (dùng latency đã ghi), "<ms>" hoặc "<ms>:<jitter_ms>"
+REPLAY_LATENCY = os.getenv("EXCHANGE_REPLAY_LATENCY", "recorded")
+REPLAY_LATENCY_SCALE = float(os.getenv("EXCHANGE_REPLAY_LATENCY_SCALE", "1"))
+
+# Tham số thay đổi theo thời gian, bỏ khỏi key để bản ghi dùng lại được
+VOLATILE_PARAMS = {'timestamp', 'since', 'startTime', 'endTime', 'start_time', 'end_time', 'from', 'to',
+                   'recvWindow', 'nonce', 'idLessThan', 'cursor', 'lastEndId'}
+REPLAY_CREDENTIALS = {'apiKey': 'replay', 'secret': 'replay', 'password': 'replay', 'uid': 'replay'}
+
+
+def request_key(api, path, method, params):
+    stable = {k: v for k, v in (params or {}).items() if k not in VOLATILE_PARAMS}
+    return json.dumps([api, path, method, stable], sort_keys=True, default=str)
+
+
+def endpoint_key(api, path, method):
+    return json.dumps([api, path, method], default=str)
+
+
+def _cassette_path(directory, exchange_id):
+    return os.path.join(directory, f"{exchange_id}.jsonl")
+
+
+def _markets_path(directory, exchange_id):
+    return os.path.join(directory, f"{exchange_id}.markets.json")
+
+
+class ExchangeRecorder:
+    """
+    Ghi lại mọi cặp request/response REST (tại fetch2) của client ccxt vào
+    <dir>/<exchange_id>.jsonl, kèm latency và lỗi; markets được ghi một lần vào
+    <dir>/<exchange_id>.markets.json để client phát lại không cần tải markets.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._markets_saved = set()
+
+    def _append(self, client, entry):
+        os.makedirs(self.directory, exist_ok=True)
+        line = json.dumps(entry, default=str) + "\n"
+        with self._lock:
+            with open(_cassette_path(self.directory, client.id), 'a', encoding='utf-8') as f:
+                f.write(line)
+            if client.id not in self._markets_saved and getattr(client, 'markets', None):
+                self._markets_saved.add(client.id)
+                with open(_markets_path(self.directory, client.id), 'w', encoding='utf-8') as f:
+                    json.dump({'markets': client.markets, 'currencies': client.currencies}, f, default=str)
+
+    def _entry(self, path, api, method, params, started, response=None, error=None):
+        entry = {'api': api, 'path': path, 'method': method, 'params': params,
+                 'latencyMs': round((time.perf_counter() - started) * 1000, 1)}
+        if error is not None:
+            entry['error'] = type(error).__name__
+            entry['message'] = str(error)
+        else:
+            entry['response'] = response
+        return entry
+
+    def attach(self, client, is_async=False):
+        fetch2 = client.fetch2
+        if is_async:
+            @functools.wraps(fetch2)
+            async def recording_fetch2(path, api='public', method='GET', params={}, headers=None, body=None, config={}):
+                started = time.perf_counter()
+                try:
+                    response = await fetch2(path, api, method, params, headers, body, config)
+                except Exception as e:
+                    self._append(client, self._entry(path, api, method, params, started, error=e))
+                    raise
+                self._append(client, self._entry(path, api, method, params, started, response))
+                return response
+        else:
+            @functools.wraps(fetch2)
+            def recording_fetch2(path, api='public', method='GET', params={}, headers=None, body=None, config={}):
+                started = time.perf_counter()
+                try:
+                    response = fetch2(path, api, method, params, headers, body, config)
+                except Exception as e:
+                    self._append(client, self._entry(path, api, method, params, started, error=e))
+                    raise
+                self._append(client, self._entry(path, api, method, params, started, response))
+                return response
+        client.fetch2 = recording_fetch2
+        return client
+
+
+class Cassette:
+    """Các bản ghi của một sàn, tra theo request đầy đủ rồi theo endpoint; phát lại xoay vòng."""
+
+    def __init__(self, directory, exchange_id):
+        self.exchange_id = exchange_id
+        self._lock = threading.Lock()
+        self._by_request = {}
+        self._by_endpoint = {}
+        self._cursor = {}
+        self.markets = None
+        path = _cassette_path(directory, exchange_id)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    entry = json.loads(line)
+                    api, p, method = entry['api'], entry['path'], entry['method']
+                    self._by_request.setdefault(request_key(api, p, method, entry.get('params')), []).append(entry)
+                    self._by_endpoint.setdefault(endpoint_key(api, p, method), []).append(entry)
+        markets_path = _markets_path(directory, exchange_id)
+        if os.path.exists(markets_path):
+            with open(markets_path, 'r', encoding='utf-8') as f:
+                self.markets = json.load(f)
+
+    def __len__(self):
+        return sum(len(v) for v in self._by_request.values())
+
+    def next(self, api, path, method, params):
+        key = request_key(api, path, method, params)
+        entries = self._by_request.get(key)
+        if not entries:
+            key = endpoint_key(api, path, method)
+            entries = self._by_endpoint.get(key)
+        if not entries:
+            # BadRequest: lỗi không retry, để thiếu bản ghi lộ ra ngay thay vì bị retry
+            raise ccxt.BadRequest(f"{self.exchange_id}: no recorded response for {method} {api} {path}")
+        with self._lock:
+            i = self._cursor.get(key, 0)
+            self._cursor[key] = i + 1
+        return entries[i % len(entries)]
+
+
+class LatencyModel:
+    """Latency giả lập: theo bản ghi (nhân hệ số) hoặc cố định ± jitter (ms)."""
+
+    def __init__(self, spec=REPLAY_LATENCY, scale=REPLAY_LATENCY_SCALE):
+        self.recorded = spec == 'recorded'
+        self.fixed_ms = 0.0
+        self.jitter_ms = 0.0
+        if not self.recorded:
+            fixed, _, jitter = str(spec).partition(':')
+            self.fixed_ms = float(fixed or 0)
+            self.jitter_ms = float(jitter or 0)
+        self.scale = scale
+
+    def seconds(self, entry):
+        ms = float(entry.get('latencyMs') or 0) if self.recorded else self.fixed_ms
+        if self.jitter_ms:
+            ms += random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, ms * self.scale / 1000)
+
+
+def _replay_result(entry):
+    if 'error' in entry:
+        error_class = getattr(ccxt, entry['error'], None)
+        if not (isinstance(error_class, type) and issubclass(error_class, Exception)):
+            error_class = ccxt.ExchangeError
+        raise error_class(entry.get('message', entry['error']))
+    return entry.get('response')
+
+
+class ReplayBackend:
+    """
+    Thay fetch2 của client ccxt bằng bản phát lại từ cassette, có giả lập latency.
+    Client vẫn là class ccxt thật nên các method unified (parse position, ticker, balance...)
+    chạy như khi gọi sàn thật; chỉ REST được phát lại, watch_* của ccxt.pro thì không.
+    """
+
+    def __init__(self, directory, latency=None):
+        self.directory = directory
+        self.latency = latency or LatencyModel()
+        self._lock = threading.Lock()
+        self._cassettes = {}
+
+    def cassette(self, exchange_id):
+        with self._lock:
+            cassette = self._cassettes.get(exchange_id)
+            if cassette is None:
+                cassette = Cassette(self.directory, exchange_id)
+                self._cassettes[exchange_id] = cassette
+        return cassette
+
+    def credentials(self, credentials):
+        """Credential giả (đủ để ccxt không báo thiếu key) thay cho key thật."""
+        return {k: REPLAY_CREDENTIALS.get(k, 'replay') for k in credentials}
+
+    def attach(self, client, is_async=False):
+        cassette = self.cassette(client.id)
+        if cassette.markets and not getattr(client, 'markets', None):
+            client.set_markets(cassette.markets['markets'], cassette.markets.get('currencies') or None)
+        latency = self.latency
+        if is_async:
+            async def replay_fetch2(path, api='public', method='GET', params={}, headers=None, body=None, config={}):
+                await client.throttle(client.calculate_rate_limiter_cost(api, method, path, params, config))
+                entry = cassette.next(api, path, method, params)
+                await asyncio.sleep(latency.seconds(entry))
+                return _replay_result(entry)
+        else:
+            def replay_fetch2(path, api='public', method='GET', params={}, headers=None, body=None, config={}):
+                client.throttle(client.calculate_rate_limiter_cost(api, method, path, params, config))
+                entry = cassette.next(api, path, method, params)
+                time.sleep(latency.seconds(entry))
+                return _replay_result(entry)
+        client.fetch2 = replay_fetch2
+        return client
+
+
+exchange_recorder = ExchangeRecorder(RECORD_DIR) if RECORD_DIR else None
+replay_backend = ReplayBackend(REPLAY_DIR) if REPLAY_DIR else None
@@ -0,0 +1,113 @@
+import asyncio
+import functools
+import threading
+
+# Các method đọc của ccxt được gộp khi gọi trùng lúc (cả tên snake_case lẫn camelCase)
+COALESCED_METHODS = (
+    ('fetch_positions', 'fetchPositions'),
+    ('fetch_ticker', 'fetchTicker'),
+    ('fetch_tickers', 'fetchTickers'),
+    ('fetch_balance', 'fetchBalance'),
+    ('fetch_funding_rate', 'fetchFundingRate'),
+    ('fetch_funding_rate_history', 'fetchFundingRateHistory'),
+    ('fetch_funding_history', 'fetchFundingHistory'),
+)
+
+
+def call_key(name, args, kwargs):
+    return repr((name, args, sorted(kwargs.items())))
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Gộp các lời gọi giống nhau đang chạy đồng thời (giữa các thread): lời gọi đầu tiên
+    thực sự chạy, các lời gọi cùng key chờ và nhận chung kết quả/exception.
+    Không cache: khi lời gọi xong, lần gọi kế tiếp lại chạy mới.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+            else:
+                self.shared += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+
+class AsyncSingleFlight:
+    """Bản asyncio của SingleFlight: các coroutine cùng key await chung một task."""
+
+    def __init__(self):
+        self._tasks = {}
+        self.executed = 0
+        self.shared = 0
+
+    async def do(self, key, func, *args, **kwargs):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._tasks[key] = task
+            self.executed += 1
+            task.add_done_callback(lambda _t, k=key: self._tasks.pop(k, None))
+        else:
+            self.shared += 1
+        # shield: một caller bị huỷ không huỷ request mà các caller khác đang chờ
+        return await asyncio.shield(task)
+
+
+def coalesce_reads(client, is_async=False):
+    """
+    Bọc các method đọc (positions, ticker, balance, funding) của client ccxt bằng single-flight,
+    để các request song song trong cùng process dùng chung một request lên sàn.
+    Kết quả được trả chung cho mọi caller nên caller không được sửa tại chỗ.
+    """
+    flight = AsyncSingleFlight() if is_async else SingleFlight()
+    for names in COALESCED_METHODS:
+        method = getattr(client, names[0], None)
+        if method is None:
+            continue
+        if is_async:
+            @functools.wraps(method)
+            async def wrapper(*args, _method=method, _name=names[0], **kwargs):
+                return await flight.do(call_key(_name, args, kwargs), _method, *args, **kwargs)
+        else:
+            @functools.wraps(method)
+            def wrapper(*args, _method=method, _name=names[0], **kwargs):
+                return flight.do(call_key(_name, args, kwargs), _method, *args, **kwargs)
+        for name in names:
+            setattr(client, name, wrapper)
+    client.single_flight = flight
+    return flight
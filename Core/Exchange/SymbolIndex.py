@@ -0,0 +1,155 @@
+import threading
+
+from Core.Exchange.MarketCache import market_cache
+
+QUOTE = "USDT"
+
+# ccxt id / tên cấu hình -> tên sàn dùng trong index
+EXCHANGE_NAMES = {
+    'bitget': 'bitget',
+    'bitget_sub': 'bitget',
+    'gate': 'gate',
+    'gateio': 'gate',
+    'binance': 'binance',
+    'binanceusdm': 'binance',
+}
+
+# Base nội bộ -> base trên từng sàn khi sàn niêm yết dưới tên khác (VD: OMNI là OMNI1 trên Bitget)
+SYMBOL_ALIASES = {
+    'bitget': {'OMNI': 'OMNI1'},
+}
+
+
+class SymbolEntry:
+    __slots__ = ('base', 'exchange', 'market_id', 'symbol', 'exchange_base')
+
+    def __init__(self, base, exchange, market_id, symbol, exchange_base):
+        self.base = base                    # base nội bộ, VD: OMNI
+        self.exchange = exchange            # tên sàn trong index
+        self.market_id = market_id          # id trên sàn, VD: OMNI1USDT / OMNI_USDT
+        self.symbol = symbol                # ccxt symbol, VD: OMNI1/USDT:USDT
+        self.exchange_base = exchange_base  # base trên sàn, VD: OMNI1
+
+    def __repr__(self):
+        return f"SymbolEntry(base={self.base}, exchange={self.exchange}, id={self.market_id}, symbol={self.symbol})"
+
+
+def exchange_name_of(exchange):
+    """Chuẩn hoá tên sàn (ccxt id, tên cấu hình hoặc client ccxt) về tên dùng trong index."""
+    if hasattr(exchange, 'id'):
+        exchange = exchange.id
+    name = str(exchange or '').lower()
+    return EXCHANGE_NAMES.get(name, name)
+
+
+def parse_base(symbol):
+    """Tách base từ mọi dạng symbol: BTC/USDT:USDT, BTC/USDT, BTC_USDT, BTCUSDT, BTC."""
+    s = (symbol or '').upper().strip()
+    if ':' in s:
+        s = s.split(':', 1)[0]
+    if '/' in s:
+        return s.split('/', 1)[0]
+    if s.endswith('_' + QUOTE):
+        return s[:-len(QUOTE) - 1]
+    if s.endswith(QUOTE) and len(s) > len(QUOTE):
+        return s[:-len(QUOTE)]
+    return s
+
+
+class SymbolIndex:
+    """
+    Index symbol chuẩn cho các hợp đồng USDT-M perpetual, dựng từ markets đã load.
+    Mỗi base nội bộ -> market id, ccxt symbol và alias trên từng sàn, tra cứu O(1).
+    Index được dựng lại mỗi khi MarketCache làm mới markets; symbol chưa có trong index
+    được suy ra bằng parse chuỗi một lần rồi ghi nhớ.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}      # (exchange, base nội bộ) -> SymbolEntry
+        self._base_lookup = {}  # dạng symbol bất kỳ (upper) -> base nội bộ
+        self._indexed = {}      # exchange -> timestamp snapshot đã index
+
+    def rebuild(self, exchange, markets, snapshot_ts=None):
+        name = exchange_name_of(exchange)
+        reverse_alias = {v: k for k, v in SYMBOL_ALIASES.get(name, {}).items()}
+        entries = {}
+        lookup = {}
+        for market in (markets or {}).values():
+            if not isinstance(market, dict):
+                continue
+            if not market.get('swap') or market.get('settle') != QUOTE or market.get('quote') != QUOTE:
+                continue
+            exchange_base = str(market.get('base') or '').upper()
+            if not exchange_base:
+                continue
+            base = reverse_alias.get(exchange_base, exchange_base)
+            entry = SymbolEntry(base, name, market.get('id'), market.get('symbol'), exchange_base)
+            entries[(name, base)] = entry
+            for key in (entry.market_id, entry.symbol, f"{exchange_base}/{QUOTE}", f"{exchange_base}{QUOTE}",
+                        f"{exchange_base}_{QUOTE}", f"{base}{QUOTE}", f"{base}/{QUOTE}:{QUOTE}"):
+                if key:
+                    lookup[str(key).upper()] = base
+        with self._lock:
+            self._entries = {k: v for k, v in self._entries.items() if k[0] != name}
+            self._entries.update(entries)
+            self._base_lookup.update(lookup)
+            self._indexed[name] = snapshot_ts
+        return len(entries)
+
+    def ensure(self, client):
+        """Dựng index từ markets của client nếu sàn này chưa được index."""
+        name = exchange_name_of(client)
+        if name not in self._indexed and getattr(client, 'markets', None):
+            self.rebuild(name, client.markets)
+
+    def on_markets(self, exchange_id, snapshot):
+        name = exchange_name_of(exchange_id)
+        ts = snapshot.get('timestamp')
+        if self._indexed.get(name) == ts and ts is not None:
+            return
+        self.rebuild(name, snapshot.get('markets'), ts)
+
+    def base(self, symbol):
+        """Base nội bộ của symbol ở bất kỳ dạng nào (OMNI1/USDT:USDT -> OMNI)."""
+        key = (symbol or '').upper()
+        base = self._base_lookup.get(key)
+        if base is None:
+            base = parse_base(key)
+            with self._lock:
+                self._base_lookup[key] = base
+        return base
+
+    def entry(self, exchange, symbol):
+        """SymbolEntry của symbol trên sàn, hoặc None nếu sàn không niêm yết."""
+        return self._entries.get((exchange_name_of(exchange), self.base(symbol)))
+
+    def ccxt_symbol(self, exchange, symbol):
+        """ccxt swap symbol trên sàn (VD: BTCUSDT -> BTC/USDT:USDT, OMNI trên Bitget -> OMNI1/USDT:USDT)."""
+        entry = self.entry(exchange, symbol)
+        if entry is not None:
+            return entry.symbol
+        name = exchange_name_of(exchange)
+        base = SYMBOL_ALIASES.get(name, {}).get(self.base(symbol), self.base(symbol))
+        return f"{base}/{QUOTE}:{QUOTE}"
+
+    def market_id(self, exchange, symbol):
+        """Market id trên sàn (VD: BTC_USDT trên Gate, BTCUSDT trên Bitget/Binance)."""
+        entry = self.entry(exchange, symbol)
+        if entry is not None:
+            return entry.market_id
+        name = exchange_name_of(exchange)
+        base = SYMBOL_ALIASES.get(name, {}).get(self.base(symbol), self.base(symbol))
+        return f"{base}_{QUOTE}" if name == 'gate' else f"{base}{QUOTE}"
+
+    def internal(self, symbol):
+        """Symbol nội bộ dạng BTCUSDT (dùng trong Position)."""
+        return f"{self.base(symbol)}{QUOTE}"
+
+    def swap_symbol(self, symbol):
+        """ccxt swap symbol chung, không theo alias của sàn (VD: BTCUSDT -> BTC/USDT:USDT)."""
+        return f"{self.base(symbol)}/{QUOTE}:{QUOTE}"
+
+
+symbol_index = SymbolIndex()
+market_cache.add_listener(symbol_index.on_markets)
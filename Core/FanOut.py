@@ -0,0 +1,133 @@
+import asyncio
+import inspect
+import os
+import threading
+from concurrent.futures import Future, wait
+
+FANOUT_TIMEOUT = float(os.getenv("FANOUT_TIMEOUT", "20"))   # seconds cho cả lượt fan-out
+
+
+class FanOutTimeout(Exception):
+    """Một nhánh fan-out không xong trước timeout."""
+
+
+def _spawn(call):
+    """
+    Chạy `call` trên một daemon thread riêng, trả về Future. Không dùng pool cố định: lời gọi
+    ccxt bị treo không thể huỷ từ bên ngoài, nếu giữ worker của pool chung thì sau vài lần
+    timeout các lượt fan-out sau sẽ xếp hàng chờ và timeout theo.
+    """
+    future = Future()
+    future.set_running_or_notify_cancel()
+
+    def _run():
+        try:
+            future.set_result(call())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=_run, name="fanout", daemon=True).start()
+    return future
+
+
+class FanOutResult:
+    """
+    Kết quả fan-out theo đúng thứ tự các lời gọi: values[i] là kết quả (None nếu lỗi),
+    errors[i] là exception (None nếu thành công, FanOutTimeout nếu quá hạn).
+    """
+
+    __slots__ = ('values', 'errors')
+
+    def __init__(self, values, errors):
+        self.values = values
+        self.errors = errors
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __repr__(self):
+        return f"FanOutResult(values={self.values}, errors={self.errors})"
+
+    @property
+    def complete(self):
+        return all(e is None for e in self.errors)
+
+    @property
+    def partial(self):
+        return not self.complete and any(e is None for e in self.errors)
+
+    def ok(self, i):
+        return self.errors[i] is None
+
+    def value(self, i, default=None):
+        return self.values[i] if self.errors[i] is None else default
+
+    def raise_first(self):
+        """Raise lỗi đầu tiên (nếu có), ngược lại trả về values."""
+        for error in self.errors:
+            if error is not None:
+                raise error
+        return self.values
+
+
+def fan_out(calls, timeout=FANOUT_TIMEOUT):
+    """
+    Chạy đồng thời các hàm không tham số (VD: lambda gọi tracker của từng sàn), mỗi hàm một thread.
+    Thời gian chờ bằng nhánh chậm nhất (tối đa `timeout` giây); nhánh lỗi/quá hạn không làm
+    mất kết quả của nhánh khác. Phần tử None trong `calls` cho kết quả None.
+
+    Lưu ý: nhánh quá hạn KHÔNG bị dừng, thread của nó chạy tiếp tới khi lời gọi ccxt tự trả về
+    (giới hạn bởi timeout của client ccxt), kết quả muộn bị bỏ qua.
+    """
+    futures = [_spawn(call) if call is not None else None for call in calls]
+    wait([f for f in futures if f is not None], timeout=timeout)
+    values, errors = [], []
+    for future in futures:
+        if future is None:
+            values.append(None)
+            errors.append(None)
+        elif not future.done():
+            # Thread vẫn chạy tiếp ở background (không huỷ được), kết quả muộn bị bỏ qua
+            values.append(None)
+            errors.append(FanOutTimeout(f"no result after {timeout}s"))
+        elif future.exception() is not None:
+            values.append(None)
+            errors.append(future.exception())
+        else:
+            values.append(future.result())
+            errors.append(None)
+    return FanOutResult(values, errors)
+
+
+async def fan_out_async(calls, timeout=FANOUT_TIMEOUT):
+    """
+    Bản async của fan_out: mỗi phần tử là coroutine function không tham số, coroutine/awaitable
+    hoặc hàm sync (chạy trên thread riêng như fan_out). Các nhánh chạy bằng gather; coroutine
+    quá hạn bị huỷ, còn hàm sync quá hạn vẫn chạy tiếp trong thread của nó (chỉ bị bỏ kết quả).
+    """
+    async def _run(call):
+        if call is None:
+            return None
+        if inspect.iscoroutinefunction(call):
+            awaitable = call()
+        elif inspect.isawaitable(call):
+            awaitable = call
+        else:
+            awaitable = asyncio.wrap_future(_spawn(call))
+        try:
+            return await asyncio.wait_for(awaitable, timeout=timeout)
+        except asyncio.TimeoutError:
+            raise FanOutTimeout(f"no result after {timeout}s")
+
+    outcomes = await asyncio.gather(*(_run(call) for call in calls), return_exceptions=True)
+    values, errors = [], []
+    for outcome in outcomes:
+        if isinstance(outcome, BaseException):
+            if isinstance(outcome, asyncio.CancelledError):
+                raise outcome
+            values.append(None)
+            errors.append(outcome)
+        else:
+            values.append(outcome)
+            errors.append(None)
+    return FanOutResult(values, errors)
@@ -0,0 +1,136 @@
+import asyncio
+import inspect
+import random
+import time
+
+import ccxt
+
+from Core.Exchange.Metrics import exchange_metrics, failed_request_scope
+
+# Lỗi tạm thời: retry (mất kết nối, timeout, 429, sàn bảo trì)
+RETRYABLE_ERRORS = (
+    ccxt.NetworkError,  # gồm RequestTimeout, ExchangeNotAvailable, DDoSProtection, RateLimitExceeded
+)
+
+# Lỗi chắc chắn lặp lại nếu gọi lại y hệt: fail fast
+FATAL_ERRORS = (
+    ccxt.InvalidOrder,
+    ccxt.InsufficientFunds,
+    ccxt.AuthenticationError,
+    ccxt.PermissionDenied,
+    ccxt.AccountSuspended,
+    ccxt.BadSymbol,
+    ccxt.BadRequest,
+    ccxt.ArgumentsRequired,
+    ccxt.NotSupported,
+    ValueError,
+    TypeError,
+)
+
+DEFAULT_BASE_DELAY = 0.2  # seconds
+DEFAULT_MAX_DELAY = 10    # seconds
+
+
+class RetryError(Exception):
+    """Hết số lần thử hoặc hết deadline; `last_error` là lỗi của lần thử cuối."""
+
+    def __init__(self, message, last_error=None, attempts=0):
+        super().__init__(message)
+        self.last_error = last_error
+        self.attempts = attempts
+
+
+def is_retryable(error):
+    """
+    Phân loại lỗi: lỗi mạng/rate limit của ccxt -> retry, lỗi nghiệp vụ (InvalidOrder,
+    InsufficientFunds, auth, symbol sai...) -> không retry. Lỗi khác (VD: Exception dùng để
+    chờ trạng thái trong Transfer) vẫn được retry như try_this cũ.
+    """
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    return not isinstance(error, FATAL_ERRORS)
+
+
+def backoff_delay(attempt, base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY):
+    """Exponential backoff với equal jitter: [d/2, d] với d = min(max_delay, base * 2^attempt)."""
+    delay = min(float(max_delay), float(base_delay) * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _describe(func):
+    return getattr(func, '__name__', repr(func))
+
+
+class _Attempts:
+    """Trạng thái chung của retry_call / retry_call_async: đếm lần thử, tính delay, kiểm tra deadline."""
+
+    def __init__(self, func, log_func, retries, base_delay, max_delay, deadline):
+        self.name = _describe(func)
+        self.exchange = getattr(getattr(func, '__self__', None), 'id', None) or 'local'
+        self.log_func = log_func or (lambda _m: None)
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline_at = time.monotonic() + deadline if deadline is not None else None
+        self.attempt = 0
+
+    def next_delay(self, error, failed_request=None):
+        """
+        Số giây chờ trước lần thử kế tiếp, hoặc raise nếu không được thử nữa. failed_request là
+        (sàn, endpoint) của request REST lỗi trong lần thử này (retry được ghi vào đúng endpoint đó).
+        """
+        self.attempt += 1
+        self.log_func(f"Attempt {self.attempt} of {self.name} failed: {error}")
+        if not is_retryable(error):
+            self.log_func(f"{self.name}: non-retryable {type(error).__name__}, giving up")
+            raise error
+        if self.retries is not None and self.attempt >= self.retries:
+            self.log_func("All attempts failed")
+            raise RetryError(f"All attempts failed: {self.name}", error, self.attempt) from error
+        exchange_metrics.record_retry(*(failed_request or (self.exchange, self.name)))
+        delay = backoff_delay(self.attempt - 1, self.base_delay, self.max_delay)
+        if self.deadline_at is not None:
+            remaining = self.deadline_at - time.monotonic()
+            if remaining <= delay:
+                self.log_func(f"{self.name}: deadline exceeded after {self.attempt} attempts")
+                raise RetryError(f"Deadline exceeded: {self.name}", error, self.attempt) from error
+        return delay
+
+
+def retry_call(func, params=None, log_func=None, retries=5, base_delay=DEFAULT_BASE_DELAY,
+               max_delay=DEFAULT_MAX_DELAY, deadline=None):
+    """
+    Gọi func(**params) với exponential backoff + jitter.
+    - retries: số lần thử tối đa (None = không giới hạn, khi đó nên đặt deadline)
+    - deadline: tổng thời gian tối đa (giây) cho mọi lần thử
+    Lỗi không retry được raise ngay; hết lượt/deadline raise RetryError.
+    """
+    params = params or {}
+    attempts = _Attempts(func, log_func, retries, base_delay, max_delay, deadline)
+    while True:
+        with failed_request_scope() as failed:
+            try:
+                return func(**params)
+            except Exception as e:
+                delay = attempts.next_delay(e, failed[0])
+        time.sleep(delay)
+
+
+async def retry_call_async(func, params=None, log_func=None, retries=5, base_delay=DEFAULT_BASE_DELAY,
+                           max_delay=DEFAULT_MAX_DELAY, deadline=None):
+    """
+    Bản async của retry_call: chờ bằng asyncio.sleep. func có thể là coroutine function
+    (client ccxt.async_support/pro) hoặc hàm sync (chạy trong thread để không chặn event loop).
+    """
+    params = params or {}
+    attempts = _Attempts(func, log_func, retries, base_delay, max_delay, deadline)
+    is_coroutine = inspect.iscoroutinefunction(func)
+    while True:
+        with failed_request_scope() as failed:
+            try:
+                if is_coroutine:
+                    return await func(**params)
+                return await asyncio.to_thread(func, **params)
+            except Exception as e:
+                delay = attempts.next_delay(e, failed[0])
+        await asyncio.sleep(delay)
@@ -6,6 +6,8 @@ import importlib
 
 import requests
 
+from Core.Retry import retry_call, DEFAULT_BASE_DELAY
+
 # Lấy discord_config_path an toàn từ Define, có fallback
 try:
     DefineModule = importlib.import_module("Define")
@@ -56,19 +58,12 @@ def clear_console():
 def try_this(func, params, log_func, retries=5, delay=10):
     """
     Retry a function with specified parameters up to a number of retries.
+    Delegates to Core.Retry.retry_call: exponential backoff with jitter capped at `delay`
+    seconds, fail fast on non-retryable ccxt errors (InvalidOrder, InsufficientFunds, ...).
     """
     log_func(f"Try {func.__name__}: {params}, retries: {retries}, delay: {delay} seconds")
-    if params is None:
-        params = {}
-    for attempt in range(retries):
-        try:
-            return func(**params)
-        except Exception as e:
-            log_func(f"Attempt {attempt + 1} failed: {e}")
-            if attempt < retries - 1:
-                time.sleep(delay)
-    log_func("All attempts failed")
-    raise Exception("All attempts failed")
+    return retry_call(func, params, log_func, retries=retries,
+                      base_delay=min(DEFAULT_BASE_DELAY, delay), max_delay=delay)
 
 def write_log(message, filename):
     """
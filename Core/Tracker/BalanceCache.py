@@ -0,0 +1,135 @@
+import asyncio
+import os
+import threading
+import time
+
+from Core.Exchange.ExchangeRegistry import _credential_fingerprint
+from Core.Exchange.SingleFlight import SingleFlight, AsyncSingleFlight
+
+DEFAULT_MAX_AGE = float(os.getenv("BALANCE_MAX_AGE", "10"))  # seconds
+# Quá tỉ lệ này của max_age thì vẫn trả bản cache nhưng làm mới ở background
+REFRESH_AHEAD = float(os.getenv("BALANCE_REFRESH_AHEAD", "0.5"))
+
+
+class BalanceCache:
+    """
+    Cache AccountBalance theo (sàn, API key), dùng chung cho mọi tracker (sync/async/stream) trong process.
+    - get(tracker, max_age): người gọi nêu độ cũ tối đa chấp nhận được (giây); bản cache còn hạn
+      được trả ngay từ bộ nhớ, quá REFRESH_AHEAD * max_age thì làm mới ở background.
+    - max_age=0 (hoặc cache đã quá hạn) -> đọc lại từ sàn; mọi người gọi cùng lúc chờ chung
+      đúng một lời gọi upstream.
+    - invalidate() tăng generation: kết quả của lần đọc bắt đầu trước đó (VD: refresh background
+      đang chạy lúc chuyển tiền) không được ghi vào cache và không được chia cho người gọi sau.
+    """
+
+    def __init__(self, refresh_ahead=REFRESH_AHEAD):
+        self.refresh_ahead = refresh_ahead
+        self._lock = threading.Lock()
+        self._entries = {}          # key -> (AccountBalance, time.monotonic() lúc lấy)
+        self._refreshing = set()
+        self._epoch = 0             # tăng khi invalidate() toàn bộ
+        self._generations = {}      # key -> số lần invalidate(tracker) riêng
+        self._flight = SingleFlight()
+        self._flight_async = AsyncSingleFlight()
+
+    @staticmethod
+    def key_of(tracker):
+        client = tracker.client
+        return client.id, _credential_fingerprint({'apiKey': getattr(client, 'apiKey', None)})
+
+    def _cached(self, key, max_age):
+        """(balance, cần làm mới trước hạn) nếu bản cache còn hạn, ngược lại (None, False)."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or max_age <= 0:
+            return None, False
+        age = time.monotonic() - entry[1]
+        if age > max_age:
+            return None, False
+        return entry[0], age > max_age * self.refresh_ahead
+
+    def _generation(self, key):
+        with self._lock:
+            return self._epoch, self._generations.get(key, 0)
+
+    def _store(self, key, balance, generation):
+        with self._lock:
+            if generation == (self._epoch, self._generations.get(key, 0)):
+                self._entries[key] = (balance, time.monotonic())
+        return balance
+
+    def invalidate(self, tracker=None):
+        with self._lock:
+            if tracker is None:
+                self._entries.clear()
+                self._epoch += 1
+            else:
+                key = self.key_of(tracker)
+                self._entries.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+
+    # ---- sync -------------------------------------------------------------------------------
+
+    def _fetch(self, tracker, key, generation):
+        return self._store(key, tracker.get_cross_margin_account_info(), generation)
+
+    def _refresh_in_background(self, tracker, key):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def _run():
+            try:
+                generation = self._generation(key)
+                self._flight.do((key, generation), self._fetch, tracker, key, generation)
+            except Exception as e:
+                print(f"[WARN] background balance refresh failed for {key[0]}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=_run, name=f"BalanceRefresh-{key[0]}", daemon=True).start()
+
+    def get(self, tracker, max_age=DEFAULT_MAX_AGE):
+        key = self.key_of(tracker)
+        balance, refresh = self._cached(key, max_age)
+        if balance is not None:
+            if refresh:
+                self._refresh_in_background(tracker, key)
+            return balance
+        generation = self._generation(key)
+        return self._flight.do((key, generation), self._fetch, tracker, key, generation)
+
+    # ---- async ------------------------------------------------------------------------------
+
+    async def _fetch_async(self, tracker, key, generation):
+        return self._store(key, await tracker.get_cross_margin_account_info_async(), generation)
+
+    async def _refresh_async(self, tracker, key):
+        try:
+            generation = self._generation(key)
+            await self._flight_async.do((key, generation), self._fetch_async, tracker, key, generation)
+        except Exception as e:
+            print(f"[WARN] background balance refresh failed for {key[0]}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    async def get_async(self, tracker, max_age=DEFAULT_MAX_AGE):
+        """Bản async của get (tracker có get_cross_margin_account_info_async)."""
+        key = self.key_of(tracker)
+        balance, refresh = self._cached(key, max_age)
+        if balance is not None:
+            if refresh:
+                with self._lock:
+                    start = key not in self._refreshing
+                    self._refreshing.add(key)
+                if start:
+                    asyncio.ensure_future(self._refresh_async(tracker, key))
+            return balance
+        generation = self._generation(key)
+        return await self._flight_async.do((key, generation), self._fetch_async, tracker, key, generation)
+
+
+balance_cache = BalanceCache()
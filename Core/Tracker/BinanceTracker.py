@@ -0,0 +1,182 @@
+from Core.Define import PositionSide, Position, EXCHANGE
+from Core.Exchange.ContractSpec import contract_specs
+from Core.Exchange.SymbolIndex import symbol_index
+from Core.Tracker.FundingLedger import funding_ledger
+from Core.Tracker.TickerPrices import ticker_prices
+from Core.Tracker.Tracker import AccountBalance
+
+
+class BinanceTracker:
+    """
+    Tracker cho Binance USD-M (binanceusdm). `exchange` có thể là client ccxt sync (dùng các method
+    thường) hoặc ccxt.async_support (dùng các method *_async).
+    Bản stream (user-data stream qua listen key) là StreamingTracker bọc tracker này,
+    xem build_streaming_tracker.
+    """
+
+    def __init__(self, exchange):
+        self.client = exchange
+
+    def _price_from_payload(self, pos):
+        """Giá có sẵn trong payload position (markPrice), 0.0 nếu không có."""
+        for value in (pos.get('markPrice'), (pos.get('info', {}) or {}).get('markPrice')):
+            try:
+                if value not in (None, '', 0, '0'):
+                    price = float(value)
+                    if price > 0:
+                        return price
+            except Exception:
+                pass
+        return 0.0
+
+    def _price_from_ticker(self, ticker):
+        for key in ('last', 'mark', 'close', 'ask', 'bid'):
+            if key in ticker:
+                try:
+                    val = float(ticker[key])
+                    if val > 0:
+                        return val
+                except Exception:
+                    continue
+        info = ticker.get('info', {}) or {}
+        for key in ('markPrice', 'lastPrice'):
+            if key in info:
+                try:
+                    val = float(info[key])
+                    if val > 0:
+                        return val
+                except Exception:
+                    continue
+        return 0.0
+
+    def _ticker_symbol(self, symbol):
+        return symbol_index.ccxt_symbol('binance', symbol)
+
+    def _payload_prices(self, rows):
+        """Giá có sẵn trong payload cho từng row, kèm danh sách ccxt symbol còn thiếu giá."""
+        prices = [self._price_from_payload(pos) for pos, _ in rows]
+        missing = [self._ticker_symbol(symbol) for (_, symbol), price in zip(rows, prices) if price <= 0]
+        return prices, missing
+
+    def _build_positions(self, rows, prices, tickers, book=None):
+        # Giống Bitget/Gate: entry_price của Position là giá hiện tại
+        positions = [self._to_position(pos, symbol, price if price > 0 else tickers.get(self._ticker_symbol(symbol), 0.0))
+                     for (pos, symbol), price in zip(rows, prices)]
+        if book is not None:
+            self._fill_book(book, rows, positions)
+        return positions
+
+    def _fill_book(self, book, rows, positions):
+        """Ghi các position vừa dựng vào PositionBook (kèm contract size và giá vào lệnh thật)."""
+        for (pos, _), position in zip(rows, positions):
+            try:
+                entry = float(pos.get('entryPrice') or 0.0) or None
+            except (TypeError, ValueError):
+                entry = None
+            book.append_position(position, contract_specs.get(self.client, position.symbol).contract_size, entry)
+
+    def _position_rows(self, response):
+        """Lọc payload fetch_positions -> [(pos, symbol)] đang mở cần báo cáo."""
+        # fetch_positions đã load markets -> bảo đảm symbol index có dữ liệu của sàn
+        symbol_index.ensure(self.client)
+        rows = []
+        for pos in response:
+            try:
+                if float(pos.get('contracts') or 0.0) <= 0:
+                    continue
+            except (TypeError, ValueError):
+                continue
+            info = pos.get('info', {}) or {}
+            symbol = symbol_index.internal(info.get('symbol') or pos.get('symbol') or '')
+            if symbol.startswith("SXP"):
+                continue
+            rows.append((pos, symbol))
+        return rows
+
+    def _to_position(self, pos, symbol, entry_price):
+        side = PositionSide.LONG if str(pos.get('side', '')).upper() == 'LONG' else PositionSide.SHORT
+        try:
+            leverage = float(pos.get('leverage') or 0.0)
+        except Exception:
+            leverage = 0.0
+        position = Position(symbol=symbol, side=side, amount=float(pos.get('contracts') or 0.0),
+                            entry_price=entry_price, exchange=EXCHANGE.BINANCE, margin=leverage)
+        # positionRisk của Binance không có funding đã trả; tổng funding lấy qua get_paid_funding
+        return position
+
+    def get_open_positions(self, book=None):
+        """
+        Get all currently open positions on Binance USD-M Futures.
+        Positions thiếu mark price được lấy giá bằng một lần fetch_tickers (có cache ngắn hạn).
+        :return: List of open positions (Position objects)
+        """
+        rows = self._position_rows(self.client.fetch_positions())
+        prices, missing = self._payload_prices(rows)
+        tickers = ticker_prices.get_many(self.client, missing, self._price_from_ticker) if missing else {}
+        return self._build_positions(rows, prices, tickers, book)
+
+    async def get_open_positions_async(self, book=None):
+        """
+        Bản async của get_open_positions (client là ccxt.async_support).
+        """
+        rows = self._position_rows(await self.client.fetch_positions())
+        prices, missing = self._payload_prices(rows)
+        tickers = await ticker_prices.get_many_async(self.client, missing, self._price_from_ticker) if missing else {}
+        return self._build_positions(rows, prices, tickers, book)
+
+    def _to_account_balance(self, account_info):
+        # /fapi/v2/account: các tổng của cả tài khoản (cross margin)
+        info = account_info['info']
+        total_margin_balance = float(info['totalMarginBalance'])
+        total_initial_margin = float(info['totalInitialMargin'])
+        total_maint_margin = float(info['totalMaintMargin'])
+        available_balance = float(info['availableBalance'])
+        unrealized_pnl = float(info['totalUnrealizedProfit'])
+
+        account_balance = AccountBalance(total_margin_balance,
+                                         total_initial_margin,
+                                         total_maint_margin,
+                                         available_balance,
+                                         unrealized_pnl)
+        return account_balance
+
+    def get_cross_margin_account_info(self):
+        """
+        Fetch cross margin account information.
+        :return:
+        """
+        return self._to_account_balance(self.client.fetchBalance())
+
+    async def get_cross_margin_account_info_async(self):
+        return self._to_account_balance(await self.client.fetchBalance())
+
+    def _fetch_funding_range(self, symbol, start_time, end_time):
+        """Các khoản funding của symbol trong [start_time, end_time] (ms); Binance trả theo thứ tự tăng dần."""
+        entries = []
+        ccxt_symbol = symbol_index.ccxt_symbol('binance', symbol)
+        since = start_time
+        while since <= end_time:
+            funding_history = self.client.fetchFundingHistory(
+                symbol=ccxt_symbol,
+                since=since,
+                limit=1000,
+                params={
+                    'endTime': end_time,
+                }
+            )
+            if not funding_history:
+                break
+            entries += [f for f in funding_history if start_time <= (f.get('timestamp') or 0) <= end_time]
+            if len(funding_history) < 1000:
+                break
+            # Trang kế tiếp bắt đầu sau khoản cuối cùng
+            since = funding_history[-1].get("timestamp") + 1
+        return entries
+
+    def get_paid_funding(self, symbol, start_time):
+        """
+        Lấy tổng funding đã trả từ start_time cho đến hiện tại (từ funding ledger cục bộ,
+        chỉ tải thêm các khoản mới hơn lần đồng bộ trước).
+        """
+        return funding_ledger.total(self.client, symbol, start_time,
+                                    lambda start, end: self._fetch_funding_range(symbol, start, end))
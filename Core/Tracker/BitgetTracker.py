@@ -1,20 +1,24 @@
-import time
-
 from Core.Define import PositionSide, Position, EXCHANGE
+from Core.Exchange.ContractSpec import contract_specs
+from Core.Exchange.SymbolIndex import symbol_index
+from Core.Tracker.FundingLedger import funding_ledger
+from Core.Tracker.TickerPrices import ticker_prices
 from Core.Tracker.Tracker import AccountBalance
 
 
 class BitgetTracker:
+    """
+    Tracker cho Bitget USDT-M. `exchange` có thể là client ccxt sync (dùng các method thường)
+    hoặc ccxt.async_support (dùng các method *_async).
+    """
+
+    BALANCE_PARAMS = {'productType': 'USDT-FUTURES'}
 
     def __init__(self, exchange):
             self.client = exchange
 
-    def _get_current_price(self, symbol, pos):
-        """Lấy giá hiện tại của symbol.
-        Ưu tiên dùng dữ liệu có sẵn trong pos (markPrice / lastPrice) để tránh gọi mạng.
-        Nếu không có sẽ fetch_ticker từ sàn.
-        """
-        # Thử lấy từ dữ liệu position trước
+    def _price_from_payload(self, pos):
+        """Giá có sẵn trong payload position (markPrice / lastPrice / indexPrice), 0.0 nếu không có."""
         for key in ('markPrice', 'lastPrice', 'indexPrice'):
             try:
                 v = pos.get(key)
@@ -24,83 +28,116 @@ class BitgetTracker:
                         return price
             except Exception:
                 pass
-        # Nếu vẫn chưa có -> gọi ticker
-        try:
-            # Một số symbol dạng "BTC/USDT:USDT"; fetch_ticker có thể chấp nhận trực tiếp.
-            ticker = self.client.fetch_ticker(symbol)
-            for key in ('last', 'mark', 'close', 'ask', 'bid'):
-                if key in ticker:
-                    try:
-                        val = float(ticker[key])
-                        if val > 0:
-                            return val
-                    except Exception:
-                        continue
-            # fallback từ info
-            info = ticker.get('info', {}) or {}
-            for key in ('markPrice', 'lastPrice', 'close'):
-                if key in info:
-                    try:
-                        val = float(info[key])
-                        if val > 0:
-                            return val
-                    except Exception:
-                        continue
-        except Exception:
-            pass
         return 0.0
 
-    def get_open_positions(self):
-        """
-        Get all currently open positions on BitGet Futures.
-        :return: List of open positions (Position objects)
-        """
+    def _price_from_ticker(self, ticker):
+        for key in ('last', 'mark', 'close', 'ask', 'bid'):
+            if key in ticker:
+                try:
+                    val = float(ticker[key])
+                    if val > 0:
+                        return val
+                except Exception:
+                    continue
+        # fallback từ info
+        info = ticker.get('info', {}) or {}
+        for key in ('markPrice', 'lastPrice', 'close'):
+            if key in info:
+                try:
+                    val = float(info[key])
+                    if val > 0:
+                        return val
+                except Exception:
+                    continue
+        return 0.0
 
-        positions = []
-        response = self.client.fetch_positions()
-        positions_json = [pos for pos in response]
-        for pos in positions_json:
-            side = PositionSide.LONG if str(pos.get('side', '')).upper() == 'LONG' else PositionSide.SHORT
-            # Derive leverage safely
+    def _ticker_symbol(self, symbol):
+        return symbol_index.ccxt_symbol('bitget', symbol)
+
+    def _payload_prices(self, rows):
+        """Giá có sẵn trong payload cho từng row, kèm danh sách ccxt symbol còn thiếu giá."""
+        prices = [self._price_from_payload(pos) for pos, _ in rows]
+        missing = [self._ticker_symbol(symbol) for (_, symbol), price in zip(rows, prices) if price <= 0]
+        return prices, missing
+
+    def _build_positions(self, rows, prices, tickers, book=None):
+        # Thay vì lấy entryPrice (giá vào lệnh), yêu cầu: dùng current price hiện tại.
+        positions = [self._to_position(pos, symbol, price if price > 0 else tickers.get(self._ticker_symbol(symbol), 0.0))
+                     for (pos, symbol), price in zip(rows, prices)]
+        if book is not None:
+            self._fill_book(book, rows, positions)
+        return positions
+
+    def _fill_book(self, book, rows, positions):
+        """Ghi các position vừa dựng vào PositionBook (kèm contract size và giá vào lệnh thật)."""
+        for (pos, _), position in zip(rows, positions):
             try:
-                imp = pos.get('initialMarginPercentage')
-                leverage = 1.0 / float(imp) if imp not in (None, '', 0, '0') else 0.0
-            except Exception:
-                leverage = 0.0
+                entry = float(pos.get('entryPrice') or 0.0) or None
+            except (TypeError, ValueError):
+                entry = None
+            book.append_position(position, contract_specs.get(self.client, position.symbol).contract_size, entry)
+
+    def _position_rows(self, response):
+        """Lọc payload fetch_positions -> [(pos, symbol)] cần báo cáo."""
+        # fetch_positions đã load markets -> bảo đảm symbol index có dữ liệu của sàn
+        symbol_index.ensure(self.client)
+        rows = []
+        for pos in response:
             info = pos.get('info', {}) or {}
-            symbol = info.get('symbol') or pos.get('symbol') or ''
-            try:
-                contracts = float(pos.get('contracts') or 0.0)
-            except Exception:
-                contracts = 0.0
-            # Thay vì lấy entryPrice (giá vào lệnh), yêu cầu: dùng current price hiện tại.
-            try:
-                entry_price = self._get_current_price(symbol, pos)
-            except Exception:
-                entry_price = 0.0
-
-            position = Position(symbol=symbol, side=side, amount=contracts,
-                                entry_price=entry_price, exchange=EXCHANGE.BITGET, margin=leverage)
-
-            # total_paid_funding = self.get_paid_funding(symbol, pos['timestamp'])
+            # Symbol nội bộ dạng BTCUSDT (alias sàn như OMNI1 -> OMNI)
+            symbol = symbol_index.internal(info.get('symbol') or pos.get('symbol') or '')
             if symbol.startswith("SXP"):
                 continue
-            raw_total_fee = info.get('totalFee')
-            try:
-                total_paid_funding = float(raw_total_fee) if raw_total_fee not in (None, '') else 0.0
-            except Exception:
-                total_paid_funding = 0.0
-            position.set_paid_funding(total_paid_funding)
+            rows.append((pos, symbol))
+        return rows
 
-            positions.append(position)
-        return positions
-    def get_cross_margin_account_info(self):
+    def _to_position(self, pos, symbol, entry_price):
+        side = PositionSide.LONG if str(pos.get('side', '')).upper() == 'LONG' else PositionSide.SHORT
+        # Derive leverage safely
+        try:
+            imp = pos.get('initialMarginPercentage')
+            leverage = 1.0 / float(imp) if imp not in (None, '', 0, '0') else 0.0
+        except Exception:
+            leverage = 0.0
+        info = pos.get('info', {}) or {}
+        try:
+            contracts = float(pos.get('contracts') or 0.0)
+        except Exception:
+            contracts = 0.0
+
+        position = Position(symbol=symbol, side=side, amount=contracts,
+                            entry_price=entry_price, exchange=EXCHANGE.BITGET, margin=leverage)
+
+        # total_paid_funding = self.get_paid_funding(symbol, pos['timestamp'])
+        raw_total_fee = info.get('totalFee')
+        try:
+            total_paid_funding = float(raw_total_fee) if raw_total_fee not in (None, '') else 0.0
+        except Exception:
+            total_paid_funding = 0.0
+        position.set_paid_funding(total_paid_funding)
+        return position
+
+    def get_open_positions(self, book=None):
         """
-        Fetch cross margin account information and calculate ROI for each asset.
-        :return:
+        Get all currently open positions on BitGet Futures.
+        Positions thiếu mark/last price được lấy giá bằng một lần fetch_tickers (có cache ngắn hạn).
+        :return: List of open positions (Position objects)
+        """
+        rows = self._position_rows(self.client.fetch_positions())
+        prices, missing = self._payload_prices(rows)
+        tickers = ticker_prices.get_many(self.client, missing, self._price_from_ticker) if missing else {}
+        return self._build_positions(rows, prices, tickers, book)
+
+    async def get_open_positions_async(self, book=None):
         """
-        params = {'productType': 'USDT-FUTURES'}
-        account_info = self.client.fetchBalance(params)
+        Bản async của get_open_positions (client là ccxt.async_support).
+        """
+        rows = self._position_rows(await self.client.fetch_positions())
+        prices, missing = self._payload_prices(rows)
+        tickers = await ticker_prices.get_many_async(self.client, missing, self._price_from_ticker) if missing else {}
+        return self._build_positions(rows, prices, tickers, book)
+
+    def _to_account_balance(self, account_info):
         info = account_info['info'][0]
         total_margin_balance = float(info['unionTotalMargin'])
         total_initial_margin = float(info['accountEquity'])
@@ -115,38 +152,43 @@ class BitgetTracker:
                                          unrealized_pnl)
         return account_balance
 
-    def get_paid_funding(self, symbol, start_time):
+    def get_cross_margin_account_info(self):
         """
-        Lấy tổng funding đã trả từ start_time cho đến hiện tại.
+        Fetch cross margin account information and calculate ROI for each asset.
+        :return:
         """
-        total_paid = 0.0
-        end_time = self.client.milliseconds()
+        return self._to_account_balance(self.client.fetchBalance(dict(self.BALANCE_PARAMS)))
 
-        while True:
-            try:
-                funding_history = self.client.fetchFundingHistory(
-                    symbol=symbol,
-                    since=start_time,
-                    limit=100,
-                    params={
-                        'endTime':end_time,
-                    }
-                )
-            except Exception as e:
-                print(f"Lỗi lấy funding: {e}")
-                break
+    async def get_cross_margin_account_info_async(self):
+        return self._to_account_balance(await self.client.fetchBalance(dict(self.BALANCE_PARAMS)))
 
+    def _fetch_funding_range(self, symbol, start_time, end_time):
+        """Các khoản funding của symbol trong [start_time, end_time] (ms), đọc lùi từng trang."""
+        entries = []
+        ccxt_symbol = symbol_index.ccxt_symbol('bitget', symbol)
+        while True:
+            funding_history = self.client.fetchFundingHistory(
+                symbol=ccxt_symbol,
+                since=start_time,
+                limit=100,
+                params={
+                    'endTime': end_time,
+                }
+            )
             if not funding_history:
                 break
-
-            # Cộng funding
-            for f in funding_history:
-                total_paid += float(f.get("amount", 0))
+            entries += [f for f in funding_history if start_time <= (f.get('timestamp') or 0) <= end_time]
 
             # Lấy thời gian cuối cùng để tiếp tục
             end_time = funding_history[0].get("timestamp") - 1
+            if end_time < start_time:
+                break
+        return entries
 
-            # Chờ nhẹ để tránh bị rate limit
-            time.sleep(0.2)
-
-        return total_paid
\ No newline at end of file
+    def get_paid_funding(self, symbol, start_time):
+        """
+        Lấy tổng funding đã trả từ start_time cho đến hiện tại (từ funding ledger cục bộ,
+        chỉ tải thêm các khoản mới hơn lần đồng bộ trước).
+        """
+        return funding_ledger.total(self.client, symbol, start_time,
+                                    lambda start, end: self._fetch_funding_range(symbol, start, end))
@@ -0,0 +1,153 @@
+import os
+import threading
+import time
+
+from Core.Define import PositionSide, convert_exchange_to_name
+from Core.Exchange.ContractSpec import position_base_size
+from Core.Exchange.SymbolIndex import symbol_index
+
+# Cảnh báo khi |net exposure| của một coin vượt ngưỡng (USDT); hết cảnh báo khi về dưới ngưỡng * RESET_RATIO
+ALERT_THRESHOLD_USDT = float(os.getenv("EXPOSURE_ALERT_USDT", "200"))
+ALERT_RESET_RATIO = 0.8
+
+
+def _leg_key(exchange, position):
+    return exchange, position.symbol, position.side
+
+
+class ExposureAggregator:
+    """
+    Net exposure (delta) theo coin cơ sở trên mọi sàn, cập nhật tăng dần từ event position:
+    mỗi leg đóng góp +base (long) / -base (short) vào coin của nó, nên một thay đổi chỉ
+    trừ phần cũ và cộng phần mới của đúng leg đó (O(số leg thay đổi)).
+    - apply_positions(exchange, positions): snapshot đầy đủ của một sàn (tracker REST / stream);
+      apply_batch(...) cho snapshot của nhiều sàn trong cùng một lần refresh.
+    - snapshot(): trả từ bộ nhớ cho /exposure.
+    - Vượt ngưỡng (|net USDT| >= threshold) gọi các listener ngay trong lần cập nhật đó.
+    """
+
+    def __init__(self, threshold=ALERT_THRESHOLD_USDT, reset_ratio=ALERT_RESET_RATIO):
+        self.threshold = threshold
+        self.reset_ratio = reset_ratio
+        self._lock = threading.Lock()
+        self._legs = {}       # (exchange, symbol, side) -> (asset, signed base, price)
+        self._net = {}        # asset -> {exchange: [base, usdt, số leg]}
+        self._prices = {}     # asset -> giá gần nhất
+        self._alerting = set()
+        self._listeners = []
+        self.updated_at = 0.0
+
+    def add_listener(self, callback):
+        """callback(alert: dict) khi một coin vượt ngưỡng hoặc trở lại trong ngưỡng."""
+        self._listeners.append(callback)
+
+    # ---- cập nhật -----------------------------------------------------------------------------
+
+    def _add(self, asset, exchange, base, price, sign):
+        per_exchange = self._net.setdefault(asset, {})
+        totals = per_exchange.setdefault(exchange, [0.0, 0.0, 0])
+        totals[0] += sign * base
+        totals[1] += sign * base * price
+        totals[2] += int(sign)
+        if totals[2] <= 0:
+            # Không còn leg nào của coin trên sàn này: bỏ để tránh sai số cộng dồn
+            del per_exchange[exchange]
+            if not per_exchange:
+                del self._net[asset]
+
+    def _set_leg(self, key, leg):
+        """Thay đóng góp của một leg (leg=None: leg đã đóng). Trả về asset bị ảnh hưởng."""
+        old = self._legs.pop(key, None)
+        if old is not None:
+            self._add(old[0], key[0], old[1], old[2], -1)
+        if leg is not None:
+            self._legs[key] = leg
+            self._add(leg[0], key[0], leg[1], leg[2], 1)
+            self._prices[leg[0]] = leg[2]
+        return (leg or old)[0] if (leg or old) else None
+
+    def apply_positions(self, exchange, positions, base_sizes=None):
+        """
+        Áp snapshot position của một sàn (EXCHANGE hoặc tên sàn). base_sizes (tuỳ chọn) là
+        lượng coin cơ sở tương ứng từng position; mặc định tính theo contract specs.
+        """
+        self.apply_batch([(exchange, positions, base_sizes)])
+
+    def apply_batch(self, snapshots):
+        """
+        Áp snapshot của nhiều sàn cùng một lần refresh ([(exchange, positions, base_sizes)]);
+        cảnh báo chỉ được xét một lần sau khi mọi sàn đã áp (cặp hedge mới mở không báo lệch giả).
+        """
+        per_exchange = {}
+        for exchange, positions, base_sizes in snapshots:
+            name = exchange if isinstance(exchange, str) else convert_exchange_to_name(exchange)
+            current = per_exchange.setdefault(name, {})
+            for i, pos in enumerate(positions):
+                base = float(base_sizes[i]) if base_sizes is not None else position_base_size(pos)
+                sign = 1.0 if pos.side == PositionSide.LONG else -1.0
+                current[_leg_key(name, pos)] = (symbol_index.base(pos.symbol), sign * base,
+                                                float(pos.entry_price or 0.0))
+        changed = set()
+        with self._lock:
+            for name, current in per_exchange.items():
+                for key in [k for k in self._legs if k[0] == name and k not in current]:
+                    changed.add(self._set_leg(key, None))
+                for key, leg in current.items():
+                    if self._legs.get(key) != leg:
+                        changed.add(self._set_leg(key, leg))
+            changed.discard(None)
+            self.updated_at = time.time()
+            alerts = [a for a in (self._check(asset) for asset in changed) if a is not None]
+        for alert in alerts:
+            for callback in self._listeners:
+                try:
+                    callback(alert)
+                except Exception as e:
+                    print(f"[WARN] exposure alert listener failed: {e}")
+
+    def _totals(self, asset):
+        per_exchange = self._net.get(asset, {})
+        base = sum(v[0] for v in per_exchange.values())
+        usdt = sum(v[1] for v in per_exchange.values())
+        return base, usdt
+
+    def _check(self, asset):
+        """Alert khi coin vừa vượt ngưỡng / vừa trở lại an toàn (có hysteresis), ngược lại None."""
+        base, usdt = self._totals(asset)
+        exceeded = abs(usdt) >= self.threshold
+        if exceeded and asset not in self._alerting:
+            self._alerting.add(asset)
+            return {'asset': asset, 'status': 'exceeded', 'netBase': base, 'netUsdt': usdt,
+                    'threshold': self.threshold, 'timestamp': time.time()}
+        if asset in self._alerting and abs(usdt) < self.threshold * self.reset_ratio:
+            self._alerting.discard(asset)
+            return {'asset': asset, 'status': 'recovered', 'netBase': base, 'netUsdt': usdt,
+                    'threshold': self.threshold, 'timestamp': time.time()}
+        return None
+
+    # ---- truy vấn -----------------------------------------------------------------------------
+
+    def snapshot(self, asset=None):
+        """Net exposure theo coin (và theo sàn), coin lệch nhiều nhất (theo USDT) đứng trước."""
+        with self._lock:
+            assets = [asset] if asset is not None else list(self._net)
+            rows = []
+            for a in assets:
+                per_exchange = self._net.get(a)
+                if not per_exchange:
+                    continue
+                base, usdt = self._totals(a)
+                rows.append({
+                    'asset': a,
+                    'netBase': base,
+                    'netUsdt': round(usdt, 2),
+                    'price': self._prices.get(a, 0.0),
+                    'alert': a in self._alerting,
+                    'exchanges': {ex: {'base': v[0], 'usdt': round(v[1], 2)} for ex, v in per_exchange.items()},
+                })
+            updated_at = self.updated_at
+        rows.sort(key=lambda r: -abs(r['netUsdt']))
+        return {'updatedAt': updated_at, 'threshold': self.threshold, 'assets': rows}
+
+
+exposure = ExposureAggregator()
@@ -0,0 +1,143 @@
+import os
+import sqlite3
+import threading
+import time
+
+from Core.Exchange.ExchangeRegistry import _credential_fingerprint
+from Core.Exchange.SingleFlight import SingleFlight
+from Define import funding_ledger_path
+
+# Không gọi sàn lại nếu vừa đồng bộ xong trong khoảng này (funding chỉ trả mỗi 1-8h)
+SYNC_INTERVAL = int(os.getenv("FUNDING_LEDGER_SYNC_INTERVAL", "300"))  # seconds
+# Đọc lùi lại một đoạn trước high-water mark để không lỡ khoản funding được ghi trễ
+SYNC_OVERLAP_MS = 30 * 60 * 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS funding (
+    exchange TEXT NOT NULL,
+    account  TEXT NOT NULL,
+    symbol   TEXT NOT NULL,
+    ts       INTEGER NOT NULL,
+    entry_id TEXT NOT NULL,
+    amount   REAL NOT NULL,
+    PRIMARY KEY (exchange, account, symbol, ts, entry_id)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    exchange     TEXT NOT NULL,
+    account      TEXT NOT NULL,
+    symbol       TEXT NOT NULL,
+    covered_from INTEGER NOT NULL,
+    high_water   INTEGER NOT NULL,
+    synced_at    REAL NOT NULL,
+    PRIMARY KEY (exchange, account, symbol)
+);
+"""
+
+
+def _entry_id(entry):
+    """Id của khoản funding; sàn không trả id thì dùng (timestamp, amount) để chống ghi trùng."""
+    entry_id = entry.get('id')
+    if entry_id not in (None, ''):
+        return str(entry_id)
+    return f"{entry.get('timestamp')}:{entry.get('amount')}"
+
+
+class FundingLedger:
+    """
+    Sổ funding cục bộ (SQLite, data/funding_ledger.sqlite3) dùng chung cho mọi process.
+    Với mỗi (sàn, tài khoản, symbol) lưu mọi khoản funding đã nhận/trả cùng khoảng thời gian
+    đã đồng bộ [covered_from, high_water]; mỗi lần hỏi chỉ tải phần còn thiếu
+    (mới hơn high_water, hoặc cũ hơn covered_from) rồi cộng tổng từ dữ liệu cục bộ.
+    """
+
+    def __init__(self, path=funding_ledger_path, sync_interval=SYNC_INTERVAL):
+        self.path = path
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._conn = None
+        self._sync_flight = SingleFlight()
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def account_of(client):
+        return _credential_fingerprint({'apiKey': getattr(client, 'apiKey', None)})
+
+    # ---- đọc/ghi SQLite ---------------------------------------------------------------------
+
+    def _state(self, key):
+        with self._lock:
+            return self._connection().execute(
+                "SELECT covered_from, high_water, synced_at FROM sync_state "
+                "WHERE exchange=? AND account=? AND symbol=?", key).fetchone()
+
+    def _store(self, key, entries, covered_from, high_water):
+        rows = [key + (int(e.get('timestamp') or 0), _entry_id(e), float(e.get('amount') or 0.0))
+                for e in entries if e.get('timestamp') is not None]
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany("INSERT OR IGNORE INTO funding (exchange, account, symbol, ts, entry_id, amount) "
+                                 "VALUES (?, ?, ?, ?, ?, ?)", rows)
+                conn.execute("INSERT OR REPLACE INTO sync_state (exchange, account, symbol, covered_from, "
+                             "high_water, synced_at) VALUES (?, ?, ?, ?, ?, ?)",
+                             key + (covered_from, high_water, time.time()))
+
+    def _sum(self, key, start_time, end_time):
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT COALESCE(SUM(amount), 0) FROM funding "
+                "WHERE exchange=? AND account=? AND symbol=? AND ts>=? AND ts<=?",
+                key + (int(start_time), int(end_time))).fetchone()
+        return float(row[0])
+
+    # ---- đồng bộ ----------------------------------------------------------------------------
+
+    def _sync(self, key, start_time, now, fetch_range):
+        state = self._state(key)
+        if state is None:
+            entries = fetch_range(start_time, now)
+            self._store(key, entries, start_time, now)
+            return
+        covered_from, high_water, _ = state
+        entries = []
+        if start_time < covered_from:
+            entries += fetch_range(start_time, covered_from - 1)
+            covered_from = start_time
+        entries += fetch_range(max(covered_from, high_water - SYNC_OVERLAP_MS), now)
+        self._store(key, entries, covered_from, now)
+
+    def sync(self, client, symbol, start_time, fetch_range, force=False):
+        """
+        Đảm bảo ledger đã có funding của symbol từ start_time tới hiện tại.
+        fetch_range(start_ms, end_ms) -> list funding entry của ccxt (timestamp, amount, id).
+        """
+        key = (client.id, self.account_of(client), symbol)
+        start_time = int(start_time)
+        state = self._state(key)
+        if (not force and state is not None and start_time >= state[0]
+                and time.time() - state[2] < self.sync_interval):
+            return
+        now = int(client.milliseconds())
+        # Các thread cùng hỏi một symbol chỉ tải một lần
+        self._sync_flight.do(key, self._sync, key, start_time, now, fetch_range)
+
+    def total(self, client, symbol, start_time, fetch_range, end_time=None):
+        """Tổng funding của symbol trong [start_time, end_time] (ms; end_time mặc định là hiện tại)."""
+        try:
+            self.sync(client, symbol, start_time, fetch_range)
+        except Exception as e:
+            print(f"[WARN] funding ledger sync failed for {client.id} {symbol}: {e}")
+        if end_time is None:
+            end_time = int(client.milliseconds())
+        return self._sum((client.id, self.account_of(client), symbol), start_time, end_time)
+
+
+funding_ledger = FundingLedger()
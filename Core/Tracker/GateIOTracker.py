@@ -1,28 +1,27 @@
-import time
-
 from Core.Define import PositionSide, Position, EXCHANGE
+from Core.Exchange.ContractSpec import contract_specs
+from Core.Exchange.SymbolIndex import symbol_index
+from Core.Tracker.FundingLedger import funding_ledger
+from Core.Tracker.TickerPrices import ticker_prices
 from Core.Tracker.Tracker import AccountBalance
 
 
 class GateIOTracker:
+    """
+    Tracker cho Gate USDT-M. `exchange` có thể là client ccxt sync (dùng các method thường)
+    hoặc ccxt.async_support (dùng các method *_async).
+    """
+
     def __init__(self, exchange):
        self.client = exchange
 
-    def _normalize_symbol_for_ticker(self, pos):
-        """Chuyển contract GateIO (VD: BTC_USDT) về dạng fetch_ticker (BTC/USDT)."""
+    def _ticker_symbol(self, pos):
+        """ccxt symbol để fetch_ticker cho position Gate (VD: BTC_USDT -> BTC/USDT:USDT)."""
         contract = pos.get('info', {}).get('contract') or pos.get('symbol') or ''
-        if '_' in contract:
-            parts = contract.split('_')
-            if len(parts) == 2 and parts[0] and parts[1]:
-                return f"{parts[0]}/{parts[1]}"
-        # Thử dạng chuẩn nếu có sẵn
-        if '/' in contract:
-            return contract
-        return contract  # fallback trả nguyên
-
-    def _get_current_price(self, pos):
-        """Lấy current price ưu tiên mark/last có sẵn, fallback fetch_ticker."""
-        # Ưu tiên dùng dữ liệu đã có trong pos
+        return symbol_index.ccxt_symbol('gate', contract)
+
+    def _price_from_payload(self, pos):
+        """Giá có sẵn trong payload position (kể cả trong info), 0.0 nếu không có."""
         for key in ('markPrice', 'lastPrice', 'indexPrice', 'last', 'mark'):
             try:
                 v = pos.get(key)
@@ -43,74 +42,104 @@ class GateIOTracker:
                         return price
             except Exception:
                 pass
-        # fetch ticker nếu vẫn chưa có
-        fetch_symbol = self._normalize_symbol_for_ticker(pos)
-        try:
-            ticker = self.client.fetch_ticker(fetch_symbol)
-            for key in ('last', 'mark', 'close', 'ask', 'bid'):
-                if key in ticker:
-                    try:
-                        val = float(ticker[key])
-                        if val > 0:
-                            return val
-                    except Exception:
-                        continue
-            tinfo = ticker.get('info', {}) or {}
-            for key in ('markPrice', 'lastPrice', 'close'):
-                if key in tinfo:
-                    try:
-                        val = float(tinfo[key])
-                        if val > 0:
-                            return val
-                    except Exception:
-                        continue
-        except Exception:
-            pass
         return 0.0
 
-    def get_open_positions(self):
-        """
-        Get all currently open positions on GateIO Futures.
-        :return:
-        """
-        positions = []
-        response = self.client.fetch_positions()
-        positions_json = [pos for pos in response if float(pos['contracts']) > 0]
-        for pos in positions_json:
-            symbol_contract = pos['info']['contract']  # VD: BTC_USDT
-            symbol = symbol_contract.replace('_', '')  # Giữ nguyên hành vi cũ cho Position
+    def _price_from_ticker(self, ticker):
+        for key in ('last', 'mark', 'close', 'ask', 'bid'):
+            if key in ticker:
+                try:
+                    val = float(ticker[key])
+                    if val > 0:
+                        return val
+                except Exception:
+                    continue
+        tinfo = ticker.get('info', {}) or {}
+        for key in ('markPrice', 'lastPrice', 'close'):
+            if key in tinfo:
+                try:
+                    val = float(tinfo[key])
+                    if val > 0:
+                        return val
+                except Exception:
+                    continue
+        return 0.0
+
+    def _payload_prices(self, rows):
+        """Giá có sẵn trong payload cho từng row, kèm danh sách ccxt symbol còn thiếu giá."""
+        prices = [self._price_from_payload(pos) for pos, _ in rows]
+        missing = [self._ticker_symbol(pos) for (pos, _), price in zip(rows, prices) if price <= 0]
+        return prices, missing
+
+    def _build_positions(self, rows, prices, tickers, book=None):
+        # Dùng current price thay vì entryPrice theo yêu cầu
+        positions = [self._to_position(pos, symbol, price if price > 0 else tickers.get(self._ticker_symbol(pos), 0.0))
+                     for (pos, symbol), price in zip(rows, prices)]
+        if book is not None:
+            self._fill_book(book, rows, positions)
+        return positions
 
+    def _fill_book(self, book, rows, positions):
+        """Ghi các position vừa dựng vào PositionBook (kèm contract size và giá vào lệnh thật)."""
+        for (pos, _), position in zip(rows, positions):
+            try:
+                entry = float(pos.get('entryPrice') or 0.0) or None
+            except (TypeError, ValueError):
+                entry = None
+            book.append_position(position, contract_specs.get(self.client, position.symbol).contract_size, entry)
+
+    def _position_rows(self, response):
+        """Lọc payload fetch_positions -> [(pos, symbol)] đang mở cần báo cáo."""
+        # fetch_positions đã load markets -> bảo đảm symbol index có dữ liệu của sàn
+        symbol_index.ensure(self.client)
+        rows = []
+        for pos in response:
+            if float(pos['contracts']) <= 0:
+                continue
+            symbol_contract = pos['info']['contract']  # VD: BTC_USDT
+            symbol = symbol_index.internal(symbol_contract)  # BTCUSDT như hành vi cũ cho Position
             # Skip SXP positions trước khi xử lý
             if symbol.startswith("SXP"):
                 continue
+            rows.append((pos, symbol))
+        return rows
 
-            side = PositionSide.LONG if pos['side'].upper() == 'LONG' else PositionSide.SHORT
-            try:
-                margin = float(pos.get('maintenanceMargin')) if 'maintenanceMargin' in pos else 1.0
-            except Exception:
-                margin = 1.0
-            # Dùng current price thay vì entryPrice theo yêu cầu
-            try:
-                entry_price = self._get_current_price(pos)
-            except Exception:
-                entry_price = 0.0
-            position = Position(symbol=symbol, side=side, amount=float(pos['contracts']),
-                                entry_price=entry_price, exchange=EXCHANGE.GATE, margin=margin)
+    def _to_position(self, pos, symbol, entry_price):
+        side = PositionSide.LONG if pos['side'].upper() == 'LONG' else PositionSide.SHORT
+        try:
+            margin = float(pos.get('maintenanceMargin')) if 'maintenanceMargin' in pos else 1.0
+        except Exception:
+            margin = 1.0
+        position = Position(symbol=symbol, side=side, amount=float(pos['contracts']),
+                            entry_price=entry_price, exchange=EXCHANGE.GATE, margin=margin)
 
-            try:
-                total_paid_funding = float(pos['info'].get('pnl_fund', 0.0))
-            except Exception:
-                total_paid_funding = 0.0
-            position.set_paid_funding(total_paid_funding)
-            positions.append(position)
+        try:
+            total_paid_funding = float(pos['info'].get('pnl_fund', 0.0))
+        except Exception:
+            total_paid_funding = 0.0
+        position.set_paid_funding(total_paid_funding)
+        return position
 
-        return positions
-    def get_cross_margin_account_info(self):
+    def get_open_positions(self, book=None):
         """
-        Fetch cross margin account information and calculate ROI for each asset.
+        Get all currently open positions on GateIO Futures.
+        Positions thiếu mark/last price được lấy giá bằng một lần fetch_tickers (có cache ngắn hạn).
         :return:
         """
-        account_info = self.client.fetchBalance(params={'unifiedAccount': True})
+        rows = self._position_rows(self.client.fetch_positions())
+        prices, missing = self._payload_prices(rows)
+        tickers = ticker_prices.get_many(self.client, missing, self._price_from_ticker) if missing else {}
+        return self._build_positions(rows, prices, tickers, book)
+
+    async def get_open_positions_async(self, book=None):
+        """
+        Bản async của get_open_positions (client là ccxt.async_support).
+        """
+        rows = self._position_rows(await self.client.fetch_positions())
+        prices, missing = self._payload_prices(rows)
+        tickers = await ticker_prices.get_many_async(self.client, missing, self._price_from_ticker) if missing else {}
+        return self._build_positions(rows, prices, tickers, book)
+
+    def _to_account_balance(self, account_info):
         info = account_info['info'][0]
         total_margin_balance = float(info['unified_account_total_equity'])
         total_initial_margin = 0
@@ -125,48 +154,49 @@ class GateIOTracker:
                                          unrealized_pnl)
         return account_balance
 
-    def get_paid_funding(self, symbol, start_time):
+    def get_cross_margin_account_info(self):
         """
-        Lấy tổng funding đã trả từ start_time cho đến hiện tại.
+        Fetch cross margin account information and calculate ROI for each asset.
+        :return:
         """
-        total_paid = 0.0
-        end_time = self.client.milliseconds()
-        symbol = symbol.replace('USDT', '_USDT')
-        while True:
-            try:
-                funding_history = self.client.fetchFundingHistory(
-                    symbol=symbol,
-                    since=start_time,
-                    limit=100,
-                    end_time=end_time,
-                    params={
-                        'endTime': end_time,
-                    }
-                )
-            except Exception as e:
-                print(f"Lỗi lấy funding: {e}")
-                break
+        return self._to_account_balance(self.client.fetchBalance(params={'unifiedAccount': True}))
+
+    async def get_cross_margin_account_info_async(self):
+        return self._to_account_balance(await self.client.fetchBalance(params={'unifiedAccount': True}))
 
+    def _fetch_funding_range(self, symbol, start_time, end_time):
+        """Các khoản funding của symbol trong [start_time, end_time] (ms), đọc lùi từng trang."""
+        entries = []
+        market_id = symbol_index.market_id('gate', symbol)
+        while True:
+            funding_history = self.client.fetchFundingHistory(
+                symbol=market_id,
+                since=start_time,
+                limit=100,
+                params={
+                    'endTime': end_time,
+                }
+            )
             if not funding_history:
                 break
 
-            # Cộng funding
             out = False
             for f in funding_history:
-                if f.get('timestamp', 0) < start_time:
+                if f.get('timestamp', 0) < start_time or f.get('timestamp', 0) > end_time:
                     out = True
                     break
-                if f.get('timestamp', 0) > end_time:
-                    out = True
-                    break
-                total_paid += float(f.get("amount", 0))
+                entries.append(f)
             if out:
                 break
 
             # Lấy thời gian cuối cùng để tiếp tục
             end_time = funding_history[0].get("timestamp") - 1
+        return entries
 
-            # Chờ nhẹ để tránh bị rate limit
-            time.sleep(0.2)
-
-        return total_paid
\ No newline at end of file
+    def get_paid_funding(self, symbol, start_time):
+        """
+        Lấy tổng funding đã trả từ start_time cho đến hiện tại (từ funding ledger cục bộ,
+        chỉ tải thêm các khoản mới hơn lần đồng bộ trước).
+        """
+        return funding_ledger.total(self.client, symbol, start_time,
+                                    lambda start, end: self._fetch_funding_range(symbol, start, end))
@@ -0,0 +1,44 @@
+import numpy as np
+
+
+def scan_hedge_imbalance(book, min_notional=0.0, top=None):
+    """
+    Quét lệch hedge của cả PositionBook theo symbol, đã quy về lượng coin cơ sở
+    (contracts * contract size) nên so được Bitget với Gate dù contract size khác nhau.
+    Trả về list xếp theo notional lệch giảm dần, mỗi phần tử:
+    symbol, longBase, shortBase, imbalanceBase (long - short), imbalancePct (so với leg lớn hơn),
+    price (giá trung bình theo lượng cơ sở), notionalAtRisk (|lệch| * price).
+    Toàn bộ là phép toán vector nên đủ rẻ để chạy sau mỗi update websocket.
+    """
+    if not len(book):
+        return []
+    symbols, inverse = np.unique(np.asarray(book.symbols, dtype=object), return_inverse=True)
+    n = len(symbols)
+    base = book.base_size()
+    is_long = book.side > 0
+    price = np.maximum(book.price, 0.0)
+
+    long_base = np.bincount(inverse, weights=np.where(is_long, base, 0.0), minlength=n)
+    short_base = np.bincount(inverse, weights=np.where(is_long, 0.0, base), minlength=n)
+    total_base = long_base + short_base
+    weighted_price = np.bincount(inverse, weights=base * price, minlength=n)
+    avg_price = np.divide(weighted_price, total_base, out=np.zeros(n), where=total_base > 0)
+
+    imbalance = long_base - short_base
+    larger = np.maximum(long_base, short_base)
+    imbalance_pct = np.divide(np.abs(imbalance), larger, out=np.zeros(n), where=larger > 0) * 100
+    at_risk = np.abs(imbalance) * avg_price
+
+    order = np.argsort(-at_risk, kind='stable')
+    order = order[at_risk[order] >= min_notional]
+    if top is not None:
+        order = order[:top]
+    return [{
+        'symbol': symbols[i],
+        'longBase': float(long_base[i]),
+        'shortBase': float(short_base[i]),
+        'imbalanceBase': float(imbalance[i]),
+        'imbalancePct': round(float(imbalance_pct[i]), 4),
+        'price': float(avg_price[i]),
+        'notionalAtRisk': round(float(at_risk[i]), 2),
+    } for i in order.tolist()]
@@ -0,0 +1,155 @@
+import numpy as np
+
+from Core.Define import EXCHANGE, PositionSide
+
+# Mã số của sàn / chiều lệnh trong các cột int8
+EXCHANGE_CODES = {exchange: code for code, exchange in enumerate(EXCHANGE)}
+EXCHANGES_BY_CODE = list(EXCHANGE)
+LONG = 1
+SHORT = -1
+
+FLOAT_COLUMNS = ('size', 'price', 'entry', 'contract_size', 'funding')
+CODE_COLUMNS = ('exchange', 'side')
+
+
+def side_code(side):
+    return LONG if side == PositionSide.LONG else SHORT
+
+
+class PositionBook:
+    """
+    Toàn bộ position dạng cột (NumPy), mỗi row một leg:
+    size (contracts), price (giá hiện tại), entry (giá vào lệnh), contract_size, funding,
+    exchange (mã EXCHANGE_CODES), side (+1 long / -1 short); symbol giữ trong list song song.
+    Notional, lệch hedge, PnL... của cả book là một biểu thức vector.
+    """
+
+    __slots__ = ('symbols', '_columns', '_n')
+
+    def __init__(self, capacity=64):
+        self.symbols = []
+        self._columns = {name: np.zeros(capacity, dtype=np.float64) for name in FLOAT_COLUMNS}
+        self._columns.update({name: np.zeros(capacity, dtype=np.int8) for name in CODE_COLUMNS})
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def __repr__(self):
+        return f"PositionBook(rows={self._n}, symbols={len(set(self.symbols))})"
+
+    def clear(self):
+        self.symbols = []
+        self._n = 0
+
+    def _grow(self):
+        for name, column in self._columns.items():
+            grown = np.zeros(max(64, 2 * len(column)), dtype=column.dtype)
+            grown[:self._n] = column[:self._n]
+            self._columns[name] = grown
+
+    def append(self, symbol, exchange, side, size, price, contract_size=1.0, funding=0.0, entry=None):
+        """Thêm một leg; side là PositionSide, exchange là EXCHANGE."""
+        if self._n == len(self._columns['size']):
+            self._grow()
+        i = self._n
+        columns = self._columns
+        columns['size'][i] = size
+        columns['price'][i] = price
+        columns['entry'][i] = price if entry is None else entry
+        columns['contract_size'][i] = contract_size
+        columns['funding'][i] = funding
+        columns['exchange'][i] = EXCHANGE_CODES[exchange]
+        columns['side'][i] = side_code(side)
+        self.symbols.append(symbol)
+        self._n += 1
+        return i
+
+    def append_position(self, position, contract_size=1.0, entry=None):
+        return self.append(position.symbol, position.exchange, position.side, position.amount,
+                           position.entry_price, contract_size, position.paid_funding, entry)
+
+    @classmethod
+    def from_positions(cls, positions, contract_size_of=None):
+        """Book từ list Position; contract_size_of(position) -> contract size (mặc định 1)."""
+        positions = list(positions)
+        book = cls(capacity=max(64, len(positions)))
+        for position in positions:
+            book.append_position(position, contract_size_of(position) if contract_size_of else 1.0)
+        return book
+
+    @classmethod
+    def concat(cls, books):
+        """Nối nhiều book theo thứ tự (VD: book của từng tracker)."""
+        books = list(books)
+        total = sum(len(b) for b in books)
+        book = cls(capacity=max(64, total))
+        for name, column in book._columns.items():
+            if total:
+                column[:total] = np.concatenate([b.column(name) for b in books])
+        for b in books:
+            book.symbols.extend(b.symbols)
+        book._n = total
+        return book
+
+    # ---- cột ----------------------------------------------------------------------------------
+
+    def column(self, name):
+        """View (không copy) của một cột trên các row đang dùng."""
+        return self._columns[name][:self._n]
+
+    @property
+    def size(self):
+        return self.column('size')
+
+    @property
+    def price(self):
+        return self.column('price')
+
+    @property
+    def side(self):
+        return self.column('side')
+
+    @property
+    def exchange(self):
+        return self.column('exchange')
+
+    def exchanges(self):
+        return [EXCHANGES_BY_CODE[code] for code in self.exchange]
+
+    # ---- biểu thức vector ---------------------------------------------------------------------
+
+    def base_size(self):
+        """Lượng coin cơ sở của từng leg (contracts * contract_size)."""
+        return np.maximum(self.size, 0.0) * self.column('contract_size')
+
+    def signed_base(self):
+        return self.base_size() * self.side
+
+    def notional(self):
+        return self.base_size() * np.maximum(self.price, 0.0)
+
+    def unrealized_pnl(self):
+        return self.signed_base() * (self.price - self.column('entry'))
+
+    def total_notional(self):
+        return float(self.notional().sum())
+
+    def total_funding(self):
+        return float(self.column('funding').sum())
+
+    def total_unrealized_pnl(self):
+        return float(self.unrealized_pnl().sum())
+
+    def imbalance(self):
+        """
+        Lệch hedge theo symbol: (symbols, lệch base, lệch notional) với lệch = long - short.
+        Symbol đã hedge đủ có lệch 0.
+        """
+        if not self._n:
+            return [], np.zeros(0), np.zeros(0)
+        symbols, inverse = np.unique(np.asarray(self.symbols, dtype=object), return_inverse=True)
+        signed = self.signed_base()
+        base = np.bincount(inverse, weights=signed, minlength=len(symbols))
+        notional = np.bincount(inverse, weights=signed * np.maximum(self.price, 0.0), minlength=len(symbols))
+        return list(symbols), base, notional
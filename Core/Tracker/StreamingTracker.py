@@ -0,0 +1,370 @@
+import asyncio
+import os
+import threading
+import time
+
+from Core.Define import EXCHANGE
+from Core.Exchange.ContractSpec import contract_specs
+from Core.Exchange.ExchangeRegistry import _credential_fingerprint
+
+# Bật tracker websocket cho PositionView/AssetReporter (mặc định tắt, dùng tracker REST)
+STREAMING_TRACKERS = os.getenv("STREAMING_TRACKERS", "0").lower() in ("1", "true", "yes")
+RESYNC_INTERVAL = int(os.getenv("STREAM_RESYNC_INTERVAL", "60"))   # seconds
+STALE_AFTER = int(os.getenv("STREAM_STALE_AFTER", "180"))          # seconds không có dữ liệu mới -> dùng REST
+RECONNECT_DELAY = 1                                                 # seconds
+MAX_RECONNECT_DELAY = 30                                            # seconds
+
+# Field unified lấy từ update websocket; info/funding giữ nguyên bản REST gần nhất
+STREAM_POSITION_FIELDS = ('contracts', 'contractSize', 'side', 'markPrice', 'entryPrice', 'notional',
+                          'unrealizedPnl', 'leverage', 'initialMarginPercentage', 'maintenanceMargin')
+
+
+DIRECTIONAL_SIDES = ('long', 'short')
+
+
+def _position_key(pos):
+    return pos.get('symbol'), str(pos.get('side') or '').lower()
+
+
+def _is_open(pos):
+    try:
+        return float(pos.get('contracts') or 0) > 0
+    except (TypeError, ValueError):
+        return False
+
+
+class StreamingTracker:
+    """
+    Tracker giữ trạng thái position/balance/mark price sống bằng ccxt.pro
+    (watch_positions, watch_balance, watch_tickers) trên một event loop riêng ở background thread.
+    get_open_positions()/get_cross_margin_account_info() chỉ đọc snapshot đã dựng sẵn (O(1)).
+
+    - Sau khi khởi động, sau mỗi lần reconnect và định kỳ (STREAM_RESYNC_INTERVAL) trạng thái được
+      đồng bộ lại bằng REST qua tracker REST bọc bên trong.
+    - Update position từ websocket chỉ ghi đè các field unified (contracts, side, markPrice...),
+      phần info (funding đã trả...) giữ theo bản REST; symbol mới xuất hiện sẽ kích hoạt resync.
+    - Payload balance qua websocket khác định dạng REST nên mỗi event balance chỉ là tín hiệu để
+      đọc lại balance bằng REST (gộp các event dồn dập thành một lần gọi).
+    - Khi stream chưa sẵn sàng hoặc quá STREAM_STALE_AFTER giây không có message/resync thành công,
+      đọc thẳng REST.
+    """
+
+    def __init__(self, rest_tracker, pro_client, resync_interval=RESYNC_INTERVAL, stale_after=STALE_AFTER):
+        self.rest = rest_tracker
+        self.client = rest_tracker.client
+        self.pro = pro_client
+        self.resync_interval = resync_interval
+        self.stale_after = stale_after
+
+        self._lock = threading.Lock()
+        self._records = {}          # (ccxt symbol, side) -> raw ccxt position
+        self._mark_prices = {}      # ccxt symbol -> giá từ watch_tickers
+        self._positions = None      # list Position dựng sẵn
+        self._balance = None        # AccountBalance
+        self._last_update = 0.0
+        self._ready = threading.Event()
+        self._listeners = []        # callback(list Position) sau mỗi lần snapshot đổi
+
+        self._loop = None
+        self._thread = None
+        self._stopping = False
+        self._resync_requested = None
+        self._balance_requested = None
+        self._symbols_changed = None
+
+    def add_listener(self, callback):
+        """callback(positions) được gọi (trên thread của stream) mỗi khi snapshot position được dựng lại."""
+        self._listeners.append(callback)
+
+    # ---- vòng đời -------------------------------------------------------------------------
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run_loop, name=f"StreamingTracker-{self.pro.id}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping = True
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._cancel_tasks)
+
+    def _cancel_tasks(self):
+        for task in asyncio.all_tasks(self._loop):
+            task.cancel()
+
+    def _run_loop(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._main())
+        except asyncio.CancelledError:
+            pass
+        finally:
+            # Client pro thuộc registry (đóng khi process tắt), tracker không tự đóng
+            self._loop.close()
+
+    async def _main(self):
+        self._resync_requested = asyncio.Event()
+        self._balance_requested = asyncio.Event()
+        self._symbols_changed = asyncio.Event()
+        await self._resync()
+        await asyncio.gather(
+            self._watch_positions(),
+            self._watch_balance(),
+            self._watch_tickers(),
+            self._resync_loop(),
+            self._balance_loop(),
+        )
+
+    # ---- trạng thái -------------------------------------------------------------------------
+
+    def _rebuild(self):
+        """Dựng lại list Position từ records + mark price (gọi khi đang giữ lock). Trả về snapshot mới."""
+        records = [r for r in self._records.values() if _is_open(r)]
+        rows = self.rest._position_rows(records)
+        prices, _ = self.rest._payload_prices(rows)
+        # Mark price từ watch_tickers (sống) được ưu tiên hơn giá trong payload position/REST gần nhất
+        prices = [self._mark_prices.get(pos.get('symbol')) or price for (pos, _), price in zip(rows, prices)]
+        self._positions = self.rest._build_positions(rows, prices, self._mark_prices)
+        self._last_update = time.time()
+        return self._positions
+
+    def _notify(self, positions):
+        """Báo snapshot mới cho listener; gọi sau khi đã nhả lock để callback chậm không chặn các reader."""
+        for callback in self._listeners:
+            try:
+                callback(positions)
+            except Exception as e:
+                print(f"[WARN] {self.pro.id} position listener failed: {e}")
+
+    def _touch(self):
+        """Ghi nhận stream vẫn sống (kể cả khi message không làm đổi trạng thái)."""
+        self._last_update = time.time()
+
+    def _symbols(self):
+        with self._lock:
+            return sorted({key[0] for key in self._records if key[0]})
+
+    async def _resync(self):
+        """Thay toàn bộ trạng thái bằng dữ liệu REST."""
+        try:
+            positions, balance = await asyncio.gather(
+                asyncio.to_thread(self.client.fetch_positions),
+                asyncio.to_thread(self.rest.get_cross_margin_account_info),
+            )
+        except Exception as e:
+            print(f"[WARN] {self.pro.id} stream resync failed: {e}")
+            return False
+        with self._lock:
+            old_symbols = {key[0] for key in self._records}
+            self._records = {_position_key(p): p for p in positions if _is_open(p)}
+            self._balance = balance
+            positions = self._rebuild()
+            changed = old_symbols != {key[0] for key in self._records}
+        self._notify(positions)
+        self._ready.set()
+        if changed:
+            self._symbols_changed.set()
+        return True
+
+    def _record_key(self, pos):
+        """
+        Key của record ứng với update. Update không có chiều rõ ràng (side None, hoặc 'both' của
+        Binance one-way) được gán vào record duy nhất của symbol nếu có.
+        """
+        key = _position_key(pos)
+        if key[1] in DIRECTIONAL_SIDES:
+            return key
+        keys = [k for k in self._records if k[0] == key[0]]
+        return keys[0] if len(keys) == 1 else key
+
+    def _apply_position_updates(self, updates):
+        """Gộp update websocket vào records. Trả về True nếu xuất hiện symbol chưa có bản REST."""
+        unknown = False
+        with self._lock:
+            for pos in updates or []:
+                key = _position_key(pos)
+                if not key[0]:
+                    continue
+                if not _is_open(pos):
+                    if key[1] in DIRECTIONAL_SIDES:
+                        self._records.pop(key, None)
+                    else:
+                        # Đóng không rõ chiều (one-way mode / side None): bỏ mọi record của symbol
+                        for k in [k for k in self._records if k[0] == key[0]]:
+                            del self._records[k]
+                    continue
+                key = self._record_key(pos)
+                current = self._records.get(key)
+                if current is None:
+                    unknown = True
+                    self._records[key] = pos
+                else:
+                    merged = dict(current)
+                    merged.update({k: pos[k] for k in STREAM_POSITION_FIELDS if pos.get(k) is not None})
+                    if str(pos.get('side') or '').lower() not in DIRECTIONAL_SIDES:
+                        merged['side'] = current.get('side')
+                    self._records[key] = merged
+            positions = self._rebuild()
+        self._notify(positions)
+        return unknown
+
+    async def _reconnect_wait(self, attempt, error):
+        print(f"[WARN] {self.pro.id} stream error: {error}")
+        await asyncio.sleep(min(MAX_RECONNECT_DELAY, RECONNECT_DELAY * (2 ** attempt)))
+        # Có thể đã lỡ update trong lúc mất kết nối
+        self._resync_requested.set()
+
+    # ---- các vòng watch -------------------------------------------------------------------
+
+    async def _watch_positions(self):
+        attempt = 0
+        while not self._stopping:
+            try:
+                updates = await self.pro.watch_positions()
+                attempt = 0
+                if self._apply_position_updates(updates):
+                    self._resync_requested.set()
+                    self._symbols_changed.set()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await self._reconnect_wait(attempt, e)
+                attempt += 1
+
+    async def _watch_balance(self):
+        attempt = 0
+        while not self._stopping:
+            try:
+                await self.pro.watch_balance()
+                attempt = 0
+                self._touch()
+                self._balance_requested.set()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await self._reconnect_wait(attempt, e)
+                attempt += 1
+
+    async def _watch_tickers(self):
+        attempt = 0
+        while not self._stopping:
+            symbols = self._symbols()
+            if not symbols:
+                self._symbols_changed.clear()
+                await self._symbols_changed.wait()
+                continue
+            try:
+                self._symbols_changed.clear()
+                watch = asyncio.ensure_future(self.pro.watch_tickers(symbols))
+                changed = asyncio.ensure_future(self._symbols_changed.wait())
+                done, _ = await asyncio.wait({watch, changed}, return_when=asyncio.FIRST_COMPLETED)
+                if watch not in done:
+                    # Danh sách symbol thay đổi -> đăng ký lại với danh sách mới
+                    watch.cancel()
+                    continue
+                changed.cancel()
+                tickers = watch.result()
+                attempt = 0
+                prices = {s: self.rest._price_from_ticker(t or {}) for s, t in (tickers or {}).items()}
+                with self._lock:
+                    self._mark_prices.update({s: p for s, p in prices.items() if p > 0})
+                    positions = self._rebuild()
+                self._notify(positions)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await self._reconnect_wait(attempt, e)
+                attempt += 1
+
+    async def _resync_loop(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._resync_requested.wait(), timeout=self.resync_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._resync_requested.clear()
+            await self._resync()
+
+    async def _balance_loop(self):
+        while not self._stopping:
+            await self._balance_requested.wait()
+            self._balance_requested.clear()
+            try:
+                balance = await asyncio.to_thread(self.rest.get_cross_margin_account_info)
+            except Exception as e:
+                print(f"[WARN] {self.pro.id} balance refresh failed: {e}")
+                continue
+            with self._lock:
+                self._balance = balance
+
+    # ---- API giống tracker REST -----------------------------------------------------------
+
+    def is_live(self):
+        return self._ready.is_set() and time.time() - self._last_update < self.stale_after
+
+    def _fill_book(self, book, positions):
+        for position in positions:
+            book.append_position(position, contract_specs.get(self.client, position.symbol).contract_size)
+        return positions
+
+    def get_open_positions(self, book=None):
+        positions = self._positions
+        if positions is None or not self.is_live():
+            return self.rest.get_open_positions(book)
+        return self._fill_book(book, positions) if book is not None else positions
+
+    def get_cross_margin_account_info(self):
+        balance = self._balance
+        if balance is not None and self.is_live():
+            return balance
+        return self.rest.get_cross_margin_account_info()
+
+    async def get_open_positions_async(self, book=None):
+        positions = self._positions
+        if positions is None or not self.is_live():
+            return await asyncio.to_thread(self.rest.get_open_positions, book)
+        return self._fill_book(book, positions) if book is not None else positions
+
+    async def get_cross_margin_account_info_async(self):
+        balance = self._balance
+        if balance is not None and self.is_live():
+            return balance
+        return await asyncio.to_thread(self.rest.get_cross_margin_account_info)
+
+    def get_paid_funding(self, symbol, start_time):
+        return self.rest.get_paid_funding(symbol, start_time)
+
+
+_trackers_lock = threading.Lock()
+_trackers = {}  # (sàn, API key) -> StreamingTracker dùng chung trong process
+
+
+def build_streaming_tracker(exchange_manager, exchange):
+    """
+    StreamingTracker (đã start) cho EXCHANGE.BITGET / EXCHANGE.GATE / EXCHANGE.BINANCE, None nếu chưa hỗ trợ.
+    Với Binance, watch_positions/watch_balance của ccxt.pro chạy trên user-data stream (listen key,
+    ccxt tự tạo và gia hạn), watch_tickers trên stream public.
+    Mỗi (sàn, API key) chỉ có một tracker trong process (client pro của registry gắn với event loop
+    của tracker đó), PositionView/AssetReporter/... gọi lại sẽ nhận chung instance.
+    """
+    from Core.Tracker.BinanceTracker import BinanceTracker
+    from Core.Tracker.BitgetTracker import BitgetTracker
+    from Core.Tracker.GateIOTracker import GateIOTracker
+    if exchange in (EXCHANGE.BITGET, EXCHANGE.BITGET_SUB):
+        pro, build_rest = exchange_manager.bitget_pro, lambda: BitgetTracker(exchange_manager.bitget_exchange)
+    elif exchange == EXCHANGE.GATE:
+        pro, build_rest = exchange_manager.gate_pro, lambda: GateIOTracker(exchange_manager.gate_exchange)
+    elif exchange == EXCHANGE.BINANCE:
+        pro, build_rest = exchange_manager.binance_pro, lambda: BinanceTracker(exchange_manager.binance_exchange)
+    else:
+        return None
+    key = (pro.id, _credential_fingerprint({'apiKey': getattr(pro, 'apiKey', None)}))
+    with _trackers_lock:
+        tracker = _trackers.get(key)
+        if tracker is None:
+            tracker = _trackers[key] = StreamingTracker(build_rest(), pro)
+    return tracker.start()
@@ -0,0 +1,82 @@
+import os
+import threading
+import time
+
+TICKER_PRICE_TTL = float(os.getenv("TICKER_PRICE_TTL", "2"))  # seconds
+
+
+class TickerPriceCache:
+    """
+    Giá fallback cho tracker khi payload position không có mark/last price.
+    Mọi symbol thiếu giá được lấy bằng một lần fetch_tickers cho mỗi sàn (thay vì fetch_ticker
+    từng symbol), kết quả giữ trong cache ngắn hạn (TTL vài giây) dùng chung trong process.
+    """
+
+    def __init__(self, ttl=TICKER_PRICE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._prices = {}  # (exchange id, ccxt symbol) -> (price, time.monotonic())
+
+    def _cached(self, exchange_id, symbols):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for symbol in symbols:
+                hit = self._prices.get((exchange_id, symbol))
+                if hit is not None and now - hit[1] < self.ttl:
+                    found[symbol] = hit[0]
+        return found
+
+    def _store(self, exchange_id, tickers, price_fn):
+        now = time.monotonic()
+        prices = {}
+        for symbol, ticker in (tickers or {}).items():
+            price = price_fn(ticker or {})
+            if price > 0:
+                prices[symbol] = price
+        with self._lock:
+            for symbol, price in prices.items():
+                self._prices[(exchange_id, symbol)] = (price, now)
+        return prices
+
+    def get_many(self, client, symbols, price_fn):
+        """{symbol: price} cho các ccxt symbol; symbol không lấy được giá sẽ vắng mặt."""
+        symbols = sorted(set(symbols))
+        prices = self._cached(client.id, symbols)
+        missing = [s for s in symbols if s not in prices]
+        if not missing:
+            return prices
+        try:
+            tickers = client.fetch_tickers(missing)
+        except Exception:
+            # Sàn không hỗ trợ fetch_tickers theo danh sách -> fetch_ticker từng symbol
+            tickers = {}
+            for symbol in missing:
+                try:
+                    tickers[symbol] = client.fetch_ticker(symbol)
+                except Exception:
+                    continue
+        prices.update(self._store(client.id, tickers, price_fn))
+        return prices
+
+    async def get_many_async(self, client, symbols, price_fn):
+        """Bản async của get_many (client là ccxt.async_support)."""
+        symbols = sorted(set(symbols))
+        prices = self._cached(client.id, symbols)
+        missing = [s for s in symbols if s not in prices]
+        if not missing:
+            return prices
+        try:
+            tickers = await client.fetch_tickers(missing)
+        except Exception:
+            tickers = {}
+            for symbol in missing:
+                try:
+                    tickers[symbol] = await client.fetch_ticker(symbol)
+                except Exception:
+                    continue
+        prices.update(self._store(client.id, tickers, price_fn))
+        return prices
+
+
+ticker_prices = TickerPriceCache()
@@ -1,5 +1,8 @@
 
 class AccountBalance:
+    __slots__ = ('total_margin_balance', 'total_initial_margin', 'total_maint_margin', 'margin_level',
+                 'maint_margin_coverage', 'available_balance', 'unrealized_pnl')
+
     def __init__(self, total_margin_balance, total_initial_margin, total_maint_margin, available_balance, unrealized_pnl):
         self.total_margin_balance = total_margin_balance
         self.total_initial_margin = total_initial_margin
@@ -41,6 +41,10 @@ with open(setting_file, 'r', encoding='utf-8') as f:
 
 
 log_path = os.path.join(root_path, "logs")
+data_path = os.path.join(root_path, "data")
+market_cache_path = os.path.join(data_path, "markets")
+rate_limit_path = os.path.join(data_path, "ratelimit")
+funding_ledger_path = os.path.join(data_path, "funding_ledger.sqlite3")
 tunel_log_path = os.path.join(log_path, "tunel")
 asset_log_path = os.path.join(log_path, "asset")
 adl_log_path = os.path.join(log_path, "adl.txt")
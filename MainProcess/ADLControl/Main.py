@@ -1,16 +1,40 @@
 import asyncio
-import copy
+import math
 import os
 import sys
 import time
 
+import ccxt
+
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from Core.Exchange.ContractSpec import extract_amount_step
 from Core.Exchange.Exchange import ExchangeManager
-from Core.Tool import try_this
+from Core.Exchange.Metrics import exchange_metrics
+from Core.Exchange.SymbolIndex import symbol_index
+from Core.Logger import log_info, LogService, LogTarget
+from Core.Retry import backoff_delay
 from Define import exchange1, exchange2, root_path
 from MainProcess.ADLControl.Log import adl_log
 from MainProcess.ADLControl.Order import close_position_gate, close_position_bitget, fetch_position_bitget, \
     fetch_position_gate
+from MainProcess.ADLControl.PositionStore import PositionStore
+
+IGNORE_SYMBOLS = ["SXP", "OKB", "BGB", "EDEN", "ETH"]
+STORE_EXCHANGE = {'bitget': 'bitget', 'gateio': 'gate'}
+# rest: luôn đọc lại position qua REST trước khi đặt lệnh (mặc định)
+# stream: quyết định ngay từ size websocket; chỉ đọc REST khi stream lỗi/chưa có dữ liệu hoặc hai leg không phải một cặp hedge
+ADL_DECISION = os.getenv("ADL_DECISION", "rest").lower()
+# Ở chế độ stream: có đọc REST để xác nhận khi stream không đáng tin không (0 -> bỏ qua lần đối soát đó)
+ADL_REST_CONFIRM = os.getenv("ADL_REST_CONFIRM", "1").lower() in ("1", "true", "yes")
+# Cửa sổ gộp update (giây): đối soát chạy khi symbol im lặng đủ lâu, tối đa SETTLE_MAX_FACTOR lần cửa sổ.
+# Mặc định đủ dài cho một vòng create_order REST (open-hedge đặt leg thứ hai sau khi leg đầu trả về).
+ADL_SETTLE_WINDOW = float(os.getenv("ADL_SETTLE_WINDOW", "1.0"))
+SETTLE_MAX_FACTOR = 5
+# Ghi đè theo coin, VD: ADL_SETTLE_WINDOWS="BTC=0.5,PEPE=1"
+ADL_SETTLE_WINDOWS = {k.strip().upper(): float(v) for k, v in
+                      (item.split('=', 1) for item in os.getenv("ADL_SETTLE_WINDOWS", "").split(',') if '=' in item)}
+# Lệch nhỏ hơn số step lượng cơ sở (contract size * amount step) của sàn cần giảm này coi như đã hedge
+ADL_TOLERANCE_STEPS = float(os.getenv("ADL_TOLERANCE_STEPS", "1"))
 
 
 class ADLController:
@@ -18,40 +42,95 @@ class ADLController:
 
         self.exchangeManager = exchange_manager
 
+        # Client pro dùng cho cả websocket lẫn REST (fetch_position / create_order async)
         self.bitget_pro = exchange_manager.bitget_pro
         self.gate_pro = exchange_manager.gate_pro
 
-        self.bitget_exchange = exchange_manager.bitget_exchange
-        self.gate_exchange = exchange_manager.gate_exchange
-
         self.lock = asyncio.Lock()
-        self.positions = {}
-        self.old_positions = {}
+        self.store = PositionStore()  # symbol -> size cơ sở trên từng sàn, cập nhật theo delta từ websocket
         self.error_count = 0
+        # Mỗi symbol có tối đa một task đối soát; thay đổi đến khi task đang chạy thì đánh dấu để chạy lại
+        self._reconcile_tasks = {}
+        self._reconcile_again = set()
+        self._settle_at = {}       # symbol -> (thời điểm hết cửa sổ, hạn chót) theo time.monotonic()
+        self.settle_windows = dict(ADL_SETTLE_WINDOWS)
+        # symbol -> (sàn, size cơ sở kỳ vọng) sau lệnh đóng gần nhất, tới khi stream phản ánh lệnh đó
+        self._awaiting_fill = {}
+        # Swap symbol đang được bảo vệ: thêm khi stream báo position mở, bỏ khi cả hai leg về 0
+        self.watched = set()
 
+    async def _rest_totals(self, symbol):
+        bitget_symbol = symbol_index.ccxt_symbol('bitget', symbol)
+        return await asyncio.gather(fetch_position_bitget(self.bitget_pro, bitget_symbol),
+                                    fetch_position_gate(self.gate_pro, symbol))
 
-    def check_position_change(self, symbol):
-        bitget_symbol = symbol.replace("OMNI", "OMNI1")
-        bitget_total, bitget_side, bitget_contract_size = try_this(fetch_position_bitget,
-                                                                   params={'bitget_exchange': self.bitget_exchange,
-                                                                           'symbol': bitget_symbol},
-                                                                   log_func=adl_log, retries=5, delay=1)
-        gate_total, gate_side, gate_contract_size = try_this(fetch_position_gate,
-                                                            params={'gate_exchange': self.gate_exchange,
-                                                                    'symbol': symbol},
-                                                            log_func=adl_log, retries=5, delay=1)
+    def _stream_totals(self, symbol):
+        """
+        (bitget, gate) totals lấy từ PositionStore, hoặc (None, lý do) nếu không nên tin stream:
+        stream của một sàn chưa có message từ lần (re)connect gần nhất, hai leg cùng chiều
+        (không phải cặp hedge), thiếu contract size của leg cần đóng, hoặc lệnh đóng trước đó
+        chưa hiện trên stream (tránh đóng lặp theo size cũ).
+        """
+        for exchange in ('bitget', 'gate'):
+            if not self.store.is_live(exchange):
+                return None, f"{exchange} stream is stale"
+        state = self.store.get(symbol)
+        if state is None:
+            return None, "symbol not in store"
+        awaiting = self._awaiting_fill.get(symbol)
+        if awaiting is not None:
+            if abs(state.size(awaiting[0]) - awaiting[1]) > 1e-9 * max(awaiting[1], 1.0):
+                return None, f"previous order on {awaiting[0]} not yet in stream"
+            del self._awaiting_fill[symbol]
+        bitget, gate = state.totals('bitget'), state.totals('gate')
+        if bitget[0] > 0 and gate[0] > 0 and bitget[1] == gate[1]:
+            return None, f"both legs are {gate[1]}"
+        larger = bitget if bitget[0] > gate[0] else gate
+        if larger[0] > 0 and (not larger[2] or larger[1] is None):
+            return None, "missing side/contract size"
+        return (bitget, gate), None
+
+    async def check_position_change(self, symbol):
+        state = self.store.get(symbol)
+        if state is None or not state.armed:
+            return
+        totals = None
+        if ADL_DECISION == 'stream':
+            totals, reason = self._stream_totals(symbol)
+            if totals is None:
+                if not ADL_REST_CONFIRM:
+                    adl_log(f"Skip {symbol}: {reason}, REST confirmation disabled")
+                    return
+                adl_log(f"Confirm {symbol} via REST: {reason}")
+        if totals is None:
+            self._awaiting_fill.pop(symbol, None)
+            totals = await self._rest_totals(symbol)
+        bitget_symbol = symbol_index.ccxt_symbol('bitget', symbol)
+        (bitget_total, bitget_side, bitget_contract_size), (gate_total, gate_side, gate_contract_size) = totals
 
         if gate_total == 0 and bitget_total == 0:
             return
+        if gate_total > bitget_total:
+            larger, larger_contract_size = self.gate_pro, gate_contract_size
+        else:
+            larger, larger_contract_size = self.bitget_pro, bitget_contract_size
+        step = self._amount_step(larger, symbol)
+        # Chỉ dùng tolerance theo step khi đọc được step đúng của sàn; ngược lại so chính xác như cũ
+        tolerance = ADL_TOLERANCE_STEPS * step * larger_contract_size if step and larger_contract_size else 0.0
+        if abs(gate_total - bitget_total) < tolerance - 1e-12:
+            return
 
         adl_log(f"Gate total: {gate_total}, Bitget total: {bitget_total}, Symbol: {symbol}, Gate side: {gate_side}, Bitget side: {bitget_side}")
 
         if gate_total > bitget_total:
             diff = gate_total - bitget_total
             adl_log(f"Gate has more position: {diff} {symbol}")
-            diff_contras = diff / gate_contract_size
+            diff_contras = self._close_amount(self.gate_pro, symbol, diff, gate_contract_size)
+            if diff_contras <= 0:
+                return
             try:
-                close_position_gate(self.gate_exchange, symbol, gate_side, diff_contras)
+                await close_position_gate(self.gate_pro, symbol, gate_side, diff_contras)
+                self._awaiting_fill[symbol] = ('gate', gate_total - diff_contras * gate_contract_size)
                 adl_log(f"Closed position on GateIO: {symbol}, Size: {diff_contras} {gate_side}")
             except Exception as e:
                 print(e)
@@ -59,92 +138,201 @@ class ADLController:
         elif bitget_total > gate_total:
             diff = bitget_total - gate_total
             adl_log(f"Bitget has more position: {diff} {symbol}")
-            diff_contras = diff / bitget_contract_size
+            diff_contras = self._close_amount(self.bitget_pro, symbol, diff, bitget_contract_size)
+            if diff_contras <= 0:
+                return
             try:
-                close_position_bitget(self.bitget_exchange, bitget_symbol, bitget_side, diff_contras)
+                await close_position_bitget(self.bitget_pro, bitget_symbol, bitget_side, diff_contras)
+                self._awaiting_fill[symbol] = ('bitget', bitget_total - diff_contras * bitget_contract_size)
                 adl_log(f"Closed position on Bitget: {symbol}, Size: {diff_contras} {bitget_side}")
             except Exception as e:
                 print(e)
                 adl_log(f"Error closing position on Bitget: {e}")
 
-    def check_position_change_by_ws(self):
-        for p_symbol in self.positions.keys():
-            if p_symbol not in self.old_positions.keys():
-                adl_log(f"Position for {p_symbol} has been removed")
+    @staticmethod
+    def _amount_step(exchange, symbol):
+        """
+        Step amount (contracts) của symbol, đọc precision.amount theo precisionMode của chính client
+        (TICK_SIZE: giá trị là step, VD Gate 1.0 = 1 contract). None nếu không xác định được.
+        """
+        mode = getattr(exchange, 'precisionMode', None)
+        if mode not in (ccxt.TICK_SIZE, ccxt.DECIMAL_PLACES):
+            return None
+        market = (getattr(exchange, 'markets', None) or {}).get(symbol_index.ccxt_symbol(exchange, symbol))
+        if not market or (market.get('precision') or {}).get('amount') is None:
+            return None
+        return extract_amount_step(market, mode)
+
+    @classmethod
+    def _close_amount(cls, exchange, symbol, diff, contract_size):
+        """Số contract cần đóng cho lệch `diff` (lượng cơ sở), làm tròn xuống theo amount step của sàn."""
+        contracts = diff / contract_size
+        step = cls._amount_step(exchange, symbol)
+        if not step:
+            return contracts
+        return round(math.floor(contracts / step + 1e-9) * step, 12)
+
+    def settle_window(self, symbol):
+        return self.settle_windows.get(symbol_index.base(symbol), ADL_SETTLE_WINDOW)
+
+    def _touch(self, symbol):
+        """Dời thời điểm đối soát của symbol tới hết cửa sổ gộp (không quá hạn chót của đợt update này)."""
+        window = self.settle_window(symbol)
+        now = time.monotonic()
+        deadline = self._settle_at[symbol][1] if symbol in self._settle_at else now + window * SETTLE_MAX_FACTOR
+        self._settle_at[symbol] = (min(now + window, deadline), deadline)
+
+    async def _wait_settled(self, symbol):
+        while True:
+            settle_at = self._settle_at.get(symbol)
+            if settle_at is None:
+                return
+            remaining = settle_at[0] - time.monotonic()
+            if remaining <= 0:
+                del self._settle_at[symbol]
+                return
+            await asyncio.sleep(remaining)
+
+    async def _reconcile_loop(self, symbol):
+        try:
+            while True:
+                await self._wait_settled(symbol)
+                self._reconcile_again.discard(symbol)
+                try:
+                    await self.check_position_change(symbol)
+                except Exception as e:
+                    adl_log(f"Lỗi khi đối soát {symbol}: {e}")
+                if symbol not in self._reconcile_again:
+                    break
+        finally:
+            self._reconcile_tasks.pop(symbol, None)
+            self._maybe_unwatch(symbol)
+
+    def schedule_reconcile(self, symbol):
+        """
+        Đối soát symbol trong task riêng, không chặn vòng watch_positions, sau khi symbol không còn
+        update mới trong cửa sổ gộp (settle_window). Nếu symbol đang được đối soát thì chỉ đánh dấu
+        chạy lại một lần sau khi xong (gộp các thay đổi đến trong lúc chờ).
+        """
+        self._touch(symbol)
+        if symbol in self._reconcile_tasks:
+            self._reconcile_again.add(symbol)
+            return
+        self._reconcile_tasks[symbol] = asyncio.create_task(self._reconcile_loop(symbol), name=f"adl-{symbol}")
+
+    def check_position_change_by_ws(self, changes):
+        """
+        Đối soát đúng các symbol vừa đổi size trong message websocket (changes: list PositionChange);
+        chỉ các symbol đã từng là cặp hedge (cả hai leg cùng mở) mới được đối soát.
+        """
+        changed = {}
+        for change in changes:
+            changed.setdefault(change.symbol, []).append(change)
+        for p_symbol, symbol_changes in changed.items():
+            diff = ", ".join(f"{c.exchange} {c.old_size} -> {c.new_size}" for c in symbol_changes)
+            adl_log(f"Position changed for {p_symbol} (v{symbol_changes[-1].version}): {diff}")
+            state = self.store.get(p_symbol)
+            if state is None or not state.armed:
+                # Chưa từng thấy đủ hai leg (VD: hedge đang mở dở, hoặc position một chiều): không đóng lệnh
                 continue
+            self.schedule_reconcile(p_symbol)
+
+    def _write_symbols_file(self):
+        path = f"{root_path}/code/_settings/symbols.txt"
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            for sym in sorted(self.watched):
+                file.write(f"{sym}\n")
+        os.replace(tmp_path, path)
 
-            old_bitget_size = self.old_positions[p_symbol].get('bitget_size', 0)
-            old_gate_size = self.old_positions[p_symbol].get('gate_size', 0)
+    def _watch(self, symbols):
+        added = set(symbols) - self.watched
+        if not added:
+            return
+        self.watched |= added
+        adl_log(f"Subscribe ADL: {sorted(added)} (total {len(self.watched)})")
+        self._write_symbols_file()
 
-            new_bitget_size = self.positions[p_symbol].get('bitget_size', 0)
-            new_gate_size = self.positions[p_symbol].get('gate_size', 0)
+    def _maybe_unwatch(self, symbol):
+        """Bỏ theo dõi symbol khi cả hai leg đã đóng và không còn task đối soát."""
+        state = self.store.get(symbol)
+        if symbol not in self.watched or symbol in self._reconcile_tasks:
+            return
+        if state is not None and (state.size('bitget') > 0 or state.size('gate') > 0):
+            return
+        self.watched.discard(symbol)
+        self.store.remove(symbol)
+        self._awaiting_fill.pop(symbol, None)
+        adl_log(f"Unsubscribe ADL: {symbol} (total {len(self.watched)})")
+        self._write_symbols_file()
 
-            if old_bitget_size != new_bitget_size or old_gate_size != new_gate_size:
-                adl_log(f"Position changed for {p_symbol}: Bitget {old_bitget_size} -> {new_bitget_size}, GateIO {old_gate_size} -> {new_gate_size}")
-                self.check_position_change(p_symbol)
+    def _message_sizes(self, pos):
+        """
+        ({swap symbol: size cơ sở}, {swap symbol: (side, contract size)}) của một message
+        watch_positions, bỏ các symbol bị ignore. Symbol chưa theo dõi chỉ được lấy (và bắt đầu
+        theo dõi) khi có position đang mở.
+        """
+        sizes, details = {}, {}
+        for p in pos:
+            p_symbol = symbol_index.swap_symbol(p['symbol'])
+            if any(ig in p_symbol for ig in IGNORE_SYMBOLS):
+                continue
+            contract_size = float(p['contractSize'] or 0)
+            size = float(p['contracts'] or 0) * contract_size
+            if size <= 0 and p_symbol not in self.watched:
+                continue
+            sizes[p_symbol] = size
+            details[p_symbol] = (p['side'].upper() if p.get('side') else None, contract_size)
+        self._watch(s for s, size in sizes.items() if size > 0)
+        return sizes, details
 
-    async def sync_hedge(self, exchange, symbols):
+    async def sync_hedge(self, exchange):
         await exchange.load_markets()
+        symbol_index.ensure(exchange)
+        # Kênh positions của cả Bitget và Gate là theo tài khoản (ccxt tự lọc symbol phía client), nên nghe
+        # toàn bộ rồi lọc theo self.watched: thêm/bớt symbol không cần subscribe lại hay reconnect.
         adl_log(f"Listening for position changes on {exchange.id}...")
 
         self.error_count = 0
 
         while True:
             try:
-                pos = await exchange.watch_positions(symbols=symbols)
+                pos = await exchange.watch_positions()
                 print(pos)
 
                 async with self.lock:
-                    self.old_positions = copy.deepcopy(self.positions)
-                    # Check for symbols not present in current positions
-                    current_symbols = {p['symbol'] for p in pos}
-                    for symbol in self.positions.keys():
-                        if symbol not in current_symbols:
-                            if exchange.id == 'bitget':
-                                adl_log(f"Bitget position for {symbol} is be size 0")
-                                self.positions[symbol]['bitget_size'] = 0
-                            elif exchange.id == 'gateio':
-                                adl_log(f"GateIO position for {symbol} is be size 0")
-                                self.positions[symbol]['gate_size'] = 0
-
-                    for p in pos:
-                        p_symbol = p['symbol']
-                        p_size = float(p['contracts']) * float(p['contractSize'])
-                        ignore_symbols = ["SXP", "OKB", "BGB", "EDEN", "ETH"]
-                        if any(ig in p_symbol for ig in ignore_symbols):
-                            continue
-
-                        if exchange.id == 'bitget':
-                            self.positions.setdefault(p_symbol, {})['bitget_size'] = p_size
-                        elif exchange.id == 'gateio':
-                            self.positions.setdefault(p_symbol, {})['gate_size'] = p_size
-
-                    # Check for changes in positions
-                    self.check_position_change_by_ws()
+                    # Chỉ áp delta của message này; symbol không đổi size thì không đối soát lại
+                    changes = self.store.apply(STORE_EXCHANGE[exchange.id], *self._message_sizes(pos))
+                    self.check_position_change_by_ws(changes)
+                    for change in changes:
+                        if change.new_size <= 0:
+                            self._maybe_unwatch(change.symbol)
                     self.error_count = self.error_count - 1 if self.error_count > 1 else 0
 
             except Exception as e:
                 self.error_count += 1
+                self.store.mark_stale(STORE_EXCHANGE[exchange.id])
                 adl_log(f"Lỗi khi sync: {e}")
-                time.sleep(1)
+                await asyncio.sleep(backoff_delay(self.error_count - 1, max_delay=5))
 
     async def main(self):
         await self.gate_pro.load_markets()
+        symbol_index.ensure(self.gate_pro)
+        # Snapshot ban đầu của Gate (ccxt lấy qua REST ở lần watch đầu) để theo dõi các hedge đang mở;
+        # symbol mở sau đó được thêm dần theo event position.
         positions = await self.gate_pro.watch_positions()
-        open_symbols = [p['symbol'] for p in positions if float(p.get('contracts', 0)) > 0]
-        ignore_symbols = ["SXP", "OKB", "BGB", "EDEN", "ETH"]
-        open_symbols = [s for s in open_symbols if not any(ig in s for ig in ignore_symbols)]
-        with open(f"{root_path}/code/_settings/symbols.txt", 'w', encoding='utf-8') as file:
-            for sym in open_symbols:
-                file.write(f"{sym}\n")
-        print(f"Start Adl with symbols: {open_symbols}")
-        print(f"Start with symbols size: {len(open_symbols)}")
+        async with self.lock:
+            self.store.apply('gate', *self._message_sizes(positions))
+        self._write_symbols_file()
+        print(f"Start Adl with symbols: {sorted(self.watched)}")
+        print(f"Start with symbols size: {len(self.watched)}")
         await asyncio.gather(
-            self.sync_hedge(self.gate_pro, open_symbols),
-            self.sync_hedge(self.bitget_pro, open_symbols),
+            self.sync_hedge(self.gate_pro),
+            self.sync_hedge(self.bitget_pro),
         )
 
 if __name__ == '__main__':
     exchange_manager = ExchangeManager(exchange1, exchange2)
     adl_controller = ADLController(exchange_manager)
+    exchange_metrics.start_periodic_log(lambda m: log_info(LogService.ADL, m, target=LogTarget.SERVICE))
     asyncio.run(adl_controller.main())
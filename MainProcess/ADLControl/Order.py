@@ -1,68 +1,64 @@
 from ccxt import ExchangeError
 
-from Core.Tool import try_this
+from Core.Retry import retry_call_async, DEFAULT_BASE_DELAY
 from MainProcess.ADLControl.Log import adl_log
 
+# Các hàm dưới đây là coroutine, gọi với client ccxt async (pro/async_support) để
+# không chặn event loop đang nghe websocket.
+FETCH_MAX_DELAY = 1  # seconds
+ORDER_MAX_DELAY = 2  # seconds
 
-def close_position_gate(gate_exchange, symbol, hold_side, diff):
-    order = try_this(gate_exchange.createOrder,
-                     params={'symbol': symbol,
-                             'type': 'market',
-                             'side': 'sell' if hold_side == 'LONG' else 'buy',
-                             'amount': diff,
-                             'params': {
-                                 'reduceOnly': True,
-                                }
-                             },
-                     log_func=adl_log, retries=5, delay=2)
-    adl_log(order)
 
-def close_position_bitget(bitget_exchange, symbol, hold_side, diff):
-    order = try_this(bitget_exchange.createOrder,
-                     params={'symbol': symbol,
-                             'type': 'market',
-                             'side': 'SELL' if hold_side == 'LONG' else 'BUY',
-                             'amount': diff,
-                             'params': {
-                                 'reduceOnly': True,
-                                }
-                             },
-                     log_func=adl_log, retries=5, delay=2)
+async def _close_position(exchange, symbol, side, diff):
+    adl_log(f"Try createOrder: {symbol} {side} {diff} reduceOnly")
+    order = await retry_call_async(exchange.create_order,
+                                   params={'symbol': symbol,
+                                           'type': 'market',
+                                           'side': side,
+                                           'amount': diff,
+                                           'params': {
+                                               'reduceOnly': True,
+                                              }
+                                           },
+                                   log_func=adl_log, retries=5, base_delay=DEFAULT_BASE_DELAY,
+                                   max_delay=ORDER_MAX_DELAY)
     adl_log(order)
+    return order
+
+async def close_position_gate(gate_exchange, symbol, hold_side, diff):
+    return await _close_position(gate_exchange, symbol, 'sell' if hold_side == 'LONG' else 'buy', diff)
+
+async def close_position_bitget(bitget_exchange, symbol, hold_side, diff):
+    return await _close_position(bitget_exchange, symbol, 'SELL' if hold_side == 'LONG' else 'BUY', diff)
+
+def _position_totals(position):
+    """(tổng size cơ sở, side viết hoa, contract size) của một position ccxt; (0, None, None) nếu không có position."""
+    if position['side'] is None:
+        return 0, None, None
+    contract_size = float(position['contractSize'])
+    return float(position['contracts']) * contract_size, position['side'].upper(), contract_size
 
-def fetch_position_gate(gate_exchange, symbol):
+async def _fetch_position_gate(gate_exchange, symbol):
     try:
-        gate_position = gate_exchange.fetch_position(symbol)
+        gate_position = await gate_exchange.fetch_position(symbol)
         print(f"Current position: {gate_position}")
-        if gate_position['side'] is None:
-            gate_total = 0
-            gate_side = None
-            contract_size = None
-            return gate_total, gate_side, contract_size
-
-        gate_total = float(gate_position['contracts']) * float(gate_position['contractSize'])
-        gate_side = gate_position['side'].upper()
-        contract_size = float(gate_position['contractSize'])
-        return gate_total, gate_side, contract_size
+        return _position_totals(gate_position)
     except ExchangeError as e:
         adl_log(f"HTTP error occurred: {e}")
         if "POSITION_NOT_FOUND" in str(e.args[0]):
-            gate_total = 0
-            gate_side = None
-            contract_size = None
-            return gate_total, gate_side, contract_size
+            return 0, None, None
         else:
             raise e
 
-def fetch_position_bitget(bitget_exchange, symbol):
-    bitget_position= bitget_exchange.fetch_position(symbol)
+async def _fetch_position_bitget(bitget_exchange, symbol):
+    bitget_position = await bitget_exchange.fetch_position(symbol)
     print(f"Current position: {bitget_position}")
-    if bitget_position['side'] is None:
-        bitget_total = 0
-        bitget_side = None
-        contract_size = None
-    else:
-        bitget_total = float(bitget_position['contracts']) * float(bitget_position['contractSize'])
-        bitget_side = bitget_position['side'].upper()  # Convert to uppercase for consistency
-        contract_size = float(bitget_position['contractSize'])
-    return bitget_total, bitget_side, contract_size
\ No newline at end of file
+    return _position_totals(bitget_position)
+
+async def fetch_position_gate(gate_exchange, symbol):
+    return await retry_call_async(_fetch_position_gate, params={'gate_exchange': gate_exchange, 'symbol': symbol},
+                                  log_func=adl_log, retries=5, max_delay=FETCH_MAX_DELAY)
+
+async def fetch_position_bitget(bitget_exchange, symbol):
+    return await retry_call_async(_fetch_position_bitget, params={'bitget_exchange': bitget_exchange, 'symbol': symbol},
+                                  log_func=adl_log, retries=5, max_delay=FETCH_MAX_DELAY)
@@ -0,0 +1,130 @@
+import time
+
+EXCHANGES = ('bitget', 'gate')
+# Sàn mà mỗi message watch_positions là snapshot đầy đủ: symbol vắng mặt nghĩa là position đã đóng.
+# Gate chỉ đẩy contract vừa thay đổi (đóng lệnh -> update size 0), vắng mặt nghĩa là không đổi.
+FULL_SNAPSHOT_EXCHANGES = ('bitget',)
+
+
+class SymbolPosition:
+    """Size (lượng coin cơ sở) của một symbol trên từng sàn, kèm version tăng sau mỗi thay đổi."""
+
+    __slots__ = ('symbol', 'sizes', 'sides', 'contract_sizes', 'updated_at', 'version', 'armed')
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.sizes = {ex: 0.0 for ex in EXCHANGES}
+        self.sides = {ex: None for ex in EXCHANGES}           # 'LONG' / 'SHORT' / None
+        self.contract_sizes = {ex: None for ex in EXCHANGES}
+        self.updated_at = {ex: 0.0 for ex in EXCHANGES}  # lần cuối stream của sàn báo về symbol này
+        self.version = 0
+        self.armed = False  # đã từng thấy cả hai leg cùng mở (một cặp hedge thật), mới được ADL đối soát
+
+    def size(self, exchange):
+        return self.sizes.get(exchange, 0.0)
+
+    def totals(self, exchange):
+        """(tổng size cơ sở, side, contract size) như fetch_position_* trả về, nhưng lấy từ stream."""
+        if self.sizes[exchange] <= 0:
+            return 0, None, self.contract_sizes[exchange]
+        return self.sizes[exchange], self.sides[exchange], self.contract_sizes[exchange]
+
+    def __repr__(self):
+        return f"SymbolPosition({self.symbol}, {self.sizes}, v{self.version}, armed={self.armed})"
+
+
+class PositionChange:
+    __slots__ = ('symbol', 'exchange', 'old_size', 'new_size', 'version')
+
+    def __init__(self, symbol, exchange, old_size, new_size, version):
+        self.symbol = symbol
+        self.exchange = exchange
+        self.old_size = old_size
+        self.new_size = new_size
+        self.version = version
+
+    def __repr__(self):
+        return f"PositionChange({self.symbol} {self.exchange}: {self.old_size} -> {self.new_size}, v{self.version})"
+
+
+class PositionStore:
+    """
+    Trạng thái position của ADL theo symbol, cập nhật bằng delta của từng message websocket:
+    chỉ các symbol có trong message (và với sàn snapshot đầy đủ: các symbol đang mở mà message
+    không còn nhắc tới) được đụng tới, không copy/quét lại toàn bộ map.
+    """
+
+    def __init__(self, full_snapshot_exchanges=FULL_SNAPSHOT_EXCHANGES):
+        self.full_snapshot_exchanges = set(full_snapshot_exchanges)
+        self._symbols = {}                          # symbol -> SymbolPosition
+        self._open = {ex: set() for ex in EXCHANGES}  # symbol đang có size > 0 trên từng sàn
+        self._live = {ex: False for ex in EXCHANGES}  # stream đã có message từ lần (re)connect gần nhất
+        self.version = 0
+
+    def __contains__(self, symbol):
+        return symbol in self._symbols
+
+    def get(self, symbol):
+        return self._symbols.get(symbol)
+
+    def symbols(self):
+        return list(self._symbols)
+
+    def open_symbols(self, exchange=None):
+        if exchange is not None:
+            return set(self._open[exchange])
+        return set().union(*self._open.values())
+
+    def is_live(self, exchange):
+        return self._live[exchange]
+
+    def mark_stale(self, exchange):
+        """Stream lỗi/mất kết nối: size của sàn này không còn đáng tin tới message kế tiếp."""
+        self._live[exchange] = False
+
+    def _set(self, exchange, symbol, size, now, detail=None):
+        state = self._symbols.get(symbol)
+        if state is None:
+            state = self._symbols[symbol] = SymbolPosition(symbol)
+        state.updated_at[exchange] = now
+        if detail is not None:
+            state.sides[exchange] = detail[0]
+            if detail[1]:
+                state.contract_sizes[exchange] = detail[1]
+        elif size <= 0:
+            state.sides[exchange] = None
+        old = state.sizes[exchange]
+        if old == size:
+            return None
+        state.sizes[exchange] = size
+        if not state.armed and all(v > 0 for v in state.sizes.values()):
+            state.armed = True
+        if size > 0:
+            self._open[exchange].add(symbol)
+        else:
+            self._open[exchange].discard(symbol)
+        self.version += 1
+        state.version = self.version
+        return PositionChange(symbol, exchange, old, size, state.version)
+
+    def apply(self, exchange, sizes, details=None):
+        """
+        Áp một message của `exchange` ({symbol: size cơ sở}); details (tuỳ chọn) là
+        {symbol: (side, contract size)}. Trả về list PositionChange của các symbol thực sự đổi size.
+        """
+        now = time.time()
+        details = details or {}
+        self._live[exchange] = True
+        changes = []
+        if exchange in self.full_snapshot_exchanges:
+            for symbol in self._open[exchange] - sizes.keys():
+                changes.append(self._set(exchange, symbol, 0.0, now))
+        for symbol, size in sizes.items():
+            changes.append(self._set(exchange, symbol, size, now, details.get(symbol)))
+        return [c for c in changes if c is not None]
+
+    def remove(self, symbol):
+        """Bỏ hẳn symbol khỏi store (không còn theo dõi)."""
+        self._symbols.pop(symbol, None)
+        for symbols in self._open.values():
+            symbols.discard(symbol)
@@ -6,15 +6,19 @@ import time
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 
 from Core.Exchange.Exchange import ExchangeManager
+from Core.Tracker.BalanceCache import balance_cache
 from Core.Tracker.BitgetTracker import BitgetTracker
 from Core.Tracker.GateIOTracker import GateIOTracker
+from Core.Tracker.StreamingTracker import build_streaming_tracker
 from MainProcess.AssetControl.BalanceConfig import max_diff_rate
 import Define
 from Core.Tool import step, clear_console
+from Core.FanOut import fan_out
 from Core.Define import EXCHANGE, convert_exchange_to_name
 from Core.AliveServiceClient import AliveServiceClient
 from Define import asset_log_path, transfer_done_file, SERVICE_NAME, root_path, shared_log_path
-from Core.Logger import log_info, LogService
+from Core.Exchange.Metrics import exchange_metrics
+from Core.Logger import log_info, LogService, LogTarget
 
 start_time = time.time()
 
@@ -23,9 +27,21 @@ def asset_control_log(message):
     log_info(LogService.ASSET, str(message))
 
 
+def build_tracker(exchange_manager, exchange):
+    """Tracker cho một sàn; Binance đọc balance/position từ user-data stream thay vì poll REST."""
+    if exchange == EXCHANGE.BINANCE:
+        return build_streaming_tracker(exchange_manager, exchange)
+    if exchange == EXCHANGE.BITGET:
+        return BitgetTracker(exchange_manager.bitget_exchange)
+    if exchange == EXCHANGE.GATE:
+        return GateIOTracker(exchange_manager.gate_exchange)
+    return None
+
+
 class AssetProcess:
 
     MIN_ASSET_DIFF = max_diff_rate
+    BALANCE_MAX_AGE = 10  # seconds; tick chạy mỗi 5s, balance được làm mới ở background
 
     def __init__(self, binance_tracker, bitget_tracker):
         self.binance_tracker = binance_tracker
@@ -66,17 +82,26 @@ class AssetProcess:
             if first_line == 'OK':
                 asset_control_log("Transfer completed successfully.")
                 self.in_transfer = False
+                # Balance đã đổi -> tick sau phải đọc lại từ sàn trước khi quyết định chuyển tiếp
+                balance_cache.invalidate()
                 return True
             elif first_line == 'ERROR':
                 asset_control_log("Transfer failed, please check the logs for details.")
                 self.in_transfer = False
+                balance_cache.invalidate()
                 return True
             else:
                 return False
 
     def tick(self):
-        binance_asset_info = self.binance_tracker.get_cross_margin_account_info()
-        bitget_asset_info = self.bitget_tracker.get_cross_margin_account_info()
+        # Lấy balance 2 sàn cùng lúc; thiếu một bên thì không quyết định chuyển tiền trên dữ liệu nửa vời
+        result = fan_out([lambda: balance_cache.get(self.binance_tracker, self.BALANCE_MAX_AGE),
+                          lambda: balance_cache.get(self.bitget_tracker, self.BALANCE_MAX_AGE)])
+        if not result.complete:
+            for name, error in zip(('exchange1', 'exchange2'), result.errors):
+                if error is not None:
+                    asset_control_log(f"Fetch balance of {name} failed: {error}")
+        binance_asset_info, bitget_asset_info = result.raise_first()
 
         total = binance_asset_info.total_margin_balance + bitget_asset_info.total_margin_balance
         min_balance = total/2 - total* self.MIN_ASSET_DIFF
@@ -118,22 +143,13 @@ if __name__ == '__main__':
     exchange2 = Define.exchange2
     exchange_manager = ExchangeManager(exchange1, exchange2)
     asset_control_log("Starting asset balance process...")
+    exchange_metrics.start_periodic_log(lambda m: log_info(LogService.ASSET, m, target=LogTarget.SERVICE))
 
-    exchange1_tracker = None
-    if exchange1 == EXCHANGE.BITGET:
-        exchange1_tracker = BitgetTracker(exchange_manager.bitget_exchange)
-    elif exchange1 == EXCHANGE.GATE:
-        exchange1_tracker = GateIOTracker(exchange_manager.gate_exchange)
-
-    exchange2_tracker = None
-    if exchange2 == EXCHANGE.BITGET:
-        exchange2_tracker = BitgetTracker(exchange_manager.bitget_exchange)
-    elif exchange2 == EXCHANGE.GATE:
-        exchange2_tracker = GateIOTracker(exchange_manager.gate_exchange)
-
+    exchange1_tracker = build_tracker(exchange_manager, exchange1)
+    exchange2_tracker = build_tracker(exchange_manager, exchange2)
 
     if exchange1_tracker is None or exchange2_tracker is None:
-        asset_control_log(f"Invalid exchanges: {exchange1}, {exchange2}. Must be one of ['bitget', 'gate']")
+        asset_control_log(f"Invalid exchanges: {exchange1}, {exchange2}. Must be one of ['bitget', 'gate', 'binance']")
         sys.exit(1)
 
     asset_process = AssetProcess(exchange1_tracker, exchange2_tracker)
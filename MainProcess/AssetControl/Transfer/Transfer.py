@@ -7,6 +7,8 @@ from TransferConfig import TransferConfig
 from Core.Define import EXCHANGE
 from Define import transfer_done_file, exchange2, exchange1
 from Core.Tool import try_this
+from Core.Retry import retry_call
+from Core.Exchange.Metrics import exchange_metrics
 from Core.Logger import log_info, LogService, LogTarget
 
 
@@ -17,6 +19,9 @@ gate = exchange_manager.gate_exchange
 
 start_time = time.time()
 
+WITHDRAWAL_WAIT_DEADLINE = 300  # seconds
+DEPOSIT_WAIT_DEADLINE = 300  # seconds
+
 
 def tunel_log(message):
     # Chỉ ghi vào service log (logs/tunel/syslog.log); không ghi shared, không ghi Discord
@@ -179,8 +184,11 @@ def transfer_tunel(from_exchange, to_exchange, amount):
 
         # deposit to spot
         time.sleep(20)
-        txid = try_this(get_withdrawal_txid, params={'exchange': from_exchange, 'order_id': client_id}, log_func=tunel_log, retries=30, delay=10)
-        try_this(wait_for_desposit, params={'exchange': to_exchange, 'txid': txid}, log_func=tunel_log, retries=30, delay=10)
+        # Chờ theo tổng thời gian (deadline) thay vì số lần thử cố định
+        txid = retry_call(get_withdrawal_txid, params={'exchange': from_exchange, 'order_id': client_id}, log_func=tunel_log,
+                          retries=None, max_delay=10, deadline=WITHDRAWAL_WAIT_DEADLINE)
+        retry_call(wait_for_desposit, params={'exchange': to_exchange, 'txid': txid}, log_func=tunel_log,
+                   retries=None, max_delay=10, deadline=DEPOSIT_WAIT_DEADLINE)
 
         # Transfer from spot to swap
         time.sleep(30)
@@ -190,6 +198,8 @@ def transfer_tunel(from_exchange, to_exchange, amount):
         tunel_log(f"Transfer failed, {e}")
         write_transfer_status(False)
         raise
+    finally:
+        tunel_log(exchange_metrics.summary_line())
 
 def write_transfer_status(bOk):
     with open(transfer_done_file, 'w+', encoding='utf-8') as f:
@@ -6,6 +6,8 @@ from ccxt import ExchangeError
 import json
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 from Core.Exchange.Exchange import ExchangeManager
+from Core.Exchange.Metrics import exchange_metrics
+from Core.Exchange.SymbolIndex import symbol_index
 from MainProcess.TP_SL_Control.Order import open_take_profit_bitget, open_stop_loss_bitget, open_take_profit_gate, \
     open_stop_loss_gate
 from Define import tp_sl_log_path, exchange1, exchange2, tp_sl_info_path, root_path
@@ -19,7 +21,7 @@ def tp_sl_log(message):
 
 def auto_tp_sl(bitget, gate, symbol, tp_rate, sl_rate, interval=180):
     while True:
-        bitget_symbol = "OMNI1/USDT:USDT" if symbol == "OMNI/USDT:USDT" else symbol
+        bitget_symbol = symbol_index.ccxt_symbol('bitget', symbol)
         bitget_position = bitget.fetch_position(bitget_symbol)
         tp_sl_log(f"Current position: {bitget_position}")
         if bitget_position['side'] is None:
@@ -79,6 +81,7 @@ if __name__ == '__main__':
     exchange_manager = ExchangeManager(exchange1, exchange2)
     bitget = exchange_manager.bitget_exchange
     gate = exchange_manager.gate_exchange
+    exchange_metrics.start_periodic_log(tp_sl_log)
 
     with open(tp_sl_info_path, 'r', encoding='utf-8') as f:
         config = json.load(f)
@@ -96,7 +99,7 @@ if __name__ == '__main__':
 
     threads = []
     for symbol in symbols:
-        symbol_full = f"{symbol}/USDT:USDT"
+        symbol_full = symbol_index.ccxt_symbol('gate', symbol)
         t = threading.Thread(target=auto_tp_sl, args=(bitget, gate, symbol_full, tp_rate, sl_rate, interval))
         t.start()
         threads.append(t)
@@ -11,6 +11,11 @@ from fastapi.middleware.cors import CORSMiddleware
 from Server.AppCore import AppCore, Position, FundingStats
 from Server.ServiceManager.MicroserviceManager import Microservice
 from Server.AssetReporter.AssetReporter import AssetReporter
+from Core.Exchange.Exchange import get_async_exchange_manager
+from Core.Exchange.Metrics import exchange_metrics
+from Core.Tracker.Exposure import exposure
+from Core.Logger import log_info, log_warning, LogService, LogTarget
+from Define import exchange1, exchange2
 
 app = FastAPI()
 
@@ -47,14 +52,26 @@ def update_microservice_status(id: str):
 
 
 @app.get("/bot1api/positions", response_model=List[Position])
-def get_positions():
-    return app_core.get_positions()
+async def get_positions():
+    return await app_core.get_positions_async()
+
+
+@app.get("/bot1api/hedge-imbalance")
+async def get_hedge_imbalance(minNotional: float = 0.0, top: Optional[int] = None):
+    # Symbols ranked by notional at risk (long vs short legs compared in base units)
+    return await app_core.get_hedge_imbalance_async(minNotional, top)
+
+
+@app.get("/bot1api/exposure")
+async def get_exposure(asset: Optional[str] = None):
+    # Net base-unit / USDT exposure per coin and per exchange
+    return await app_core.get_exposure_async(asset)
 
 
 @app.get("/bot1api/funding", response_model=List[FundingStats])
-def get_funding(quick: bool = False):
+async def get_funding(quick: bool = False):
     try:
-        return app_core.get_funding_stats(quick=quick)
+        return await app_core.get_funding_stats_async(quick=quick)
     except Exception as e:
         print(f"[WARN] /bot1api/funding failed: {e}")
         # Return empty list so UI doesn’t break; details in server log
@@ -73,13 +90,21 @@ def update_position_status(payload: PositionPayLoad):
 
 
 @app.post("/bot1api/positions/estimate")
-def estimate_position_status(payload: PositionPayLoad):
-    result, e = app_core.estimate_position(payload.symbol, payload.size)
+async def estimate_position_status(payload: PositionPayLoad):
+    result, e = await app_core.estimate_position_async(payload.symbol, payload.size)
     if not result:
         raise HTTPException(status_code=400, detail=str(e))
     return e
 
 
+@app.get("/bot1api/contract-specs/{symbol}")
+def get_contract_specs(symbol: str):
+    specs = app_core.get_contract_specs(symbol)
+    if not any(specs['exchanges'].values()):
+        raise HTTPException(status_code=404, detail=f"No contract specs for {symbol}")
+    return specs
+
+
 # New: open hedge position with explicit long/short selection
 class HedgeOpenPayload(BaseModel):
     symbol: str
@@ -116,8 +141,8 @@ def get_asset_report(limit: Optional[int] = None):
 
 # New: get current live balances
 @app.get("/bot1api/asset-report/current", response_model=AssetRecord)
-def get_asset_current():
-    data = asset_reporter.get_current()
+async def get_asset_current():
+    data = await asset_reporter.get_current_async()
     return data
 
 @app.post("/bot1api/asset-report/snapshot", response_model=AssetRecord)
@@ -125,6 +150,27 @@ def create_asset_snapshot():
     data = asset_reporter.take_snapshot()
     return data
 
+@app.on_event("startup")
+def start_metrics_log():
+    exchange_metrics.start_periodic_log(lambda m: log_info(LogService.SERVER, m, target=LogTarget.SERVICE))
+
+@app.on_event("startup")
+def start_exposure_alerts():
+    def _alert(alert):
+        log_warning(LogService.SERVER, f"[exposure] {alert['asset']} {alert['status']}: net {alert['netBase']:.6g} "
+                                       f"({alert['netUsdt']:.2f} USDT, threshold {alert['threshold']:.0f})")
+    exposure.add_listener(_alert)
+
+@app.on_event("shutdown")
+async def close_exchange_sessions():
+    # Close the pooled aiohttp session shared by the async exchange clients
+    await get_async_exchange_manager(exchange1, exchange2).close()
+
+@app.get("/metrics")
+def get_metrics():
+    # Latency histograms, call/retry/error counts per exchange endpoint of this server process
+    return exchange_metrics.snapshot()
+
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
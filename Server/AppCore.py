@@ -1,5 +1,7 @@
+import asyncio
 import threading
 import time
+from typing import Optional
 
 from pydantic import BaseModel, Field
 
@@ -7,7 +9,13 @@ from Server.PositionCreator.PositionCreator import PositionCreator
 from Server.ServiceManager.MicroserviceManager import MicroserviceManager
 from Server.PositionView.PositionView import PositionView
 from Core.Define import convert_exchange_to_name
-from Core.Exchange.Exchange import ExchangeManager
+from Core.Exchange.Exchange import get_exchange_manager, get_async_exchange_manager
+from Core.Exchange.ContractSpec import contract_specs
+from Core.Exchange.SymbolIndex import symbol_index
+from Core.Tracker.Exposure import exposure
+from Define import exchange1, exchange2
+
+EXPOSURE_MAX_AGE = 30  # seconds
 
 
 
@@ -42,9 +50,8 @@ class AppCore:
         self.microservice_manager = MicroserviceManager()
         self.position_manager = PositionView()
         self.position_creator = PositionCreator()
-        # Separate exchange manager for market data (funding rates)
-        self.exchange_manager = ExchangeManager(self.position_manager.tracker.client.id.upper() if hasattr(self.position_manager.tracker.client, 'id') else None,
-                                                self.position_manager.bitget_tracker.client.id.upper() if hasattr(self.position_manager.bitget_tracker.client, 'id') else None) if hasattr(self.position_manager, 'tracker') else ExchangeManager
+        # Shared exchange manager (same clients as PositionView/PositionCreator)
+        self.exchange_manager = get_exchange_manager(exchange1, exchange2)
         self.run()
 
     def get_microservices(self):
@@ -64,11 +71,28 @@ class AppCore:
             time.sleep(5)
 
     def run(self):
-        main_thread = threading.Thread(target=self.main_loop)
+        main_thread = threading.Thread(target=self.main_loop, daemon=True)
         main_thread.start()
 
     def get_positions(self):
         self.position_manager.refresh()
+        return self._build_positions()
+
+    async def get_positions_async(self):
+        await self.position_manager.refresh_async()
+        return self._build_positions()
+
+    async def get_hedge_imbalance_async(self, min_notional: float = 0.0, top: Optional[int] = None):
+        await self.position_manager.refresh_async()
+        return self.position_manager.get_hedge_imbalance(min_notional, top)
+
+    async def get_exposure_async(self, asset: Optional[str] = None):
+        # Served from memory; only refresh when nothing (stream or /positions) has updated it recently
+        if time.time() - exposure.updated_at > EXPOSURE_MAX_AGE:
+            await self.position_manager.refresh_async()
+        return exposure.snapshot(asset.upper() if asset else None)
+
+    def _build_positions(self):
         position =  self.position_manager.get_core_positions()
         result = []
         for pos in position:
@@ -84,130 +108,138 @@ class AppCore:
 
         return result
 
-    def _to_bitget_symbol(self, internal_symbol: str) -> str:
-        # internal like BTCUSDT -> BTC/USDT:USDT
-        if internal_symbol.endswith('USDT') and '/' not in internal_symbol:
-            base = internal_symbol[:-4]
-            return f"{base}/USDT:USDT"
-        return internal_symbol
-
-    def _to_gate_symbol(self, internal_symbol: str) -> str:
-        # Gate USDT-margined perpetuals use BASE/USDT:USDT in ccxt
-        if internal_symbol.endswith('USDT') and '/' not in internal_symbol:
-            base = internal_symbol[:-4]
-            return f"{base}/USDT:USDT"
-        # If already a pair without :USDT, append it to force swap contract
-        if "/USDT" in internal_symbol and ":USDT" not in internal_symbol:
-            return internal_symbol + ":USDT"
-        return internal_symbol
-
-    def _normalize_swap_symbol(self, symbol: str) -> str:
-        """Return a swap contract symbol like BTC/USDT:USDT if not already normalized."""
-        if '/' in symbol and ':USDT' in symbol:
-            return symbol
-        if symbol.endswith('USDT'):
-            base = symbol[:-4]
-            return f"{base}/USDT:USDT"
-        return symbol
+    def _funding_client_symbol(self, exchange_name: str, internal_symbol: str, clients):
+        bitget, gate = clients
+        if exchange_name == 'bitget':
+            return bitget, symbol_index.ccxt_symbol('bitget', internal_symbol)
+        if exchange_name == 'gate':
+            return gate, symbol_index.ccxt_symbol('gate', internal_symbol)
+        return None, None
+
+    def _summarize_funding(self, fr, hist, now_ms: int):
+        """Turn a fetchFundingRate result and (optional) history into (next, recent, sum3d, sum7d)."""
+        ms_3d = 3 * 24 * 60 * 60 * 1000
+        ms_7d = 7 * 24 * 60 * 60 * 1000
+        next_rate = float(fr.get('fundingRate')) if fr and fr.get('fundingRate') is not None else None
+        recent: list[FundingPoint] = []
+        sum3 = None
+        sum7 = None
+        if hist:
+            try:
+                def _ts(it):
+                    return int(it.get('timestamp') or it.get('datetime') or 0)
+                hist = sorted([h for h in hist if h.get('fundingRate') is not None], key=_ts)
+                for item in hist[-3:]:
+                    ts = _ts(item)
+                    r = float(item.get('fundingRate'))
+                    if ts and r is not None:
+                        recent.append(FundingPoint(timestamp=ts, rate=r))
+            except Exception:
+                pass
+        # compute sums for compatibility if we have recents
+        if recent:
+            s3 = 0.0
+            s7 = 0.0
+            for p in recent:
+                if p.timestamp >= now_ms - ms_7d:
+                    s7 += p.rate
+                    if p.timestamp >= now_ms - ms_3d:
+                        s3 += p.rate
+            sum3 = s3
+            sum7 = s7
+        return next_rate, recent, sum3, sum7
+
+    def _build_funding_stats(self, core_positions, per_leg) -> list[FundingStats]:
+        # per_leg: list of ((n1, r1, s3_1, s7_1), (n2, r2, s3_2, s7_2)) aligned with core_positions
+        output: list[FundingStats] = []
+        for arb, (leg1, leg2) in zip(core_positions, per_leg):
+            stats = FundingStats(
+                symbol=arb.long_position.symbol,
+                exchange1=convert_exchange_to_name(arb.long_position.exchange),
+                exchange2=convert_exchange_to_name(arb.short_position.exchange),
+            )
+            stats.nextRate1, stats.recent1, stats.sumRate3d1, stats.sumRate7d1 = leg1
+            stats.nextRate2, stats.recent2, stats.sumRate3d2, stats.sumRate7d2 = leg2
+            output.append(stats)
+        return output
 
     def get_funding_stats(self, quick: bool = False) -> list[FundingStats]:
-        import ccxt
         import time as _time
 
         # Ensure positions are up-to-date
         self.position_manager.refresh()
         core_positions = self.position_manager.get_core_positions()
 
-        # Prepare clients
-        # Use fresh ccxt instances with proper options, to avoid shared state surprises
-        bitget = ccxt.bitget({ 'options': { 'defaultType': 'swap' } })
-        gate = ccxt.gateio({ 'options': { 'defaultType': 'swap' } })
-
+        # Reuse the shared swap clients from the registry (markets already hydrated)
+        clients = (self.exchange_manager.bitget_exchange, self.exchange_manager.gate_exchange)
         now_ms = int(_time.time() * 1000)
-        ms_3d = 3 * 24 * 60 * 60 * 1000
-        ms_7d = 7 * 24 * 60 * 60 * 1000
 
         def fetch_funding_for(exchange_name: str, internal_symbol: str):
-            next_rate = None
-            recent: list[FundingPoint] = []
-            sum3 = None
-            sum7 = None
+            fr = None
+            hist = None
             try:
-                if exchange_name == 'bitget':
-                    sym = self._to_bitget_symbol(internal_symbol)
-                    fr = bitget.fetchFundingRate(sym)
-                    next_rate = float(fr.get('fundingRate')) if fr and fr.get('fundingRate') is not None else None
-                    if not quick:
-                        try:
-                            hist = bitget.fetchFundingRateHistory(sym, limit=10)
-                            def _ts(it):
-                                return int(it.get('timestamp') or it.get('datetime') or 0)
-                            hist = sorted([h for h in hist if h.get('fundingRate') is not None], key=_ts)
-                            for item in hist[-3:]:
-                                ts = _ts(item)
-                                r = float(item.get('fundingRate'))
-                                if ts and r is not None:
-                                    recent.append(FundingPoint(timestamp=ts, rate=r))
-                        except Exception:
-                            pass
-                elif exchange_name == 'gate':
-                    sym = self._to_gate_symbol(internal_symbol)
-                    fr = gate.fetchFundingRate(sym)
-                    next_rate = float(fr.get('fundingRate')) if fr and fr.get('fundingRate') is not None else None
+                client, sym = self._funding_client_symbol(exchange_name, internal_symbol, clients)
+                if client is not None:
+                    fr = client.fetchFundingRate(sym)
                     if not quick:
                         try:
-                            hist = gate.fetchFundingRateHistory(sym, limit=10)
-                            def _tsg(it):
-                                return int(it.get('timestamp') or it.get('datetime') or 0)
-                            hist = sorted([h for h in hist if h.get('fundingRate') is not None], key=_tsg)
-                            for item in hist[-3:]:
-                                ts = _tsg(item)
-                                r = float(item.get('fundingRate'))
-                                if ts and r is not None:
-                                    recent.append(FundingPoint(timestamp=ts, rate=r))
+                            hist = client.fetchFundingRateHistory(sym, limit=10)
                         except Exception:
                             pass
-                # compute sums for compatibility if we have recents
-                if recent:
-                    s3 = 0.0
-                    s7 = 0.0
-                    for p in recent:
-                        if p.timestamp >= now_ms - ms_7d:
-                            s7 += p.rate
-                            if p.timestamp >= now_ms - ms_3d:
-                                s3 += p.rate
-                    sum3 = s3
-                    sum7 = s7
             except Exception:
                 pass
-            return next_rate, recent, sum3, sum7
+            return self._summarize_funding(fr, hist, now_ms)
 
         # For each arbitrage position, fetch funding data for both exchanges
-        output: list[FundingStats] = []
+        per_leg = []
         for arb in core_positions:
             internal_symbol = arb.long_position.symbol
-            ex1 = convert_exchange_to_name(arb.long_position.exchange)
-            ex2 = convert_exchange_to_name(arb.short_position.exchange)
-            stats = FundingStats(
-                symbol=internal_symbol,
-                exchange1=ex1,
-                exchange2=ex2,
-            )
+            per_leg.append((
+                fetch_funding_for(convert_exchange_to_name(arb.long_position.exchange), internal_symbol),
+                fetch_funding_for(convert_exchange_to_name(arb.short_position.exchange), internal_symbol),
+            ))
+        return self._build_funding_stats(core_positions, per_leg)
 
-            n1, r1, s3_1, s7_1 = fetch_funding_for(ex1, internal_symbol)
-            n2, r2, s3_2, s7_2 = fetch_funding_for(ex2, internal_symbol)
-            stats.nextRate1 = n1
-            stats.recent1 = r1
-            stats.sumRate3d1 = s3_1
-            stats.sumRate7d1 = s7_1
-            stats.nextRate2 = n2
-            stats.recent2 = r2
-            stats.sumRate3d2 = s3_2
-            stats.sumRate7d2 = s7_2
+    async def get_funding_stats_async(self, quick: bool = False) -> list[FundingStats]:
+        """Async variant: every funding call for every leg is issued concurrently."""
+        import time as _time
 
-            output.append(stats)
+        await self.position_manager.refresh_async()
+        core_positions = list(self.position_manager.get_core_positions())
 
-        return output
+        async_manager = get_async_exchange_manager(exchange1, exchange2)
+        clients = (async_manager.bitget_exchange, async_manager.gate_exchange)
+        now_ms = int(_time.time() * 1000)
+
+        async def fetch_funding_for(exchange_name: str, internal_symbol: str):
+            fr = None
+            hist = None
+            try:
+                client, sym = self._funding_client_symbol(exchange_name, internal_symbol, clients)
+                if client is not None:
+                    if quick:
+                        fr = await client.fetchFundingRate(sym)
+                    else:
+                        fr, hist = await asyncio.gather(client.fetchFundingRate(sym),
+                                                        client.fetchFundingRateHistory(sym, limit=10),
+                                                        return_exceptions=True)
+                        if isinstance(fr, Exception):
+                            fr = None
+                        if isinstance(hist, Exception):
+                            hist = None
+            except Exception:
+                pass
+            return self._summarize_funding(fr, hist, now_ms)
+
+        async def fetch_legs(arb):
+            internal_symbol = arb.long_position.symbol
+            return await asyncio.gather(
+                fetch_funding_for(convert_exchange_to_name(arb.long_position.exchange), internal_symbol),
+                fetch_funding_for(convert_exchange_to_name(arb.short_position.exchange), internal_symbol),
+            )
+
+        per_leg = await asyncio.gather(*(fetch_legs(arb) for arb in core_positions))
+        return self._build_funding_stats(core_positions, per_leg)
 
     def open_position(self, symbol, size):
         # Don't mutate symbol twice; estimate_position will normalize it
@@ -227,13 +259,22 @@ class AppCore:
                 amount = None
         else:
             amount = str(e)
-        self.position_creator.open_position(self._normalize_swap_symbol(symbol), amount or "0")
+        self.position_creator.open_position(symbol_index.swap_symbol(symbol), amount or "0")
         return True, e
 
     def estimate_position(self, symbol, size):
-        symbol = self._normalize_swap_symbol(symbol)
+        symbol = symbol_index.swap_symbol(symbol)
         return self.position_creator.estimate_position(symbol, size)
 
     def open_position_hedge(self, symbol: str, long_exchange: str, long_contracts: float, short_exchange: str, short_contracts: float):
         # do not normalize twice; PositionCreator handles per-exchange symbols
         return self.position_creator.open_hedge_position(symbol, long_exchange, long_contracts, short_exchange, short_contracts)
+
+    async def estimate_position_async(self, symbol, size):
+        symbol = symbol_index.swap_symbol(symbol)
+        return await self.position_creator.estimate_position_async(symbol, size)
+
+    def get_contract_specs(self, symbol: str):
+        """Precomputed contract specs of `symbol` on both hedge legs plus the common base step."""
+        return contract_specs.specs_for(symbol, [self.exchange_manager.bitget_exchange,
+                                                 self.exchange_manager.gate_exchange])
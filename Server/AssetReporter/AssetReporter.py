@@ -5,9 +5,13 @@ import time
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
 
-from Core.Exchange.Exchange import ExchangeManager
+from Core.FanOut import fan_out, fan_out_async
+from Core.Exchange.Exchange import get_exchange_manager, get_async_exchange_manager
+from Core.Tracker.BalanceCache import balance_cache
+from Core.Tracker.BinanceTracker import BinanceTracker
 from Core.Tracker.BitgetTracker import BitgetTracker
 from Core.Tracker.GateIOTracker import GateIOTracker
+from Core.Tracker.StreamingTracker import STREAMING_TRACKERS, StreamingTracker, build_streaming_tracker
 from Core.Define import EXCHANGE
 from Define import exchange1, exchange2, log_path
 
@@ -19,6 +23,8 @@ class AssetReporter:
     """
 
     SCHEDULE_HOURS = [0, 4, 8, 12, 16]
+    # Max balance staleness (seconds) accepted by /asset-report/current; snapshots always read fresh
+    CURRENT_MAX_AGE = 15
 
     def __init__(self, report_file: Optional[str] = None):
         self.report_file = report_file or os.path.join(log_path, "asset_report.jsonl")
@@ -26,22 +32,30 @@ class AssetReporter:
         os.makedirs(os.path.dirname(self.report_file), exist_ok=True)
 
         # Build exchange manager and trackers once for reuse
-        self.exchange_manager = ExchangeManager(exchange1, exchange2)
+        self.exchange_manager = get_exchange_manager(exchange1, exchange2)
         self.tracker1 = self._build_tracker(exchange1)
         self.tracker2 = self._build_tracker(exchange2)
+        # Async trackers are built lazily inside the server event loop
+        self._async_trackers = None
 
         self._stop_event = threading.Event()
         self._thread = threading.Thread(target=self._scheduler_loop, name="AssetReporterScheduler", daemon=True)
         self._thread.start()
 
-    def _build_tracker(self, ex: EXCHANGE):
+    def _build_tracker(self, ex: EXCHANGE, exchange_manager=None):
         """Create a tracker instance for the given exchange enum. Returns None if unsupported."""
         try:
+            # Binance always uses its user-data stream; the others when STREAMING_TRACKERS is on
+            if exchange_manager is None and (STREAMING_TRACKERS or ex == EXCHANGE.BINANCE):
+                return build_streaming_tracker(self.exchange_manager, ex)
+            exchange_manager = exchange_manager or self.exchange_manager
             if ex == EXCHANGE.BITGET or ex == EXCHANGE.BITGET_SUB:
-                return BitgetTracker(self.exchange_manager.bitget_exchange)
+                return BitgetTracker(exchange_manager.bitget_exchange)
             if ex == EXCHANGE.GATE:
-                return GateIOTracker(self.exchange_manager.gate_exchange)
-            # Not implemented trackers (BINANCE, BYBIT, OKX) -> None
+                return GateIOTracker(exchange_manager.gate_exchange)
+            if ex == EXCHANGE.BINANCE:
+                return BinanceTracker(exchange_manager.binance_exchange)
+            # Not implemented trackers (BYBIT, OKX) -> None
             return None
         except Exception:
             return None
@@ -93,24 +107,34 @@ class AssetReporter:
         except Exception:
             return 0.0
 
-    def _get_balances(self) -> Dict[str, float]:
-        # For each side, fetch total_margin_balance if tracker available
-        side1 = 0.0
-        side2 = 0.0
-        try:
-            if self.tracker1 is not None:
-                info1 = self.tracker1.get_cross_margin_account_info()
-                side1 = self._safe_float(getattr(info1, 'total_margin_balance', 0.0))
-        except Exception:
-            side1 = 0.0
-        try:
-            if self.tracker2 is not None:
-                info2 = self.tracker2.get_cross_margin_account_info()
-                side2 = self._safe_float(getattr(info2, 'total_margin_balance', 0.0))
-        except Exception:
-            side2 = 0.0
+    def _margin_balance(self, info) -> float:
+        return self._safe_float(getattr(info, 'total_margin_balance', 0.0))
+
+    def _sides(self, result) -> Dict[str, float]:
+        # A side that failed or timed out counts as 0.0 (partial result), as before
+        side1 = self._margin_balance(result.value(0))
+        side2 = self._margin_balance(result.value(1))
         return {"side1": side1, "side2": side2, "total": side1 + side2}
 
+    def _get_balances(self, max_age: float = 0) -> Dict[str, float]:
+        # Both sides are fetched at once (through the shared balance cache); total_margin_balance if available
+        result = fan_out([(lambda t=tracker: balance_cache.get(t, max_age)) if tracker is not None else None
+                          for tracker in (self.tracker1, self.tracker2)])
+        return self._sides(result)
+
+    async def _get_balances_async(self, max_age: float = 0) -> Dict[str, float]:
+        # Same as _get_balances but both sides are fetched concurrently on the event loop
+        if self._async_trackers is None:
+            # Streaming trackers already serve both sync and async reads from their snapshot
+            async_manager = get_async_exchange_manager(exchange1, exchange2)
+            self._async_trackers = tuple(
+                tracker if isinstance(tracker, StreamingTracker) else self._build_tracker(ex, async_manager)
+                for ex, tracker in ((exchange1, self.tracker1), (exchange2, self.tracker2)))
+
+        result = await fan_out_async([balance_cache.get_async(tracker, max_age) if tracker is not None else None
+                                      for tracker in self._async_trackers])
+        return self._sides(result)
+
     def take_snapshot(self) -> Dict[str, Any]:
         ts = datetime.now().isoformat(timespec='seconds')
         balances = self._get_balances()
@@ -161,7 +185,17 @@ class AssetReporter:
     # New: get the current balances instantly without writing to the report file
     def get_current(self) -> Dict[str, Any]:
         ts = datetime.now().isoformat(timespec='seconds')
-        balances = self._get_balances()
+        balances = self._get_balances(self.CURRENT_MAX_AGE)
+        return {
+            "timestamp": ts,
+            "side1": balances["side1"],
+            "side2": balances["side2"],
+            "total": balances["total"],
+        }
+
+    async def get_current_async(self) -> Dict[str, Any]:
+        ts = datetime.now().isoformat(timespec='seconds')
+        balances = await self._get_balances_async(self.CURRENT_MAX_AGE)
         return {
             "timestamp": ts,
             "side1": balances["side1"],
@@ -0,0 +1,152 @@
+"""
+Benchmark offline các endpoint của server và các vòng lặp nền trên dữ liệu đã ghi.
+
+Ghi dữ liệu (chạy server/service với key thật):
+    EXCHANGE_RECORD_DIR=/home/ubuntu/fr_bot/data/replay python Server/App.py
+
+Chạy benchmark (không cần key, không gọi sàn):
+    python Server/Benchmark/ReplayBenchmark.py --replay-dir /home/ubuntu/fr_bot/data/replay \
+        --iterations 20 --concurrency 4 --latency recorded --symbol BTCUSDT
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline replay benchmark for server endpoints and background loops")
+    parser.add_argument('--replay-dir', default=os.getenv("EXCHANGE_REPLAY_DIR"), required=not os.getenv("EXCHANGE_REPLAY_DIR"))
+    parser.add_argument('--iterations', '-n', type=int, default=20)
+    parser.add_argument('--concurrency', '-c', type=int, default=4)
+    parser.add_argument('--latency', default=os.getenv("EXCHANGE_REPLAY_LATENCY", "recorded"),
+                        help='"recorded", "<ms>" hoặc "<ms>:<jitter_ms>"')
+    parser.add_argument('--symbol', default="BTCUSDT")
+    parser.add_argument('--size', type=float, default=100.0)
+    parser.add_argument('--only', nargs='*', help="Chỉ chạy các target có tên trong danh sách")
+    return parser.parse_args()
+
+
+def _report(name, durations, errors, elapsed):
+    if not durations:
+        print(f"{name:<24} no successful calls, errors={errors}")
+        return
+    durations = sorted(durations)
+    p95 = durations[min(len(durations) - 1, int(round(0.95 * (len(durations) - 1))))]
+    print(f"{name:<24} n={len(durations):<4} err={errors:<3} "
+          f"thr={len(durations) / elapsed:8.2f}/s p50={statistics.median(durations):8.1f}ms "
+          f"p95={p95:8.1f}ms max={durations[-1]:8.1f}ms")
+
+
+def run_sync(name, func, iterations, concurrency):
+    durations = []
+    errors = 0
+
+    def _one():
+        start = time.perf_counter()
+        func()
+        return (time.perf_counter() - start) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(_one) for _ in range(iterations)]
+        for f in futures:
+            try:
+                durations.append(f.result())
+            except Exception as e:
+                errors += 1
+                print(f"[WARN] {name}: {e}")
+    _report(name, durations, errors, time.perf_counter() - started)
+
+
+async def run_async(name, coro_func, iterations, concurrency):
+    durations = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _one():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await coro_func()
+                durations.append((time.perf_counter() - start) * 1000)
+            except Exception as e:
+                errors += 1
+                print(f"[WARN] {name}: {e}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_one() for _ in range(iterations)))
+    _report(name, durations, errors, time.perf_counter() - started)
+
+
+def main():
+    args = parse_args()
+    # Phải đặt trước khi import Core.Exchange.* để registry tạo client phát lại
+    os.environ["EXCHANGE_REPLAY_DIR"] = args.replay_dir
+    os.environ["EXCHANGE_REPLAY_LATENCY"] = args.latency
+
+    from Core.Exchange.Exchange import get_exchange_manager, get_async_exchange_manager
+    from Core.Exchange.Metrics import exchange_metrics
+    from Core.Tracker.BitgetTracker import BitgetTracker
+    from Core.Tracker.GateIOTracker import GateIOTracker
+    from Define import exchange1, exchange2
+    from Server.AppCore import AppCore
+    from Server.AssetReporter.AssetReporter import AssetReporter
+
+    app_core = AppCore()
+    asset_reporter = AssetReporter()
+    asset_reporter.stop()
+    manager = get_exchange_manager(exchange1, exchange2)
+    bitget_tracker = BitgetTracker(manager.bitget_exchange)
+    gate_tracker = GateIOTracker(manager.gate_exchange)
+
+    # Endpoint của server (bản sync) và các lời gọi của vòng lặp nền (AssetControl, PositionView)
+    sync_targets = {
+        'positions': app_core.get_positions,
+        'funding_quick': lambda: app_core.get_funding_stats(quick=True),
+        'funding': app_core.get_funding_stats,
+        'estimate': lambda: app_core.estimate_position(args.symbol, args.size),
+        'asset_current': asset_reporter.get_current,
+        'loop_bitget_positions': bitget_tracker.get_open_positions,
+        'loop_gate_positions': gate_tracker.get_open_positions,
+        'loop_bitget_balance': bitget_tracker.get_cross_margin_account_info,
+        'loop_gate_balance': gate_tracker.get_cross_margin_account_info,
+    }
+    # Endpoint async mà FastAPI thực sự dùng
+    async_targets = {
+        'positions_async': app_core.get_positions_async,
+        'funding_quick_async': lambda: app_core.get_funding_stats_async(quick=True),
+        'funding_async': app_core.get_funding_stats_async,
+        'estimate_async': lambda: app_core.estimate_position_async(args.symbol, args.size),
+        'asset_current_async': asset_reporter.get_current_async,
+    }
+
+    def selected(name):
+        return not args.only or name in args.only
+
+    print(f"Replay from {args.replay_dir}, latency={args.latency}, "
+          f"iterations={args.iterations}, concurrency={args.concurrency}")
+    for name, func in sync_targets.items():
+        if selected(name):
+            run_sync(name, func, args.iterations, args.concurrency)
+
+    async def _run_async_targets():
+        try:
+            for name, coro_func in async_targets.items():
+                if selected(name):
+                    await run_async(name, coro_func, args.iterations, args.concurrency)
+        finally:
+            await get_async_exchange_manager(exchange1, exchange2).close()
+
+    asyncio.run(_run_async_targets())
+    print(exchange_metrics.summary_line(top=10))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,4 @@
+import asyncio
 import math
 import sys
 import ccxt
@@ -7,12 +8,14 @@ from Core.Tool import round_keep_n_digits
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 
-from Core.Exchange.Exchange import ExchangeManager
+from Core.Exchange.Exchange import get_exchange_manager, get_async_exchange_manager
+from Core.Exchange.ContractSpec import contract_specs
+from Core.Exchange.SymbolIndex import symbol_index
 from Core.Tracker.BitgetTracker import BitgetTracker
 from Core.Tracker.GateIOTracker import GateIOTracker
 from Define import exchange1, exchange2
 
-exchange_manager = ExchangeManager(exchange1, exchange2)
+exchange_manager = get_exchange_manager(exchange1, exchange2)
 
 class PositionCreator:
     def __init__(self):
@@ -23,33 +26,6 @@ class PositionCreator:
     def open_position(self, symbol, amount):
         print("open position:", symbol, amount)
 
-    # Helpers to normalize symbols per exchange
-    def _to_bitget_symbol(self, symbol: str) -> str:
-        # Prefer swap form with ":USDT" suffix for bitget USDT-margined swaps
-        if symbol.endswith(":USDT"):
-            return symbol
-        if "/" in symbol:
-            base, quote = symbol.split("/")
-            if quote.startswith("USDT"):
-                return f"{base}/USDT:USDT"
-        if symbol.endswith("USDT") and "/" not in symbol:
-            base = symbol[:-4]
-            return f"{base}/USDT:USDT"
-        return symbol
-
-    def _to_gate_symbol(self, symbol: str) -> str:
-        # Gate USDT-margined perpetuals use "BASE/USDT:USDT" in ccxt for swap disambiguation
-        if symbol.endswith(":USDT"):
-            return symbol
-        if "/" in symbol:
-            base, quote = symbol.split("/")
-            if quote.startswith("USDT"):
-                return f"{base}/USDT:USDT"
-        if symbol.endswith("USDT") and "/" not in symbol:
-            base = symbol[:-4]
-            return f"{base}/USDT:USDT"
-        return symbol
-
     def _ensure_markets(self):
         try:
             if not getattr(self.bitget, 'markets', None):
@@ -61,78 +37,10 @@ class PositionCreator:
                 self.gate.load_markets()
         except Exception:
             pass
-
-    def _extract_contract_size(self, market: dict) -> float:
-        """Robustly extract contract size (base units per 1 contract) from a ccxt market."""
-        if not market:
-            return 1.0
-        # Standardized field first
-        cs = market.get('contractSize')
-        if cs:
-            try:
-                return float(cs)
-            except Exception:
-                pass
-        info = market.get('info') or {}
-        # Common vendor fields
-        for key in (
-            'contractSize',             # sometimes nested in info
-            'quanto_multiplier',        # Gate
-            'multiplier',               # various
-            'size',                     # bitget/gate variants
-            'contract_size',
-        ):
-            val = info.get(key)
-            if val is not None:
-                try:
-                    f = float(val)
-                    if f > 0:
-                        return f
-                except Exception:
-                    continue
-        # As a last resort, 1.0 to avoid crash (but likely overestimates notional)
-        return 1.0
-
-    def _extract_amount_step(self, market: dict) -> float:
-        """Extract minimum increment (step) for the amount (contracts)."""
-        if not market:
-            return 1.0
-        # precision-based
-        prec = (market.get('precision') or {}).get('amount')
-        if prec is not None:
-            try:
-                f = float(prec)
-                # If f is integer-like and small, interpret as number of decimals
-                if abs(f - int(f)) < 1e-9 and 0 <= int(f) <= 10:
-                    return float(10 ** (-int(f)))
-                # If f is a positive fractional step already (<1), use as-is
-                if 0 < f < 1:
-                    return f
-            except Exception:
-                pass
-        # limits-based
-        try:
-            lim_min = (((market.get('limits') or {}).get('amount') or {}).get('min'))
-            if lim_min is not None:
-                v = float(lim_min)
-                if v > 0:
-                    return v
-        except Exception:
-            pass
-        # vendor info keys
-        info = market.get('info') or {}
-        for key in (
-            'min_qty', 'minQuantity', 'min_amount', 'minAmount', 'minOrderQty', 'min_order_qty'
-        ):
-            val = info.get(key)
-            if val is not None:
-                try:
-                    v = float(val)
-                    if v > 0:
-                        return v
-                except Exception:
-                    continue
-        return 1.0
+        symbol_index.ensure(self.bitget)
+        symbol_index.ensure(self.gate)
+        contract_specs.ensure(self.bitget)
+        contract_specs.ensure(self.gate)
 
     def _quantize_to_step(self, value: float, step: float) -> float:
         if step <= 0:
@@ -149,54 +57,6 @@ class PositionCreator:
             decimals = 8
         return round(q, decimals)
 
-    def _common_step(self, s1: float, s2: float) -> float:
-        """Return a step size that is a multiple of both s1 and s2.
-        For typical decimal steps (powers of 10), the max works if it's a multiple; otherwise fall back to a conservative max.
-        """
-        try:
-            s1 = float(s1 or 0)
-            s2 = float(s2 or 0)
-            if s1 <= 0 and s2 <= 0:
-                return 1.0
-            if s1 <= 0:
-                return s2
-            if s2 <= 0:
-                return s1
-            m = max(s1, s2)
-            n = min(s1, s2)
-            ratio = m / n
-            nearest = round(ratio)
-            if abs(ratio - nearest) < 1e-9:
-                return m  # m is a multiple of n
-            # Fallback: return m (more restrictive) to ensure we don't propose amounts not valid on the stricter exchange
-            return m
-        except Exception:
-            return max(s1, s2) if (s1 or s2) else 1.0
-
-    def _common_base_step(self, cs1: float, step1: float, cs2: float, step2: float) -> float:
-        """Common base amount step (in base units), i.e., contractSize*amountStep per exchange reconciled.
-        This returns a step that is representable on both exchanges. Uses the more restrictive step if not a clean multiple."""
-        try:
-            b1 = float(cs1) * float(step1)
-            b2 = float(cs2) * float(step2)
-            # Similar logic as _common_step but on base steps
-            if b1 <= 0 and b2 <= 0:
-                return 1.0
-            if b1 <= 0:
-                return b2
-            if b2 <= 0:
-                return b1
-            m = max(b1, b2)
-            n = min(b1, b2)
-            ratio = m / n
-            nearest = round(ratio)
-            if abs(ratio - nearest) < 1e-9:
-                return m
-            # Fallback: return m (more restrictive) to ensure we don't propose amounts not valid on the stricter exchange
-            return m
-        except Exception:
-            return max(cs1 * step1, cs2 * step2)
-
     def _try_float(self, v):
         try:
             if v is None:
@@ -339,8 +199,8 @@ class PositionCreator:
             # Normalize case first to match exchange market symbols
             symbol = (symbol or '').upper()
             # Normalize symbols for each exchange (force swap symbols)
-            bg_symbol = self._to_bitget_symbol(symbol)
-            gt_symbol = self._to_gate_symbol(symbol)
+            bg_symbol = symbol_index.ccxt_symbol('bitget', symbol)
+            gt_symbol = symbol_index.ccxt_symbol('gate', symbol)
 
             # Ensure markets are loaded for contractSize lookup
             self._ensure_markets()
@@ -349,26 +209,37 @@ class PositionCreator:
             # Use full ticker objects to inspect open interest fields
             bg_ticker = self.bitget.fetch_ticker(bg_symbol)
             gt_ticker = self.gate.fetch_ticker(gt_symbol)
+            return self._estimate_from_tickers(symbol, size, bg_symbol, gt_symbol, bg_ticker, gt_ticker)
+        except Exception as e:
+            print(f"Error estimating position for {symbol}: {e}")
+            return False, str(e)
+
+    async def estimate_position_async(self, symbol, size):
+        """Async estimate: both tickers are fetched concurrently through the async clients.
+        The remaining work (market specs, rare open-interest fallbacks) runs off the event loop."""
+        try:
+            symbol = (symbol or '').upper()
+            bg_symbol = symbol_index.ccxt_symbol('bitget', symbol)
+            gt_symbol = symbol_index.ccxt_symbol('gate', symbol)
+            async_manager = get_async_exchange_manager(exchange1, exchange2)
+            bitget, gate = async_manager.bitget_exchange, async_manager.gate_exchange
+            bg_ticker, gt_ticker = await asyncio.gather(bitget.fetch_ticker(bg_symbol), gate.fetch_ticker(gt_symbol))
+            await asyncio.to_thread(self._ensure_markets)
+            return await asyncio.to_thread(self._estimate_from_tickers, symbol, size, bg_symbol, gt_symbol, bg_ticker, gt_ticker)
+        except Exception as e:
+            print(f"Error estimating position for {symbol}: {e}")
+            return False, str(e)
+
+    def _estimate_from_tickers(self, symbol, size, bg_symbol, gt_symbol, bg_ticker, gt_ticker):
+        try:
             bitget_price = bg_ticker['last']
             gate_price = gt_ticker['last']
 
-            # Load markets for the normalized symbols
-            bg_market = None
-            gt_market = None
-            try:
-                bg_market = self.bitget.market(bg_symbol)
-            except Exception:
-                pass
-            try:
-                gt_market = self.gate.market(gt_symbol)
-            except Exception:
-                pass
-
-            # Extract accurate contract sizes and amount steps
-            bg_contract_size = self._extract_contract_size(bg_market)
-            gt_contract_size = self._extract_contract_size(gt_market)
-            bg_step = self._extract_amount_step(bg_market)
-            gt_step = self._extract_amount_step(gt_market)
+            # Contract sizes and amount steps from the precomputed spec table
+            bg_spec = contract_specs.get(self.bitget, symbol)
+            gt_spec = contract_specs.get(self.gate, symbol)
+            bg_contract_size, bg_step = bg_spec.contract_size, bg_spec.amount_step
+            gt_contract_size, gt_step = gt_spec.contract_size, gt_spec.amount_step
 
             # Compute Open Interest (USDT) best-effort
             bg_oi_usdt = self._extract_open_interest_usdt(self.bitget, bg_symbol, bg_ticker, bitget_price, bg_contract_size)
@@ -376,20 +247,12 @@ class PositionCreator:
 
             # Fallbacks via vendor-specific endpoints if still None
             if bg_oi_usdt is None:
-                # Build BTCUSDT-like symbol from normalized input
-                try:
-                    base = symbol.split('/')[0].replace(':USDT', '') if '/' in symbol else symbol.replace('USDT', '')
-                    pair = f"{base}USDT"
-                except Exception:
-                    pair = None
+                # Bitget mix endpoint expects the BTCUSDT-like market id
+                pair = symbol_index.market_id('bitget', symbol)
                 if pair:
                     bg_oi_usdt = self._bitget_open_interest_fallback(pair, bitget_price, bg_contract_size)
             if gt_oi_usdt is None:
-                try:
-                    gt_market = self.gate.market(gt_symbol)
-                    market_id = (gt_market or {}).get('id')
-                except Exception:
-                    market_id = None
+                market_id = symbol_index.market_id('gate', symbol)
                 if market_id:
                     gt_oi_usdt = self._gate_open_interest_fallback(market_id, gate_price, gt_contract_size)
 
@@ -409,7 +272,7 @@ class PositionCreator:
             base_gt_max = float(contracts_gt_max) * float(gt_contract_size)
 
             # Determine common base step and equal base amount
-            common_base_step = self._common_base_step(bg_contract_size, bg_step, gt_contract_size, gt_step)
+            common_base_step = contract_specs.common_base_step(symbol, self.bitget, self.gate)
             # Max equal base we can do on both sides (respecting both budgets)
             equal_base = self._quantize_to_step(min(base_bg_max, base_gt_max), common_base_step)
 
@@ -593,28 +456,17 @@ class PositionCreator:
                 raise ValueError("Contracts must be positive for both legs")
 
             # Normalize symbols and load meta
-            bg_symbol = self._to_bitget_symbol(symbol)
-            gt_symbol = self._to_gate_symbol(symbol)
+            bg_symbol = symbol_index.ccxt_symbol('bitget', symbol)
+            gt_symbol = symbol_index.ccxt_symbol('gate', symbol)
             self._ensure_markets()
-            try:
-                bg_market = self.bitget.market(bg_symbol)
-            except Exception:
-                bg_market = None
-            try:
-                gt_market = self.gate.market(gt_symbol)
-            except Exception:
-                gt_market = None
-
-            bg_cs = self._extract_contract_size(bg_market)
-            gt_cs = self._extract_contract_size(gt_market)
-            bg_step = self._extract_amount_step(bg_market)
-            gt_step = self._extract_amount_step(gt_market)
+            bg_cs = contract_specs.get(self.bitget, symbol).contract_size
+            gt_cs = contract_specs.get(self.gate, symbol).contract_size
 
             # Compute provided base amounts and equalize by base units
             base_long = float(long_contracts) * float(bg_cs if long_exchange == 'bitget' else gt_cs)
             base_short = float(short_contracts) * float(bg_cs if short_exchange == 'bitget' else gt_cs)
 
-            common_base_step = self._common_base_step(bg_cs, bg_step, gt_cs, gt_step)
+            common_base_step = contract_specs.common_base_step(symbol, self.bitget, self.gate)
             equal_base = self._quantize_to_step(min(base_long, base_short), common_base_step)
             if equal_base <= 0:
                 raise ValueError("Contracts too small after equalizing base amount")
@@ -4,24 +4,16 @@ import ccxt.pro
 import asyncio
 
 from Define import root_path
+from Core.Exchange.SymbolIndex import symbol_index
 
 last_prices = {}
 
-def convert_symbol(exchange, symbol):
-    if exchange == "bitget":
-        return symbol.replace("/", "")  # Chuyển BTC/USDT -> BTCUSDT
-    elif exchange == "gate":
-        return symbol.replace("/", "_")  # Chuyển BTC/USDT -> BTC_USDT
-    elif exchange == "binance":
-        return symbol.replace("/", "")
-    return symbol
-
 async def fetch_order_book(exchange, exchange_name, symbol, side):
     global last_prices
     try:
         while True:
             # Lấy dữ liệu order book từ WebSocket
-            converted_symbol = convert_symbol(exchange_name, symbol)
+            converted_symbol = symbol_index.market_id(exchange_name, symbol)
             order_book = await exchange.watch_order_book(converted_symbol, limit=100)
             if side == "BID":
                 last_prices[symbol]['bid'] = order_book['bids'][0][0]  # Giá bid
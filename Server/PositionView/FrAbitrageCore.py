@@ -1,45 +1,158 @@
 from Core.Define import PositionSide
+from Core.Exchange.ContractSpec import position_base_size
+
+
+def leg_key(position):
+    """Một leg = (sàn, symbol, chiều); mỗi tracker trả tối đa một position cho mỗi key."""
+    return position.exchange, position.symbol, position.side
 
 
 class AbitragePosition:
+    __slots__ = ('long_position', 'short_position', 'unreal_pnl', 'long_base', 'short_base')
 
-    def __init__(self, position_1, position_2):
+    def __init__(self, position_1, position_2, base_1=None, base_2=None):
         assert position_1.symbol == position_2.symbol
         if position_1.side == PositionSide.LONG:
             self.long_position = position_1
             self.short_position = position_2
+            self.long_base, self.short_base = base_1, base_2
         else:
             self.short_position = position_1
             self.long_position = position_2
+            self.long_base, self.short_base = base_2, base_1
         self.unreal_pnl = 0
 
     def amount_difference(self):
-            return abs(self.long_position.amount - self.short_position.amount) / self.long_position.amount * 100
+        """Lệch (%) giữa hai leg theo lượng coin cơ sở; contracts thô nếu chưa có base size."""
+        long_size = self.long_base if self.long_base is not None else self.long_position.amount
+        short_size = self.short_base if self.short_base is not None else self.short_position.amount
+        larger = max(long_size, short_size)
+        return abs(long_size - short_size) / larger * 100 if larger > 0 else 0.0
 
     def __repr__(self):
         return f"AbitragePosition(symbol={self.long_position.symbol}, difference={self.amount_difference()}%)"
 
 
 class FrAbitrageCore:
-    def __init__(self):
-        self.positions = []
+    """
+    Index ghép cặp long/short theo symbol, cập nhật tăng dần:
+    - check_position(positions) so với lần trước để ra diff (mở, đổi size, đóng) theo leg;
+      chỉ các symbol có leg mở/đóng/đổi size mới được ghép lại, leg chỉ đổi giá thì thay
+      object Position trong cặp hiện có (O(số leg thay đổi)).
+    - Trong một symbol, mỗi long được ghép với short ở sàn khác có lượng coin cơ sở
+      (contracts * contract size) gần nhất; leg không ghép được là orphan.
+    """
+
+    def __init__(self, base_size_of=position_base_size):
+        self.base_size_of = base_size_of
+        self._legs = {}        # symbol -> {leg key: (Position, base size)}
+        self._pairs = {}       # symbol -> [AbitragePosition]
+        self._orphans = {}     # symbol -> [Position]
+        self._pair_of = {}     # leg key -> AbitragePosition chứa leg
+        self._positions = None  # list phẳng, dựng lại khi có thay đổi
+
+    @property
+    def positions(self):
+        if self._positions is None:
+            self._positions = [pair for pairs in self._pairs.values() for pair in pairs]
+        return self._positions
+
+    @property
+    def orphans(self):
+        return [leg for legs in self._orphans.values() for leg in legs]
+
+    def check_position(self, positions, base_sizes=None):
+        """
+        Áp snapshot position mới (list Position của mọi sàn). base_sizes (tuỳ chọn) là lượng
+        coin cơ sở tương ứng từng position, VD: PositionBook.base_size().
+        """
+        current = {}
+        for i, pos in enumerate(positions):
+            base = float(base_sizes[i]) if base_sizes is not None else self.base_size_of(pos)
+            current[leg_key(pos)] = (pos, base)
+
+        changed_symbols = set()
+        for key in [k for legs in self._legs.values() for k in legs if k not in current]:
+            if self._remove(key):
+                changed_symbols.add(key[1])
+        for key, (pos, base) in current.items():
+            if self._upsert(key, pos, base):
+                changed_symbols.add(key[1])
+        for symbol in changed_symbols:
+            self._pair_symbol(symbol)
+
+    # ---- diff từng leg ----------------------------------------------------------------------
+
+    def open_or_resize(self, position, base=None):
+        """Áp một leg mở mới / đổi size (VD: từ event websocket)."""
+        key = leg_key(position)
+        if self._upsert(key, position, self.base_size_of(position) if base is None else base):
+            self._pair_symbol(key[1])
+
+    def close(self, key):
+        """Bỏ một leg đã đóng (key = leg_key(position))."""
+        if self._remove(key):
+            self._pair_symbol(key[1])
 
-    def check_position(self, positions):
-        from collections import defaultdict
+    def _remove(self, key):
+        legs = self._legs.get(key[1])
+        if legs is None or legs.pop(key, None) is None:
+            return False
+        if not legs:
+            del self._legs[key[1]]
+        return True
 
-        # Rebuild positions fresh each time to avoid duplicates on refresh
-        self.positions = []
+    def _upsert(self, key, position, base):
+        """Ghi leg; True nếu symbol cần ghép lại (leg mới hoặc đổi size)."""
+        legs = self._legs.setdefault(key[1], {})
+        previous = legs.get(key)
+        legs[key] = (position, base)
+        if previous is not None and previous[1] == base:
+            # Chỉ đổi giá/funding: cập nhật object trong cặp hiện có, không ghép lại
+            pair = self._pair_of.get(key)
+            if pair is not None:
+                if position.side == PositionSide.LONG:
+                    pair.long_position = position
+                else:
+                    pair.short_position = position
+            else:
+                orphans = self._orphans.get(key[1], [])
+                for i, leg in enumerate(orphans):
+                    if leg_key(leg) == key:
+                        orphans[i] = position
+            return False
+        return True
 
-        symbol_groups = defaultdict(list)
-        for pos in positions:
-            symbol_groups[pos.symbol].append(pos)
+    # ---- ghép cặp -----------------------------------------------------------------------------
 
-        for symbol, pos_list in symbol_groups.items():
-            longs = [p for p in pos_list if p.side == PositionSide.LONG]
-            shorts = [p for p in pos_list if p.side == PositionSide.SHORT]
-            for long_pos, short_pos in zip(longs, shorts):
-                self.positions.append(AbitragePosition(long_pos, short_pos))
+    def _pair_symbol(self, symbol):
+        for pair in self._pairs.pop(symbol, []):
+            self._pair_of.pop(leg_key(pair.long_position), None)
+            self._pair_of.pop(leg_key(pair.short_position), None)
+        self._orphans.pop(symbol, None)
+        self._positions = None
 
+        legs = list(self._legs.get(symbol, {}).values())
+        longs = sorted((v for v in legs if v[0].side == PositionSide.LONG), key=lambda v: -v[1])
+        shorts = [v for v in legs if v[0].side != PositionSide.LONG]
+        pairs, orphans = [], []
+        for long_pos, long_base in longs:
+            candidates = [(abs(long_base - base), i) for i, (pos, base) in enumerate(shorts)
+                          if pos.exchange != long_pos.exchange]
+            if not candidates:
+                orphans.append(long_pos)
+                continue
+            _, i = min(candidates)
+            short_pos, short_base = shorts.pop(i)
+            pair = AbitragePosition(long_pos, short_pos, long_base, short_base)
+            pairs.append(pair)
+            self._pair_of[leg_key(long_pos)] = pair
+            self._pair_of[leg_key(short_pos)] = pair
+        orphans += [pos for pos, _ in shorts]
+        if pairs:
+            self._pairs[symbol] = pairs
+        if orphans:
+            self._orphans[symbol] = orphans
 
     def __repr__(self):
-        return f"FrAbitrageCore(positions={self.positions})"
+        return f"FrAbitrageCore(positions={self.positions}, orphans={self.orphans})"
@@ -1,112 +1,154 @@
 import sys
 import os
+import threading
+import time
+
+import numpy as np
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 
-from Core.Exchange.Exchange import ExchangeManager
+from Core.FanOut import FANOUT_TIMEOUT, fan_out, fan_out_async
+from Core.Exchange.Exchange import get_exchange_manager, get_async_exchange_manager
 from Core.Tracker.BitgetTracker import BitgetTracker
 from Core.Tracker.GateIOTracker import GateIOTracker
+from Core.Tracker.Exposure import exposure
+from Core.Tracker.HedgeScanner import scan_hedge_imbalance
+from Core.Tracker.PositionBook import PositionBook
+from Core.Tracker.StreamingTracker import STREAMING_TRACKERS, build_streaming_tracker
 from Define import exchange1, exchange2
 from Server.PositionView.FrAbitrageCore import FrAbitrageCore
+from Core.Exchange.SingleFlight import SingleFlight, AsyncSingleFlight
 from Core.Define import EXCHANGE
 
 
-exchange_manager = ExchangeManager(exchange1, exchange2)
+exchange_manager = get_exchange_manager(exchange1, exchange2)
+# Sàn ứng với từng nhánh refresh (self.tracker, self.bitget_tracker)
+SIDE_EXCHANGES = (EXCHANGE.BITGET, EXCHANGE.GATE)
+# Nhánh refresh lỗi được giữ position tốt gần nhất tối đa chừng này giây, quá hạn thì bỏ
+SIDE_MAX_AGE = FANOUT_TIMEOUT * 3
+# Cửa sổ gom update stream của hai sàn (giây) trước khi exposure xét cảnh báo một lần cho cả cặp
+STREAM_EXPOSURE_WINDOW = float(os.getenv("STREAM_EXPOSURE_WINDOW", "1.0"))
 
 class PositionView:
     def __init__(self):
-        self.tracker = BitgetTracker(exchange_manager.bitget_exchange)
-        self.bitget_tracker = GateIOTracker(exchange_manager.gate_exchange)
+        if STREAMING_TRACKERS:
+            self.tracker = build_streaming_tracker(exchange_manager, EXCHANGE.BITGET)
+            self.bitget_tracker = build_streaming_tracker(exchange_manager, EXCHANGE.GATE)
+            # Exposure theo từng update stream (không chỉ lúc /positions refresh); snapshot mới nhất
+            # của mỗi sàn được gom trong STREAM_EXPOSURE_WINDOW rồi áp một batch cho cả hai sàn
+            self._stream_lock = threading.Lock()
+            self._stream_sides = [None, None]
+            self._stream_timer = None
+            self.tracker.add_listener(lambda positions: self._on_stream_positions(0, positions))
+            self.bitget_tracker.add_listener(lambda positions: self._on_stream_positions(1, positions))
+        else:
+            self.tracker = BitgetTracker(exchange_manager.bitget_exchange)
+            self.bitget_tracker = GateIOTracker(exchange_manager.gate_exchange)
         self.fr_arbitrage_core = FrAbitrageCore()
+        self.book = PositionBook()
+        # (positions, book) tốt gần nhất của từng sàn, dùng lại khi một nhánh refresh lỗi
+        self._sides = [([], PositionBook()), ([], PositionBook())]
+        self._side_updated_at = [0.0, 0.0]
+        # Tracker async được tạo lười bên trong event loop của server
+        self._async_trackers = None
+        # Các refresh đồng thời (trang positions + funding cùng poll) dùng chung một lượt chạy
+        self._refresh_flight = SingleFlight()
+        self._refresh_flight_async = AsyncSingleFlight()
 
     def refresh(self):
+        self._refresh_flight.do('refresh', self._refresh)
 
+    async def refresh_async(self):
+        """Refresh async: hai sàn được gọi đồng thời trên event loop."""
+        await self._refresh_flight_async.do('refresh', self._refresh_async)
 
-        # Collect open positions from both trackers
-        bitget_open_positions = self.tracker.get_open_positions()
-        gate_open_positions = self.bitget_tracker.get_open_positions()
-        self.fr_arbitrage_core.check_position(bitget_open_positions + gate_open_positions)
+    def _refresh(self):
+        # Gọi hai tracker cùng lúc; mỗi tracker đồng thời điền book dạng cột của mình
+        books = (PositionBook(), PositionBook())
+        result = fan_out([lambda: self.tracker.get_open_positions(books[0]),
+                          lambda: self.bitget_tracker.get_open_positions(books[1])])
+        self._apply_sides(result, books)
 
-        # compute notional size (USDT) per position based on entry price
-        bitget = exchange_manager.bitget_exchange
-        gate = exchange_manager.gate_exchange
-        try:
-            if not getattr(bitget, 'markets', None):
-                bitget.load_markets()
-        except Exception:
-            pass
+    async def _refresh_async(self):
+        if STREAMING_TRACKERS:
+            # Snapshot lấy từ stream websocket
+            bitget_tracker, gate_tracker = self.tracker, self.bitget_tracker
+        else:
+            if self._async_trackers is None:
+                async_manager = get_async_exchange_manager(exchange1, exchange2)
+                self._async_trackers = (BitgetTracker(async_manager.bitget_exchange),
+                                        GateIOTracker(async_manager.gate_exchange))
+            bitget_tracker, gate_tracker = self._async_trackers
+        books = (PositionBook(), PositionBook())
+        result = await fan_out_async([bitget_tracker.get_open_positions_async(books[0]),
+                                      gate_tracker.get_open_positions_async(books[1])])
+        self._apply_sides(result, books)
+
+    def _apply_sides(self, result, books):
+        """
+        Gộp kết quả của từng sàn. Nhánh lỗi/quá hạn giữ position tốt gần nhất để các cặp vẫn hiển thị,
+        tối đa SIDE_MAX_AGE giây; quá hạn thì bỏ các leg của nó (có thể đã đóng). Cả hai nhánh lỗi
+        thì raise lỗi.
+        """
+        if not any(result.ok(i) for i in range(len(books))):
+            result.raise_first()
+        now = time.time()
+        snapshots = []
+        for i, book in enumerate(books):
+            if result.ok(i):
+                self._sides[i] = (result.values[i], book)
+                self._side_updated_at[i] = now
+                snapshots.append((SIDE_EXCHANGES[i], result.values[i], book.base_size().tolist()))
+            elif now - self._side_updated_at[i] > SIDE_MAX_AGE:
+                if self._sides[i][0]:
+                    print(f"[WARN] PositionView: side {i + 1} failing for over {SIDE_MAX_AGE:.0f}s, "
+                          f"dropping its last positions: {result.errors[i]}")
+                self._sides[i] = ([], PositionBook())
+                snapshots.append((SIDE_EXCHANGES[i], [], []))
+            else:
+                print(f"[WARN] PositionView: side {i + 1} refresh failed, keeping last positions: {result.errors[i]}")
+        # Hai nhánh của một lần refresh là một snapshot: cảnh báo chỉ xét một lần cho cả batch
+        exposure.apply_batch(snapshots)
+        positions = [p for side_positions, _ in self._sides for p in side_positions]
+        self._apply_positions(positions, PositionBook.concat([book for _, book in self._sides]))
+
+    def _on_stream_positions(self, side, positions):
+        """Listener của stream: ghi snapshot mới nhất của sàn, hẹn một lần flush nếu chưa có."""
+        with self._stream_lock:
+            self._stream_sides[side] = positions
+            if self._stream_timer is not None:
+                return
+            self._stream_timer = threading.Timer(STREAM_EXPOSURE_WINDOW, self._flush_stream_positions)
+            self._stream_timer.daemon = True
+            self._stream_timer.start()
+
+    def _flush_stream_positions(self):
+        """Áp snapshot stream của cả hai sàn trong một batch: leg đầu của cặp hedge đang mở không báo lệch giả."""
+        with self._stream_lock:
+            self._stream_timer = None
+            sides = list(self._stream_sides)
+        snapshots = [(SIDE_EXCHANGES[i], positions, None) for i, positions in enumerate(sides) if positions is not None]
         try:
-            if not getattr(gate, 'markets', None):
-                gate.load_markets()
-        except Exception:
-            pass
-
-        def _to_swap_symbol(sym: str) -> str:
-            try:
-                s = (sym or '').upper()
-                if '/USDT' in s and ':USDT' in s:
-                    return s
-                if s.endswith('USDT') and '/' not in s:
-                    base = s[:-4]
-                    return f"{base}/USDT:USDT"
-                if s.endswith('/USDT') and ':USDT' not in s:
-                    return s + ':USDT'
-                return s
-            except Exception:
-                return sym
-
-        def _contract_size_from_market(market: dict) -> float:
-            cs = 1.0
-            if isinstance(market, dict):
-                info = market.get('info') or {}
-                v = market.get('contractSize')
-                if v is not None:
-                    try:
-                        f = float(v)
-                        if f > 0:
-                            return f
-                    except Exception:
-                        pass
-                for k in ('contractSize', 'quanto_multiplier', 'multiplier', 'size', 'contract_size'):
-                    v = info.get(k)
-                    if v is not None:
-                        try:
-                            f = float(v)
-                            if f > 0:
-                                return f
-                        except Exception:
-                            continue
-            return cs
-
-        # helper to compute notional and attach as amount_
-        def _compute_and_set_notional(leg, client):
-            try:
-                sym = _to_swap_symbol(getattr(leg, 'symbol', ''))
-                try:
-                    market = client.market(sym)
-                except Exception:
-                    market = None
-                cs = _contract_size_from_market(market)
-                entry = float(getattr(leg, 'entry_price', 0.0) or 0.0)
-                contracts = float(getattr(leg, 'amount', 0.0) or 0.0)
-                notional = round(max(0.0, contracts) * cs * max(0.0, entry), 2)
-                setattr(leg, 'amount_', notional)
-            except Exception:
-                try:
-                    setattr(leg, 'amount_', 0.0)
-                except Exception:
-                    pass
-
-        for pos in self.fr_arbitrage_core.positions:
-            # choose client by exchange for display
-            long_client = bitget if pos.long_position.exchange == EXCHANGE.BITGET else gate
-            short_client = bitget if pos.short_position.exchange == EXCHANGE.BITGET else gate
-            _compute_and_set_notional(pos.long_position, long_client)
-            _compute_and_set_notional(pos.short_position, short_client)
+            exposure.apply_batch(snapshots)
+        except Exception as e:
+            print(f"[WARN] PositionView: stream exposure update failed: {e}")
+
+    def _apply_positions(self, positions, book):
+        """Ghép cặp các leg và gắn notional (amount_); `book` chứa đúng các leg đó theo cùng thứ tự."""
+        self.fr_arbitrage_core.check_position(positions, book.base_size().tolist())
+
+        # notional (USDT) của mọi leg tính bằng một biểu thức vector trên book
+        for leg, notional in zip(positions, np.round(book.notional(), 2).tolist()):
+            leg.amount_ = notional
+        self.book = book
 
     def refresh_unreal_pnl(self):
         # Deprecated: no-op to keep compatibility if called somewhere
         return
 
+    def get_hedge_imbalance(self, min_notional=0.0, top=None):
+        """Xếp hạng độ lệch hedge (theo lượng coin cơ sở) trên book của lần refresh gần nhất."""
+        return scan_hedge_imbalance(self.book, min_notional, top)
+
     def get_core_positions(self):
         return self.fr_arbitrage_core.positions
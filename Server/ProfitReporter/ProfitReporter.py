@@ -9,7 +9,7 @@ import schedule
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 
 from Server.PositionView.FrAbitrageCore import FrAbitrageCore
-from Core.Exchange.Exchange import ExchangeManager
+from Core.Exchange.Exchange import get_exchange_manager
 from Core.Tracker.BitgetTracker import BitgetTracker
 from Core.Tracker.GateIOTracker import GateIOTracker
 from Define import exchange1, exchange2
@@ -17,7 +17,7 @@ from Define import exchange1, exchange2
 
 
 
-exchange_manager = ExchangeManager(exchange1, exchange2)
+exchange_manager = get_exchange_manager(exchange1, exchange2)
 
 bitget_tracker = BitgetTracker(exchange_manager.bitget_exchange)
 bitget_opening_position = bitget_tracker.get_open_positions()
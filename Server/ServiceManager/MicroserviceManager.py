@@ -41,6 +41,9 @@ HOST_SETTINGS = "/home/ubuntu/fr_bot/code/_settings"
 IN_CONTAINER_LOGS_NEW = "/home/ubuntu/fr_bot/logs"
 IN_CONTAINER_LOGS_OLD = "/app/logs"
 IN_CONTAINER_SETTINGS_NEW = "/home/ubuntu/fr_bot/code/_settings"
+# data/ (rate limit bucket, market cache, funding ledger) dùng chung giữa server và các container
+HOST_DATA = "/home/ubuntu/fr_bot/data"
+IN_CONTAINER_DATA = "/home/ubuntu/fr_bot/data"
 
 
 class ADLDockerController(MicroserviceController):
@@ -69,7 +72,8 @@ class ADLDockerController(MicroserviceController):
                 destinations = mounts.stdout.strip().splitlines()
                 has_logs = (IN_CONTAINER_LOGS_OLD in destinations) or (IN_CONTAINER_LOGS_NEW in destinations)
                 has_settings = (IN_CONTAINER_SETTINGS_NEW in destinations)
-                if not (has_logs and has_settings):
+                has_data = (IN_CONTAINER_DATA in destinations)
+                if not (has_logs and has_settings and has_data):
                     subprocess.run(["docker", "stop", "adlcontrol_container"], check=False)
                     subprocess.run(["docker", "rm", "adlcontrol_container"], check=True)
                     need_create = True
@@ -83,6 +87,7 @@ class ADLDockerController(MicroserviceController):
                     "-v", f"{HOST_LOGS}:{IN_CONTAINER_LOGS_NEW}",
                     "-v", f"{HOST_LOGS}:{IN_CONTAINER_LOGS_OLD}",
                     "-v", f"{HOST_SETTINGS}:{IN_CONTAINER_SETTINGS_NEW}",
+                    "-v", f"{HOST_DATA}:{IN_CONTAINER_DATA}",
                     "adlprocess"
                 ], check=True)
             subprocess.run(["docker", "start", "adlcontrol_container"], check=True)
@@ -127,7 +132,8 @@ class AssetDockerController(MicroserviceController):
                 destinations = mounts.stdout.strip().splitlines()
                 has_logs = (IN_CONTAINER_LOGS_OLD in destinations) or (IN_CONTAINER_LOGS_NEW in destinations)
                 has_settings = (IN_CONTAINER_SETTINGS_NEW in destinations)
-                if not (has_logs and has_settings):
+                has_data = (IN_CONTAINER_DATA in destinations)
+                if not (has_logs and has_settings and has_data):
                     subprocess.run(["docker", "stop", "assetcontrol_container"], check=False)
                     subprocess.run(["docker", "rm", "assetcontrol_container"], check=True)
                     need_create = True
@@ -141,6 +147,7 @@ class AssetDockerController(MicroserviceController):
                     "-v", f"{HOST_LOGS}:{IN_CONTAINER_LOGS_NEW}",
                     "-v", f"{HOST_LOGS}:{IN_CONTAINER_LOGS_OLD}",
                     "-v", f"{HOST_SETTINGS}:{IN_CONTAINER_SETTINGS_NEW}",
+                    "-v", f"{HOST_DATA}:{IN_CONTAINER_DATA}",
                     "assetprocess"
                 ], check=True)
             subprocess.run(["docker", "start", "assetcontrol_container"], check=True)
@@ -185,7 +192,8 @@ class DiscordDockerController(MicroserviceController):
                 destinations = mounts.stdout.strip().splitlines()
                 has_logs = (IN_CONTAINER_LOGS_OLD in destinations) or (IN_CONTAINER_LOGS_NEW in destinations)
                 has_settings = (IN_CONTAINER_SETTINGS_NEW in destinations)
-                if not (has_logs and has_settings):
+                has_data = (IN_CONTAINER_DATA in destinations)
+                if not (has_logs and has_settings and has_data):
                     subprocess.run(["docker", "stop", "discord_shared_container"], check=False)
                     subprocess.run(["docker", "rm", "discord_shared_container"], check=True)
                     need_create = True
@@ -204,6 +212,7 @@ class DiscordDockerController(MicroserviceController):
                     "-v", f"{HOST_LOGS}:{IN_CONTAINER_LOGS_NEW}",
                     "-v", f"{HOST_LOGS}:{IN_CONTAINER_LOGS_OLD}",
                     "-v", f"{HOST_SETTINGS}:{IN_CONTAINER_SETTINGS_NEW}",
+                    "-v", f"{HOST_DATA}:{IN_CONTAINER_DATA}",
                     "discord_shared_image"
                 ], capture_output=True, text=True)
                 if create.returncode != 0: